@@ -48,7 +48,9 @@ def create_user(db: Session, user: UserCreate, is_admin: bool = False):
     db.refresh(db_user)
     return db_user
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Plain def: FastAPI runs it in the threadpool, so waiting for a pooled DB connection under load
+# blocks one worker thread instead of the event loop
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     username = verify_token(token)
     user = get_user_by_username(db, username=username)
     if user is None:
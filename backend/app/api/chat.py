@@ -1,19 +1,86 @@
+import json
+import time
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
-from openai import OpenAI
+from typing import Any, Dict, List
 
-from ..core.database import get_db
+from ..core.database import get_db, SessionLocal
 from ..core.config import settings
 from ..models.models import ChatMessage, User
 from ..schemas.schemas import ChatMessageCreate, ChatMessage as ChatMessageSchema
-from .auth import get_current_user
+from .auth import get_current_user, get_current_admin_user
 from ..services.rag_service import rag_service
+from ..services.context_packer import estimate_tokens
+from ..services.llm_client import create_chat_client, llm_slot, LLMBusyError
+from ..services.executor import run_in_retrieval_executor
 
 router = APIRouter()
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=settings.openai_api_key) if settings.openai_api_key else None
+# Initialize the async OpenAI client (or the offline fake when LLM_PROVIDER=fake), shared by all requests
+openai_client = create_chat_client()
+
+def require_chat_client():
+    if not openai_client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Chat functionality requires OpenAI API key configuration. Please check the setup documentation."
+        )
+
+def prepare_chat(message: str, current_user: User, db: Session) -> Dict[str, Any]:
+    """Retrieve relevant course context and build the messages for the completion call
+
+    Returns 'messages', the retrieval state needed to cache the answer, and 'cached_answer'
+    when an equivalent question over the same materials has already been answered.
+    """
+    # Content changes after this point mean the answer must not be cached
+    answer_epoch = rag_service.answer_cache.epoch
+
+    # Get user's course context using RAG
+    user_context = rag_service.get_user_context(current_user, db)
+
+    # Find relevant context for the user's question
+    retrieved = rag_service.retrieve_context(
+        message,
+        user_context,
+        db,
+        top_k=settings.context_max_passages
+    )
+
+    # Fit the best passages into the prompt's token budget, then create the system prompt with them
+    packed = rag_service.pack_context(current_user, message, retrieved)
+    system_prompt = rag_service.create_system_prompt(current_user, packed['texts'])
+
+    return {
+        'messages': [
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": message
+            }
+        ],
+        'user_context': user_context,
+        'items': packed['items'],
+        'query_embedding': retrieved['query_embedding'],
+        'context_tokens': packed['tokens'],
+        'prompt_tokens': estimate_tokens(system_prompt) + estimate_tokens(message),
+        'answer_epoch': answer_epoch,
+        'cached_answer': rag_service.cached_answer(message, user_context, packed['items'], retrieved['query_embedding']),
+    }
+
+def remember_answer(message: str, turn: Dict[str, Any], answer: str):
+    rag_service.remember_answer(
+        message, turn['user_context'], turn['items'], turn['query_embedding'], answer, turn['answer_epoch']
+    )
+
+def sse_event(data: dict, event: str = None) -> str:
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
 
 @router.post("/", response_model=ChatMessageSchema)
 async def send_message(
@@ -21,56 +88,46 @@ async def send_message(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if not openai_client or not settings.openai_api_key:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Chat functionality requires OpenAI API key configuration. Please check the setup documentation."
-        )
+    require_chat_client()
 
     try:
-        # Get user's course context using RAG
-        user_context = rag_service.get_user_context(current_user, db)
-
-        # Find relevant context for the user's question
-        relevant_context = rag_service.find_relevant_context(
-            message_data.message,
-            user_context,
-            top_k=5
-        )
+        # Retrieval (embedding + search + DB reads) runs on the retrieval executor, off the event loop
+        turn = await run_in_retrieval_executor(prepare_chat, message_data.message, current_user, db)
 
-        # Create system prompt with relevant context
-        system_prompt = rag_service.create_system_prompt(current_user, relevant_context)
-
-        # Call OpenAI with context-aware prompt
-        response = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_prompt
-                },
-                {
-                    "role": "user",
-                    "content": message_data.message
-                }
-            ],
-            max_tokens=500,
-            temperature=0.7
-        )
+        ai_response = turn['cached_answer']
+        if ai_response is None:
+            # Call OpenAI with context-aware prompt
+            async with llm_slot():
+                response = await openai_client.chat.completions.create(
+                    model=settings.openai_model,
+                    messages=turn['messages'],
+                    max_tokens=settings.llm_max_tokens,
+                    temperature=0.7
+                )
 
-        ai_response = response.choices[0].message.content
+            ai_response = response.choices[0].message.content
+            usage = getattr(response, "usage", None)
+            if usage and usage.prompt_tokens:
+                turn['prompt_tokens'] = usage.prompt_tokens
+            remember_answer(message_data.message, turn, ai_response)
 
-        chat_message = ChatMessage(
-            user_id=current_user.id,
-            message=message_data.message,
-            response=ai_response
-        )
-        db.add(chat_message)
-        db.commit()
-        db.refresh(chat_message)
+        def save_message():
+            chat_message = ChatMessage(
+                user_id=current_user.id,
+                message=message_data.message,
+                response=ai_response,
+                prompt_tokens=turn['prompt_tokens'],
+                context_tokens=turn['context_tokens']
+            )
+            db.add(chat_message)
+            db.commit()
+            db.refresh(chat_message)
+            return chat_message
 
-        return chat_message
+        return await run_in_threadpool(save_message)
 
+    except LLMBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except Exception as e:
         import traceback
         print(f"Chat endpoint error: {str(e)}")
@@ -80,6 +137,111 @@ async def send_message(
             detail=f"Error communicating with OpenAI: {str(e)}"
         )
 
+@router.post("/stream")
+async def stream_message(
+    message_data: ChatMessageCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream the assistant's answer as Server-Sent Events.
+
+    Emits ``data: {"token": ...}`` events as tokens arrive, then a ``done`` event carrying the
+    persisted ChatMessage, or an ``error`` event if generation fails part-way. A cached answer
+    is sent as a single token event and flagged with ``"cached": true`` in the ``done`` event.
+    """
+    require_chat_client()
+
+    try:
+        turn = await run_in_retrieval_executor(prepare_chat, message_data.message, current_user, db)
+    except Exception as e:
+        print(f"Chat stream error while building context: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error preparing chat context: {str(e)}"
+        )
+
+    user_id = current_user.id
+    user_message = message_data.message
+
+    async def event_stream():
+        started = time.perf_counter()
+        first_token_at = None
+        tokens = []
+        cached = turn['cached_answer'] is not None
+
+        try:
+            if cached:
+                first_token_at = time.perf_counter()
+                tokens.append(turn['cached_answer'])
+                yield sse_event({"token": turn['cached_answer']})
+            else:
+                async with llm_slot():
+                    stream = await openai_client.chat.completions.create(
+                        model=settings.openai_model,
+                        messages=turn['messages'],
+                        max_tokens=settings.llm_max_tokens,
+                        temperature=0.7,
+                        stream=True
+                    )
+
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        token = chunk.choices[0].delta.content
+                        if not token:
+                            continue
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            print(f"Chat stream: time to first token {first_token_at - started:.3f}s for user {user_id}")
+                        tokens.append(token)
+                        yield sse_event({"token": token})
+
+        except Exception as e:
+            print(f"Chat stream error: {str(e)}")
+            yield sse_event({"detail": f"Error communicating with OpenAI: {str(e)}"}, event="error")
+            return
+
+        if not cached:
+            remember_answer(user_message, turn, "".join(tokens))
+
+        # Persist the full exchange once the stream has completed (request session is gone by now)
+        def save_message():
+            stream_db = SessionLocal()
+            try:
+                chat_message = ChatMessage(
+                    user_id=user_id,
+                    message=user_message,
+                    response="".join(tokens),
+                    prompt_tokens=turn['prompt_tokens'],
+                    context_tokens=turn['context_tokens']
+                )
+                stream_db.add(chat_message)
+                stream_db.commit()
+                stream_db.refresh(chat_message)
+                return ChatMessageSchema.model_validate(chat_message).model_dump(mode="json")
+            finally:
+                stream_db.close()
+
+        payload = await run_in_threadpool(save_message)
+
+        total = time.perf_counter() - started
+        ttft = (first_token_at - started) if first_token_at else total
+        print(f"Chat stream: completed {len(tokens)} tokens in {total:.3f}s (time to first token {ttft:.3f}s)")
+        yield sse_event({**payload, "time_to_first_token": round(ttft, 4), "cached": cached}, event="done")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/stats")
+def get_retrieval_stats(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Retrieval cache hit rates and index sizes for this worker (admin only)"""
+    return rag_service.stats()
+
 @router.get("/history", response_model=List[ChatMessageSchema])
 def get_chat_history(
     limit: int = 20,
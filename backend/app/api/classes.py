@@ -6,6 +6,7 @@ from ..core.database import get_db
 from ..models.models import Class, User
 from ..schemas.schemas import ClassCreate, Class as ClassSchema
 from .auth import get_current_user, get_current_admin_user
+from ..services.rag_service import rag_service
 
 router = APIRouter()
 
@@ -23,6 +24,7 @@ def create_class(
     db.add(db_class)
     db.commit()
     db.refresh(db_class)
+    rag_service.class_changed(db_class.id)
     return db_class
 
 @router.get("/", response_model=List[ClassSchema])
@@ -65,6 +67,7 @@ def update_class(
     class_obj.description = class_data.description
     db.commit()
     db.refresh(class_obj)
+    rag_service.class_changed(class_id)
     return class_obj
 
 @router.delete("/{class_id}")
@@ -79,6 +82,7 @@ def delete_class(
 
     class_obj.is_active = False
     db.commit()
+    rag_service.drop_class(class_id)
     return {"detail": "Class deleted successfully"}
 
 @router.post("/{class_id}/enroll/{user_id}")
@@ -101,6 +105,7 @@ def enroll_user(
 
     class_obj.students.append(user)
     db.commit()
+    rag_service.enrollment_changed(user.id)
     return {"detail": "User enrolled successfully"}
 
 @router.delete("/{class_id}/unenroll/{user_id}")
@@ -123,6 +128,7 @@ def unenroll_user(
 
     class_obj.students.remove(user)
     db.commit()
+    rag_service.enrollment_changed(user.id)
     return {"detail": "User unenrolled successfully"}
 
 @router.get("/{class_id}/students", response_model=List[dict])
@@ -163,6 +169,7 @@ def assign_user_to_class(
 
     class_obj.students.append(user)
     db.commit()
+    rag_service.enrollment_changed(user.id)
     return {"detail": f"User {user.username} assigned to class {class_obj.name} successfully"}
 
 @router.post("/{class_id}/unassign-user")
@@ -190,6 +197,7 @@ def unassign_user_from_class(
 
     class_obj.students.remove(user)
     db.commit()
+    rag_service.enrollment_changed(user.id)
     return {"detail": f"User {user.username} removed from class {class_obj.name} successfully"}
 
 @router.get("/{class_id}/stats")
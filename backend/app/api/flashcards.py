@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
 import pandas as pd
@@ -14,6 +15,7 @@ from ..schemas.schemas import (
     FlashcardAssignment
 )
 from .auth import get_current_user, get_current_admin_user
+from ..services.rag_service import rag_service
 
 router = APIRouter()
 
@@ -30,6 +32,7 @@ def create_flashcard(
         category=flashcard_data.category,
         created_by=current_user.id
     )
+    rag_service.embed_flashcards([db_flashcard])
     db.add(db_flashcard)
     db.commit()
     db.refresh(db_flashcard)
@@ -54,6 +57,7 @@ def create_flashcards_bulk(
         db.add(db_flashcard)
         db_flashcards.append(db_flashcard)
 
+    rag_service.embed_flashcards(db_flashcards)
     db.commit()
 
     for flashcard in db_flashcards:
@@ -61,6 +65,70 @@ def create_flashcards_bulk(
 
     return db_flashcards
 
+def import_excel_flashcards(content: bytes, db: Session, current_user: User) -> List[Flashcard]:
+    """Parse, embed and store the flashcards of an Excel file; blocking, so run off the event loop"""
+    df = pd.read_excel(io.BytesIO(content))
+
+    # Validate required columns
+    required_columns = ['term', 'definition']
+    missing_columns = [col for col in required_columns if col.lower() not in df.columns.str.lower()]
+
+    if missing_columns:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Missing required columns: {', '.join(missing_columns)}. Expected columns: Term, Definition, Category (optional)"
+        )
+
+    # Normalize column names
+    df.columns = df.columns.str.lower()
+
+    # Process flashcards
+    db_flashcards = []
+    errors = []
+
+    for index, row in df.iterrows():
+        try:
+            # Skip empty rows
+            if pd.isna(row.get('term')) or pd.isna(row.get('definition')):
+                continue
+
+            term = str(row['term']).strip()
+            definition = str(row['definition']).strip()
+            category = str(row.get('category', '')).strip() if not pd.isna(row.get('category')) else None
+
+            if not term or not definition:
+                errors.append(f"Row {index + 2}: Term and definition cannot be empty")
+                continue
+
+            # Create flashcard
+            db_flashcard = Flashcard(
+                term=term,
+                definition=definition,
+                category=category if category else None,
+                created_by=current_user.id
+            )
+            db.add(db_flashcard)
+            db_flashcards.append(db_flashcard)
+
+        except Exception as e:
+            errors.append(f"Row {index + 2}: {str(e)}")
+
+    if not db_flashcards:
+        if errors:
+            raise HTTPException(status_code=400, detail=f"No valid flashcards found. Errors: {'; '.join(errors[:5])}")
+        else:
+            raise HTTPException(status_code=400, detail="No flashcards found in the file")
+
+    # Embed in batches, then commit all flashcards
+    rag_service.embed_flashcards(db_flashcards)
+    db.commit()
+
+    # Refresh all flashcards
+    for flashcard in db_flashcards:
+        db.refresh(flashcard)
+
+    return db_flashcards
+
 @router.post("/bulk-excel", response_model=List[FlashcardSchema])
 async def create_flashcards_from_excel(
     file: UploadFile = File(...),
@@ -77,68 +145,9 @@ async def create_flashcards_from_excel(
         )
 
     try:
-        # Read Excel file content
+        # Read Excel file content, then parse, embed and store it in a worker thread
         content = await file.read()
-        df = pd.read_excel(io.BytesIO(content))
-
-        # Validate required columns
-        required_columns = ['term', 'definition']
-        missing_columns = [col for col in required_columns if col.lower() not in df.columns.str.lower()]
-
-        if missing_columns:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required columns: {', '.join(missing_columns)}. Expected columns: Term, Definition, Category (optional)"
-            )
-
-        # Normalize column names
-        df.columns = df.columns.str.lower()
-
-        # Process flashcards
-        db_flashcards = []
-        errors = []
-
-        for index, row in df.iterrows():
-            try:
-                # Skip empty rows
-                if pd.isna(row.get('term')) or pd.isna(row.get('definition')):
-                    continue
-
-                term = str(row['term']).strip()
-                definition = str(row['definition']).strip()
-                category = str(row.get('category', '')).strip() if not pd.isna(row.get('category')) else None
-
-                if not term or not definition:
-                    errors.append(f"Row {index + 2}: Term and definition cannot be empty")
-                    continue
-
-                # Create flashcard
-                db_flashcard = Flashcard(
-                    term=term,
-                    definition=definition,
-                    category=category if category else None,
-                    created_by=current_user.id
-                )
-                db.add(db_flashcard)
-                db_flashcards.append(db_flashcard)
-
-            except Exception as e:
-                errors.append(f"Row {index + 2}: {str(e)}")
-
-        if not db_flashcards:
-            if errors:
-                raise HTTPException(status_code=400, detail=f"No valid flashcards found. Errors: {'; '.join(errors[:5])}")
-            else:
-                raise HTTPException(status_code=400, detail="No flashcards found in the file")
-
-        # Commit all flashcards
-        db.commit()
-
-        # Refresh all flashcards
-        for flashcard in db_flashcards:
-            db.refresh(flashcard)
-
-        return db_flashcards
+        return await run_in_threadpool(import_excel_flashcards, content, db, current_user)
 
     except pd.errors.EmptyDataError:
         raise HTTPException(status_code=400, detail="Excel file is empty")
@@ -235,8 +244,15 @@ def update_flashcard(
     for field, value in update_data.items():
         setattr(flashcard, field, value)
 
+    # Only re-embed when the embedded text changed
+    if {'term', 'definition', 'category'} & update_data.keys():
+        flashcard.embedding_blob = None
+        flashcard.embedding_model = None
+        rag_service.embed_flashcards([flashcard])
+
     db.commit()
     db.refresh(flashcard)
+    rag_service.sync_flashcard(flashcard)
     return flashcard
 
 @router.delete("/{flashcard_id}")
@@ -254,6 +270,7 @@ def delete_flashcard(
     # Soft delete
     flashcard.is_active = False
     db.commit()
+    rag_service.sync_flashcard(flashcard)
 
     return {"message": "Flashcard deleted successfully"}
 
@@ -274,6 +291,7 @@ def assign_flashcard_to_classes(
         raise HTTPException(status_code=404, detail="Flashcard not found")
 
     # Clear existing assignments
+    previous_class_ids = [class_obj.id for class_obj in flashcard.assigned_classes]
     flashcard.assigned_classes.clear()
 
     # Add new assignments
@@ -287,6 +305,7 @@ def assign_flashcard_to_classes(
             flashcard.assigned_classes.append(class_obj)
 
     db.commit()
+    rag_service.sync_flashcard(flashcard, previous_class_ids)
 
     return {"message": f"Flashcard assigned to {len(assignment.class_ids)} classes"}
 
@@ -317,6 +336,7 @@ def unassign_flashcard_from_class(
     if class_obj in flashcard.assigned_classes:
         flashcard.assigned_classes.remove(class_obj)
         db.commit()
+        rag_service.sync_flashcard(flashcard, [class_id])
         return {"message": "Flashcard unassigned from class"}
     else:
         raise HTTPException(status_code=400, detail="Flashcard is not assigned to this class")
\ No newline at end of file
@@ -7,10 +7,11 @@ from typing import List
 
 from ..core.database import get_db
 from ..core.config import settings
-from ..models.models import Slide, Class, User, DocumentChunk
-from ..schemas.schemas import SlideCreate, Slide as SlideSchema
+from ..models.models import Slide, Class, User, DocumentChunk, IngestionJob, ReindexTask
+from ..schemas.schemas import SlideCreate, Slide as SlideSchema, SlideUpload, IngestionJob as IngestionJobSchema
 from .auth import get_current_user, get_current_admin_user
-from ..services.document_processor import document_processor
+from ..services.ingestion_queue import ingestion_queue
+from ..services.rag_service import rag_service
 
 router = APIRouter()
 
@@ -23,7 +24,7 @@ ALLOWED_EXTENSIONS = {
     ".pdf": "application/pdf"
 }
 
-@router.post("/upload/{class_id}", response_model=SlideSchema)
+@router.post("/upload/{class_id}", response_model=SlideUpload)
 async def upload_slide(
     class_id: int,
     title: str,
@@ -82,37 +83,28 @@ async def upload_slide(
     db.commit()
     db.refresh(db_slide)
 
-    # Process the document for vector storage (async operation)
-    processing_success = False
-    processing_message = ""
-    chunks_created = 0
-
-    try:
-        print(f"Starting document processing for slide: {db_slide.title}")
-        success = document_processor.process_document(db_slide, db)
-        if success:
-            # Count the chunks created
-            chunks_created = db.query(DocumentChunk).filter(DocumentChunk.slide_id == db_slide.id).count()
-            processing_success = True
-            processing_message = f"Successfully processed document into {chunks_created} searchable chunks"
-            print(f"API: Vectorization completed for {db_slide.title} - ready to respond")
-        else:
-            print(f"Document processing failed for: {db_slide.title}")
-            processing_message = "Document processing failed - content uploaded but not searchable"
-    except Exception as e:
-        print(f"Error during document processing for {db_slide.title}: {e}")
-        processing_message = f"Document processing error: {str(e)}"
-        # Don't fail the upload if document processing fails
-
-    # Create response with processing info
-    response_data = {
-        **db_slide.__dict__,
-        "processing_success": processing_success,
-        "processing_message": processing_message,
-        "chunks_created": chunks_created
+    # Extraction, chunking and embedding run on the ingestion workers; poll /slides/{id}/status for progress
+    job = ingestion_queue.enqueue(db_slide, db)
+    print(f"API: Queued document processing for slide {db_slide.title} (job {job.id})")
+
+    return {
+        **SlideSchema.model_validate(db_slide).model_dump(),
+        "job": job
     }
 
-    return response_data
+@router.get("/{slide_id}/status", response_model=IngestionJobSchema)
+def get_slide_status(
+    slide_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Processing state of the slide's latest ingestion job (admin only)"""
+    job = db.query(IngestionJob).filter(
+        IngestionJob.slide_id == slide_id
+    ).order_by(IngestionJob.id.desc()).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="No processing job found for this slide")
+    return job
 
 @router.get("/class/{class_id}", response_model=List[SlideSchema])
 def get_class_slides(
@@ -170,7 +162,10 @@ def delete_slide(
     if not slide:
         raise HTTPException(status_code=404, detail="Slide not found")
 
-    # Count and delete associated document chunks first
+    # Stop any in-flight processing, then delete its jobs and the associated document chunks
+    ingestion_queue.cancel(slide.id)
+    db.query(IngestionJob).filter(IngestionJob.slide_id == slide.id).delete()
+    db.query(ReindexTask).filter(ReindexTask.slide_id == slide.id).delete()
     chunks_deleted = db.query(DocumentChunk).filter(DocumentChunk.slide_id == slide.id).count()
     db.query(DocumentChunk).filter(DocumentChunk.slide_id == slide.id).delete()
 
@@ -178,9 +173,12 @@ def delete_slide(
         os.remove(slide.file_path)
 
     slide_title = slide.title
+    class_id = slide.class_id
     db.delete(slide)
     db.commit()
 
+    rag_service.remove_slide(class_id, slide_id)
+
     return {
         "detail": f"Document '{slide_title}' deleted successfully",
         "vectors_deleted": chunks_deleted,
@@ -11,9 +11,103 @@ class Settings:
     access_token_expire_minutes: int = 30
 
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
+    openai_model: str = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+    # Any OpenAI-compatible server (proxy, self-hosted model, load-test stub); empty = api.openai.com
+    openai_base_url: str = os.getenv("OPENAI_BASE_URL", "")
+    # Answer length cap and the model's context window, which the prompt must leave room in
+    llm_max_tokens: int = int(os.getenv("LLM_MAX_TOKENS", "500"))
+    llm_context_window: int = int(os.getenv("LLM_CONTEXT_WINDOW", "4096"))
+
+    # Async LLM client: HTTP pool size, timeouts, retries and per-worker concurrency limit
+    llm_max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    llm_timeout_seconds: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+    llm_connect_timeout_seconds: float = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+    llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    llm_queue_timeout_seconds: float = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+
+    # Threads for CPU-bound retrieval work (query embedding, vector/keyword search) off the event loop
+    retrieval_workers: int = int(os.getenv("RETRIEVAL_WORKERS", "4"))
+
+    # "openai" or "fake" (offline OpenAI-compatible stub for local testing)
+    llm_provider: str = os.getenv("LLM_PROVIDER", "openai")
+    fake_llm_token_delay_seconds: float = float(os.getenv("FAKE_LLM_TOKEN_DELAY_SECONDS", "0.02"))
+    fake_llm_first_token_delay_seconds: float = float(os.getenv("FAKE_LLM_FIRST_TOKEN_DELAY_SECONDS", "0.3"))
 
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./phoenixteam_edu.db")
 
+    # Embedding backend shared by ingestion and retrieval: "sentence-transformers" (EMBEDDING_MODEL_NAME)
+    # or "hashing" (deterministic, no model download - for CI and offline installs; EMBEDDING_DIM wide)
+    embedding_backend: str = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+    embedding_model_name: str = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+    embedding_dim: int = int(os.getenv("EMBEDDING_DIM", "384"))
+    # Texts per model call, L2-normalize vectors, and the dtype the backend returns ("float32" or "float16")
+    embedding_batch_size: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    embedding_normalize: bool = os.getenv("EMBEDDING_NORMALIZE", "false").lower() == "true"
+    embedding_dtype: str = os.getenv("EMBEDDING_DTYPE", "float32")
+
+    # LRU cache of query embeddings (entries, seconds; 0 size disables, 0 TTL never expires)
+    query_cache_size: int = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+    query_cache_ttl_seconds: float = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600"))
+
+    # Retrieval mode: "exact" (brute-force cosine, default) or "ivf" (approximate, for large classes)
+    retrieval_mode: str = os.getenv("RETRIEVAL_MODE", "exact")
+    # IVF is only used for classes with at least this many chunks; smaller ones stay exact
+    ann_min_vectors: int = int(os.getenv("ANN_MIN_VECTORS", "20000"))
+    # Number of IVF lists (0 = ~sqrt(N)) and lists probed per query (higher = better recall, slower)
+    ann_n_lists: int = int(os.getenv("ANN_N_LISTS", "0"))
+    ann_n_probe: int = int(os.getenv("ANN_N_PROBE", "16"))
+    # Where IVF centroids are persisted (default: vector_index/ next to the SQLite database)
+    ann_index_dir: str = os.getenv("ANN_INDEX_DIR", "")
+
+    # The vector/keyword indexes and the caches below live in each process and are only updated by
+    # the API calls that process serves: run the backend as a single worker (e.g. uvicorn --workers 1).
+    # With several workers, a change made through one is not seen by the others until they restart
+    # (indexes) or the TTL expires (caches); /health reports when the serving process built its indexes.
+    # Per-user retrieval context cache (entries, seconds); invalidated by enrollment and content changes
+    context_cache_size: int = int(os.getenv("CONTEXT_CACHE_SIZE", "4096"))
+    context_cache_ttl_seconds: float = float(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "300"))
+
+    # Semantic answer cache (size 0 disables); a cached answer is reused for a question over the same
+    # classes and retrieved materials whose embedding similarity reaches the threshold
+    answer_cache_size: int = int(os.getenv("ANSWER_CACHE_SIZE", "2048"))
+    answer_cache_ttl_seconds: float = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+    answer_cache_similarity: float = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+    # Course materials in the system prompt: passages retrieved per question and the (estimated) token budget they fill
+    context_max_passages: int = int(os.getenv("CONTEXT_MAX_PASSAGES", "8"))
+    context_token_budget: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+    # Background slide ingestion: worker threads, attempts per job and the pause before a retry
+    ingestion_workers: int = int(os.getenv("INGESTION_WORKERS", "2"))
+    ingestion_max_attempts: int = int(os.getenv("INGESTION_MAX_ATTEMPTS", "3"))
+    ingestion_retry_delay_seconds: float = float(os.getenv("INGESTION_RETRY_DELAY_SECONDS", "5"))
+    # Chunks embedded and committed together while a document is processed (bounds ingestion memory)
+    ingestion_batch_size: int = int(os.getenv("INGESTION_BATCH_SIZE", "64"))
+
+    # PDF text extraction: worker processes (0 = one per CPU) and the page count from which the pool is used
+    pdf_extract_workers: int = int(os.getenv("PDF_EXTRACT_WORKERS", "0"))
+    pdf_parallel_min_pages: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+
+    # Document chunk limits: characters, estimated tokens (0 = no limit; the embedding model reads
+    # at most 256 word pieces) and the trailing text consecutive chunks share
+    chunk_max_chars: int = int(os.getenv("CHUNK_MAX_CHARS", "1000"))
+    chunk_max_tokens: int = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+    chunk_overlap_chars: int = int(os.getenv("CHUNK_OVERLAP_CHARS", "200"))
+
+    # Fuse BM25 keyword matches with vector similarity (acronyms, form numbers, product names)
+    hybrid_search: bool = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+    lexical_weight: float = float(os.getenv("LEXICAL_WEIGHT", "1.0"))
+
+    # In-memory vector precision: "float32" (exact), "float16" (half the memory) or "int8" (a quarter,
+    # per-vector scaled). Quantized scores are re-ranked for this many top candidates with the exact
+    # float32 vectors from the database (0 disables)
+    vector_precision: str = os.getenv("VECTOR_PRECISION", "float32")
+    vector_rerank_candidates: int = int(os.getenv("VECTOR_RERANK_CANDIDATES", "50"))
+
+    # How new embeddings are persisted: "binary" (raw float32 LargeBinary) or "json" (legacy list of floats)
+    embedding_storage: str = os.getenv("EMBEDDING_STORAGE", "binary")
+
     uploads_path: str = "../uploads"
     slides_path: str = f"{uploads_path}/slides"
     resources_path: str = f"{uploads_path}/resources"
@@ -1,13 +1,21 @@
+import threading
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
 from .core.config import settings
-from .core.database import engine, get_db
+from .core.database import engine, get_db, SessionLocal
 from .models import models
+from .migrations import add_missing_columns
 from .api import auth, classes, slides, resources, chat, flashcards
+from .services.rag_service import rag_service
+from .services.embedding_provider import embedding_provider
+from .services.executor import retrieval_executor
+from .services.ingestion_queue import ingestion_queue
+from .services.pdf_extraction import shutdown_extract_pool
 
 models.Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
 
 app = FastAPI(
     title="PhoenixTeam Education Platform",
@@ -33,10 +41,42 @@ app.include_router(resources.router, prefix="/api/resources", tags=["resources"]
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
 app.include_router(flashcards.router, prefix="/api/flashcards", tags=["flashcards"])
 
+def build_vector_index():
+    """Load the embedding model, then every class's chunk and flashcard vectors and keyword postings into memory once"""
+    embedding_provider.get_model()
+    db = SessionLocal()
+    try:
+        rag_service.ensure_indexes(db)
+    except Exception as e:
+        print(f"Warning: Failed to build vector index at startup: {e}")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def warm_up():
+    # Run in the background so the worker can serve requests (including /health) right away
+    threading.Thread(target=build_vector_index, name="retrieval-warm-up", daemon=True).start()
+    # Resume slide processing that an earlier run left unfinished
+    ingestion_queue.requeue_pending()
+
+@app.on_event("shutdown")
+async def shut_down():
+    if chat.openai_client:
+        await chat.openai_client.close()
+    retrieval_executor.shutdown(wait=False)
+    ingestion_queue.shutdown()
+    shutdown_extract_pool()
+
 @app.get("/")
 async def root():
     return {"message": "PhoenixTeam Education Platform API"}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {
+        "status": "healthy",
+        "embedding_model": embedding_provider.status(),
+        "vector_index_built": rag_service.index.is_built,
+        "indexes_built_at": rag_service.indexes_built_at(),
+        "ingestion": ingestion_queue.stats()
+    }
\ No newline at end of file
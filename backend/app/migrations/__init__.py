@@ -0,0 +1,36 @@
+# Schema and data migrations for PhoenixTeam Education Platform
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from ..core.database import Base
+
+
+def add_missing_columns(engine: Engine):
+    """Add model columns that an existing database predates.
+
+    create_all() only creates missing tables, so new nullable columns on existing tables
+    are added here with plain ALTER TABLE statements, along with any indexes declared on
+    them. Data conversions live in the individual migration modules of this package.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+
+                column_type = column.type.compile(dialect=engine.dialect)
+                print(f"Migrations: Adding column {table.name}.{column.name} ({column_type})")
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    print(f"Migrations: Creating index {index.name}")
+                    index.create(connection)
@@ -0,0 +1,55 @@
+"""Convert DocumentChunk embeddings from the legacy JSON column to raw float32 blobs.
+
+Usage (from the backend directory):
+    python -m app.migrations.binary_embeddings [--batch-size 500]
+"""
+import argparse
+
+from ..core.database import SessionLocal, engine
+from ..models import models
+from ..models.models import DocumentChunk
+from ..services.embedding_codec import pack_embedding
+from . import add_missing_columns
+
+
+def convert_chunk_embeddings(batch_size: int = 500) -> int:
+    """Move every JSON embedding into embedding_blob and clear the JSON copy; returns rows converted"""
+    models.Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+
+    db = SessionLocal()
+    converted = 0
+    last_id = 0
+    try:
+        while True:
+            chunks = db.query(DocumentChunk).filter(
+                DocumentChunk.id > last_id,
+                DocumentChunk.embedding_blob.is_(None)
+            ).order_by(DocumentChunk.id).limit(batch_size).all()
+
+            if not chunks:
+                break
+            last_id = chunks[-1].id
+
+            # Rows without an embedding (SQL NULL or JSON null) are left alone
+            for chunk in chunks:
+                if chunk.embedding:
+                    chunk.embedding_blob = pack_embedding(chunk.embedding)
+                    chunk.embedding = None
+                    converted += 1
+
+            db.commit()
+            print(f"Migrations: Converted {converted} chunk embeddings to binary (up to chunk {last_id})")
+    finally:
+        db.close()
+
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert JSON chunk embeddings to float32 binary")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    total = convert_chunk_embeddings(args.batch_size)
+    print(f"Migrations: Done - {total} chunk embeddings converted")
@@ -0,0 +1,59 @@
+"""Record content hashes and the embedding model on DocumentChunks created before they were tracked.
+
+Existing embeddings are assumed to come from the configured embedding backend, so they are
+reused rather than recomputed. Run the migration before switching models: afterwards
+`python -m app.reindex --embeddings-only` re-encodes just the chunks embedded by the previous model.
+
+Usage (from the backend directory):
+    python -m app.migrations.chunk_hashes [--batch-size 500]
+"""
+import argparse
+
+from ..core.database import SessionLocal, engine
+from ..models import models
+from ..models.models import DocumentChunk
+from ..services.document_processor import content_hash
+from ..services.embedding_provider import embedding_model_id, embedding_provider
+from . import add_missing_columns
+
+
+def backfill_chunk_hashes(batch_size: int = 500) -> int:
+    """Fill content_hash and embedding_model where missing; returns rows updated"""
+    models.Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+
+    db = SessionLocal()
+    updated = 0
+    last_id = 0
+    try:
+        while True:
+            chunks = db.query(DocumentChunk).filter(
+                DocumentChunk.id > last_id,
+                DocumentChunk.content_hash.is_(None)
+            ).order_by(DocumentChunk.id).limit(batch_size).all()
+
+            if not chunks:
+                break
+            last_id = chunks[-1].id
+
+            for chunk in chunks:
+                chunk.content_hash = content_hash(chunk.chunk_text)
+                if chunk.embedding_model is None and (chunk.embedding_blob is not None or chunk.embedding):
+                    chunk.embedding_model = embedding_model_id(embedding_provider)
+                updated += 1
+
+            db.commit()
+            print(f"Migrations: Hashed {updated} chunks (up to chunk {last_id})")
+    finally:
+        db.close()
+
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill chunk content hashes and embedding model names")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    total = backfill_chunk_hashes(args.batch_size)
+    print(f"Migrations: Done - {total} chunks hashed")
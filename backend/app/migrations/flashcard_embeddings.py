@@ -0,0 +1,66 @@
+"""Backfill stored embeddings for flashcards that lack one from the current embedding model.
+
+Covers flashcards created before they were embedded at write time, those embedded before the
+model was recorded with the vector, and those embedded by a previous model (run it after
+changing EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME or EMBEDDING_DIM; python -m app.reindex
+--missing does so too).
+
+Usage (from the backend directory):
+    python -m app.migrations.flashcard_embeddings [--batch-size 256]
+"""
+import argparse
+
+from sqlalchemy import or_
+
+from ..core.database import SessionLocal, engine
+from ..models import models
+from ..models.models import Flashcard
+from ..services.rag_service import rag_service
+from ..services.embedding_provider import embedding_model_id, encoder_available
+from . import add_missing_columns
+
+
+def backfill_flashcard_embeddings(batch_size: int = 256) -> int:
+    """Embed every flashcard without a stored embedding from the current model; returns the number embedded"""
+    models.Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+
+    if not encoder_available(rag_service.embedding_model):
+        print("Migrations: Embedding model unavailable - nothing backfilled")
+        return 0
+
+    model_id = embedding_model_id(rag_service.embedding_model)
+    db = SessionLocal()
+    embedded = 0
+    last_id = 0
+    try:
+        while True:
+            flashcards = db.query(Flashcard).filter(
+                Flashcard.id > last_id,
+                or_(
+                    Flashcard.embedding_blob.is_(None),
+                    Flashcard.embedding_model.is_(None),
+                    Flashcard.embedding_model != model_id
+                )
+            ).order_by(Flashcard.id).limit(batch_size).all()
+
+            if not flashcards:
+                break
+            last_id = flashcards[-1].id
+
+            embedded += rag_service.embed_flashcards(flashcards)
+            db.commit()
+            print(f"Migrations: Embedded {embedded} flashcards (up to flashcard {last_id})")
+    finally:
+        db.close()
+
+    return embedded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute stored embeddings for flashcards that lack one from the current model")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    total = backfill_flashcard_embeddings(args.batch_size)
+    print(f"Migrations: Done - {total} flashcards embedded")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Table, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Table, JSON, LargeBinary, Float
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -87,6 +87,9 @@ class ChatMessage(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     message = Column(Text, nullable=False)
     response = Column(Text, nullable=False)
+    # Prompt size (reported by the API when available, otherwise estimated) and the share used by course materials
+    prompt_tokens = Column(Integer)
+    context_tokens = Column(Integer)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User")
@@ -99,6 +102,8 @@ class Flashcard(Base):
     definition = Column(Text, nullable=False)
     category = Column(String, nullable=True, index=True)
     is_active = Column(Boolean, default=True)
+    embedding_blob = Column(LargeBinary)  # Vector embedding of term/definition/category as raw float32 bytes
+    embedding_model = Column(String)  # Model that produced the stored embedding
     created_by = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -113,7 +118,42 @@ class DocumentChunk(Base):
     slide_id = Column(Integer, ForeignKey("slides.id"))
     chunk_text = Column(Text, nullable=False)
     chunk_index = Column(Integer, nullable=False)  # Order of chunks within the document
-    embedding = Column(JSON)  # Store the vector embedding as JSON
+    page_start = Column(Integer)  # First and last PDF page the chunk text comes from
+    page_end = Column(Integer)
+    embedding = Column(JSON(none_as_null=True))  # Legacy: vector embedding as a JSON list of floats
+    embedding_blob = Column(LargeBinary)  # Vector embedding as raw float32 bytes
+    content_hash = Column(String(64), index=True)  # SHA-256 of chunk_text; unchanged text reuses its embedding
+    embedding_model = Column(String)  # Model that produced the stored embedding
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    slide = relationship("Slide", back_populates="chunks")
\ No newline at end of file
+    slide = relationship("Slide", back_populates="chunks")
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    slide_id = Column(Integer, ForeignKey("slides.id"), index=True)
+    status = Column(String, nullable=False, default="queued")  # queued, running, done or failed
+    stage = Column(String, nullable=True)  # Current step: extracting, chunking, embedding, storing, indexing
+    progress = Column(Float, default=0.0)  # 0.0 - 1.0
+    attempts = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    chunks_created = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class ReindexTask(Base):
+    __tablename__ = "reindex_tasks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String, nullable=False, index=True)  # Groups the slides of one bulk reindex run
+    slide_id = Column(Integer, ForeignKey("slides.id"), index=True)
+    status = Column(String, nullable=False, default="pending")  # pending, done or failed
+    pages = Column(Integer, default=0)
+    chunks = Column(Integer, default=0)
+    seconds = Column(Float, default=0.0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
\ No newline at end of file
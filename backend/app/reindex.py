@@ -0,0 +1,275 @@
+"""Rebuild the knowledge base: re-extract, re-chunk and re-embed slides in bulk.
+
+Usage (from the backend directory):
+    python -m app.reindex                           # every slide
+    python -m app.reindex --class-id 3 --class-id 5 # slides of some classes
+    python -m app.reindex --missing                 # slides without chunks embedded by the current model,
+                                                    # and flashcards embedded by another model
+    python -m app.reindex --workers 4               # slides processed in 4 processes, each with its own model
+    python -m app.reindex --embeddings-only         # only re-embed chunks and flashcards from another model,
+                                                    # keeping the stored chunk text (no re-extraction)
+
+Progress is checkpointed per slide in the reindex_tasks table, so running the command again
+after an interruption resumes the unfinished run (--restart discards it and starts over).
+Unchanged chunk text reuses its stored embedding, so re-running is cheap. --embeddings-only
+commits per batch of chunks instead and can simply be run again.
+
+The backend keeps its search indexes in memory, built at startup, and this command does not
+reach them: restart the backend afterwards to pick up the new chunks (GET /health reports
+indexes_built_at, when the serving process built them). For the same reason the backend must run
+as a single worker process - each worker holds its own indexes and caches, updated only by the
+requests it serves.
+"""
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import func, or_
+
+from .core.config import settings
+from .core.database import SessionLocal, engine
+from .models import models
+from .models.models import DocumentChunk, ReindexTask, Slide
+from .migrations import add_missing_columns
+from .migrations.flashcard_embeddings import backfill_flashcard_embeddings
+from .services.document_processor import document_processor
+from .services.embedding_provider import embedding_model_id, embedding_provider
+from .services.pdf_extraction import count_pdf_pages, shutdown_extract_pool
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def select_slides(db, class_ids: Optional[Iterable[int]] = None, missing: bool = False) -> List[int]:
+    """Ids of the slides to reindex: all, those of the given classes, and/or those lacking current embeddings"""
+    query = db.query(Slide.id)
+    if class_ids:
+        query = query.filter(Slide.class_id.in_(list(class_ids)))
+    if missing:
+        stale = db.query(DocumentChunk.slide_id).filter(or_(
+            DocumentChunk.embedding_model.is_(None),
+            DocumentChunk.embedding_model != embedding_model_id(embedding_provider)
+        ))
+        chunked = db.query(DocumentChunk.slide_id)
+        query = query.filter(or_(
+            Slide.id.in_(stale),
+            (func.lower(Slide.file_type) == 'application/pdf') & ~Slide.id.in_(chunked)
+        ))
+    return [slide_id for (slide_id,) in query.order_by(Slide.id)]
+
+
+def unfinished_run(db) -> Optional[str]:
+    row = db.query(ReindexTask.run_id).filter(ReindexTask.status == PENDING).order_by(ReindexTask.id.desc()).first()
+    return row[0] if row else None
+
+
+def start_run(db, slide_ids: List[int]) -> str:
+    """Checkpoint a new run with one pending task per slide"""
+    run_id = _now().strftime("%Y%m%d-%H%M%S")
+    db.add_all([ReindexTask(run_id=run_id, slide_id=slide_id, status=PENDING) for slide_id in slide_ids])
+    db.commit()
+    return run_id
+
+
+def _init_worker():
+    # Slides are already spread over processes; extracting pages in further processes would oversubscribe the CPUs
+    settings.pdf_extract_workers = 1
+
+
+def reindex_slide(task_id: int) -> Dict[str, Any]:
+    """Reprocess the slide of one task and record the outcome on it; runs in worker processes"""
+    db = SessionLocal()
+    started = time.perf_counter()
+    result = {'task_id': task_id, 'title': None, 'status': FAILED, 'pages': 0, 'chunks': 0, 'seconds': 0.0}
+    try:
+        task = db.query(ReindexTask).filter(ReindexTask.id == task_id).first()
+        slide = db.query(Slide).filter(Slide.id == task.slide_id).first() if task else None
+        if slide is None:
+            # Deleted since the run started; nothing left to do for it
+            if task is not None:
+                task.status = DONE
+                task.finished_at = _now()
+                db.commit()
+            result['status'] = DONE
+            return result
+
+        result['title'] = slide.title
+        error = None
+        try:
+            page_count = None
+            if slide.file_type.lower() == 'application/pdf':
+                page_count = result['pages'] = count_pdf_pages(document_processor.resolve_path(slide.file_path))
+            success = document_processor.process_document(slide, db, page_count=page_count)
+        except Exception as e:
+            db.rollback()
+            success, error = False, str(e)
+
+        result['chunks'] = db.query(DocumentChunk).filter(DocumentChunk.slide_id == slide.id).count()
+        result['seconds'] = time.perf_counter() - started
+        result['status'] = DONE if success else FAILED
+        task.status = result['status']
+        task.pages = result['pages']
+        task.chunks = result['chunks']
+        task.seconds = result['seconds']
+        task.error = None if success else (error or "Processing failed - see the log for details")
+        task.finished_at = _now()
+        db.commit()
+        return result
+    finally:
+        db.close()
+
+
+def _encode(texts: List[str]) -> List[np.ndarray]:
+    """Embed texts with this process's own model; runs in worker processes"""
+    return document_processor.generate_embeddings(texts)
+
+
+def refresh_embeddings(class_ids: Optional[List[int]] = None, workers: int = 1,
+                       batch_size: int = 256) -> Dict[str, float]:
+    """Re-embed the stored chunks and flashcards not embedded by the current model, without
+    re-extracting or re-chunking any slide; returns counts of chunks 'checked', 'reused', 'embedded'
+    and of 'flashcards' re-embedded"""
+    models.Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        slide_ids = select_slides(db, class_ids) if class_ids else None
+        if workers <= 1:
+            counts = document_processor.refresh_embeddings(db, slide_ids, batch_size)
+        else:
+            # Spawned, not forked: each worker loads its own embedding model
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                def encode(texts: List[str]) -> List[np.ndarray]:
+                    size = -(-len(texts) // workers)
+                    parts = pool.map(_encode, [texts[start:start + size] for start in range(0, len(texts), size)])
+                    return [vector for part in parts for vector in part]
+
+                counts = document_processor.refresh_embeddings(db, slide_ids, batch_size * workers, encode=encode)
+    except KeyboardInterrupt:
+        print("Reindex: Interrupted - run the command again to continue")
+        counts = {'checked': 0, 'reused': 0, 'embedded': 0}
+    finally:
+        db.close()
+
+    counts['flashcards'] = backfill_flashcard_embeddings()
+    counts['seconds'] = time.perf_counter() - started
+    return counts
+
+
+def reindex(class_ids: Optional[List[int]] = None, missing: bool = False, workers: int = 1,
+            restart: bool = False) -> Dict[str, float]:
+    """Run (or resume) a bulk reindex; returns totals for the slides processed in this invocation"""
+    models.Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+
+    db = SessionLocal()
+    try:
+        if restart:
+            discarded = db.query(ReindexTask).filter(ReindexTask.status == PENDING).delete()
+            db.commit()
+            if discarded:
+                print(f"Reindex: Discarded {discarded} pending slides of the unfinished run")
+
+        run_id = unfinished_run(db)
+        if run_id:
+            print(f"Reindex: Resuming run {run_id} (filters apply to new runs only; --restart starts over)")
+        else:
+            slide_ids = select_slides(db, class_ids, missing)
+            if not slide_ids:
+                print("Reindex: No slides to reindex")
+                flashcards = backfill_flashcard_embeddings() if missing else 0
+                return {'slides': 0, 'failed': 0, 'pages': 0, 'chunks': 0, 'flashcards': flashcards, 'seconds': 0.0}
+            run_id = start_run(db, slide_ids)
+            print(f"Reindex: Started run {run_id} for {len(slide_ids)} slides")
+
+        task_ids = [task_id for (task_id,) in db.query(ReindexTask.id).filter(
+            ReindexTask.run_id == run_id, ReindexTask.status == PENDING
+        ).order_by(ReindexTask.id)]
+        finished_before = db.query(ReindexTask).filter(
+            ReindexTask.run_id == run_id, ReindexTask.status != PENDING
+        ).count()
+    finally:
+        db.close()
+
+    total = finished_before + len(task_ids)
+    totals = {'slides': 0, 'failed': 0, 'pages': 0, 'chunks': 0, 'flashcards': 0, 'seconds': 0.0}
+    started = time.perf_counter()
+
+    def report(result: Dict[str, Any]):
+        totals['slides'] += 1
+        totals['failed'] += result['status'] == FAILED
+        totals['pages'] += result['pages']
+        totals['chunks'] += result['chunks']
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        print(f"Reindex: [{finished_before + totals['slides']}/{total}] {result['title'] or 'deleted slide'} - "
+              f"{result['status']}, {result['pages']} pages, {result['chunks']} chunks in {result['seconds']:.1f}s "
+              f"| {totals['pages'] / elapsed:.1f} pages/s, {totals['chunks'] / elapsed:.1f} chunks/s")
+
+    try:
+        if workers <= 1:
+            for task_id in task_ids:
+                report(reindex_slide(task_id))
+        else:
+            # Spawned, not forked: each worker loads its own embedding model and database connections
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker) as pool:
+                futures = [pool.submit(reindex_slide, task_id) for task_id in task_ids]
+                try:
+                    for future in as_completed(futures):
+                        report(future.result())
+                except BaseException:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+    except KeyboardInterrupt:
+        print("Reindex: Interrupted - run the command again to resume")
+    finally:
+        shutdown_extract_pool()
+
+    if missing:
+        # Flashcards are embedded on their own, not per slide
+        totals['flashcards'] = backfill_flashcard_embeddings()
+
+    totals['seconds'] = time.perf_counter() - started
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-extract and re-embed slides in bulk, resuming interrupted runs")
+    parser.add_argument("--class-id", type=int, action="append", dest="class_ids",
+                        help="Only slides of this class (repeatable)")
+    parser.add_argument("--missing", action="store_true",
+                        help="Only slides with no chunks or chunks not embedded by the current model; "
+                             "also re-embeds flashcards embedded by another model")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes reindexing slides in parallel (each loads the embedding model)")
+    parser.add_argument("--restart", action="store_true", help="Discard an unfinished run instead of resuming it")
+    parser.add_argument("--embeddings-only", action="store_true",
+                        help="Only re-embed stored chunks and flashcards not embedded by the current model, "
+                             "keeping the chunk text (no re-extraction; ignores --missing and --restart)")
+    parser.add_argument("--batch-size", type=int, default=256,
+                        help="Chunks re-embedded and committed per batch and worker with --embeddings-only")
+    args = parser.parse_args()
+
+    if args.embeddings_only:
+        counts = refresh_embeddings(args.class_ids, args.workers, args.batch_size)
+        seconds = max(counts['seconds'], 1e-9)
+        print(f"Reindex: Done - {counts['checked']} chunks checked ({counts['reused']} reused, "
+              f"{counts['embedded']} embedded), {counts['flashcards']} flashcards re-embedded in "
+              f"{counts['seconds']:.1f}s ({counts['checked'] / seconds:.1f} chunks/s)")
+    else:
+        totals = reindex(args.class_ids, args.missing, args.workers, args.restart)
+        seconds = max(totals['seconds'], 1e-9)
+        print(f"Reindex: Done - {totals['slides']} slides ({totals['failed']} failed), {totals['pages']} pages, "
+              f"{totals['chunks']} chunks, {totals['flashcards']} flashcards re-embedded in {totals['seconds']:.1f}s "
+              f"({totals['pages'] / seconds:.1f} pages/s, {totals['chunks'] / seconds:.1f} chunks/s)")
@@ -60,6 +60,25 @@ class Slide(SlideBase):
     class Config:
         from_attributes = True
 
+class IngestionJob(BaseModel):
+    id: int
+    slide_id: int
+    status: str
+    stage: Optional[str] = None
+    progress: float
+    attempts: int
+    error: Optional[str] = None
+    chunks_created: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class SlideUpload(Slide):
+    job: IngestionJob
+
 class ResourceBase(BaseModel):
     title: str
     description: Optional[str] = None
@@ -88,6 +107,8 @@ class ChatMessage(BaseModel):
     user_id: int
     message: str
     response: str
+    prompt_tokens: Optional[int] = None
+    context_tokens: Optional[int] = None
     created_at: datetime
 
     class Config:
@@ -134,6 +155,8 @@ class FlashcardAssignment(BaseModel):
 class DocumentChunkBase(BaseModel):
     chunk_text: str
     chunk_index: int
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
 
 class DocumentChunk(DocumentChunkBase):
     id: int
@@ -0,0 +1,103 @@
+import os
+from typing import Optional
+import numpy as np
+
+from ..core.config import settings
+
+# Rows scored against the centroids at once when assigning vectors to lists (bounds temporary memory)
+ASSIGN_BATCH_SIZE = 65536
+
+
+def default_index_dir() -> str:
+    """Directory for persisted ANN data: next to the SQLite file, or the working directory otherwise"""
+    if settings.ann_index_dir:
+        return settings.ann_index_dir
+    if settings.database_url.startswith("sqlite:///"):
+        db_path = os.path.abspath(settings.database_url[len("sqlite:///"):])
+        return os.path.join(os.path.dirname(db_path), "vector_index")
+    return os.path.abspath("vector_index")
+
+
+def auto_n_lists(size: int) -> int:
+    """Rule-of-thumb list count (~sqrt(N)) when settings.ann_n_lists is not fixed"""
+    if settings.ann_n_lists > 0:
+        return settings.ann_n_lists
+    return int(min(4096, max(16, np.sqrt(size))))
+
+
+class IVFIndex:
+    """Inverted-file (IVF-flat) partitioning of unit vectors, implemented with NumPy.
+
+    Vectors are assigned to their nearest of ``n_lists`` spherical k-means centroids. A query
+    only scores the vectors in its ``n_probe`` closest lists; raising n_probe trades speed for
+    recall. The centroids are all that needs persisting - list membership is recomputed from
+    the vectors when an index is loaded.
+    """
+
+    def __init__(self, centroids: np.ndarray, n_probe: int, trained_size: int):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.n_probe = max(1, min(n_probe, len(self.centroids)))
+        self.trained_size = trained_size
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def dim(self) -> int:
+        return self.centroids.shape[1]
+
+    @classmethod
+    def train(cls, matrix: np.ndarray, n_lists: int, n_probe: int, iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        """Spherical k-means on a sample of the (unit-length) rows of matrix"""
+        rng = np.random.default_rng(seed)
+        size = len(matrix)
+        n_lists = max(1, min(n_lists, size))
+
+        sample_size = min(size, n_lists * 64)
+        sample = matrix[rng.choice(size, sample_size, replace=False)] if sample_size < size else matrix
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty lists keep their previous centroid
+            filled = norms[:, 0] > 0
+            centroids[filled] = sums[filled] / norms[filled]
+
+        return cls(centroids, n_probe, size)
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Nearest list for each row of vectors"""
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), ASSIGN_BATCH_SIZE):
+            batch = vectors[start:start + ASSIGN_BATCH_SIZE]
+            assignments[start:start + len(batch)] = np.argmax(batch @ self.centroids.T, axis=1)
+        return assignments
+
+    def probe(self, query_embedding: np.ndarray) -> np.ndarray:
+        """Boolean mask over lists marking the n_probe lists closest to the query"""
+        scores = self.centroids @ query_embedding
+        probes = np.argpartition(scores, -self.n_probe)[-self.n_probe:] if self.n_probe < self.n_lists else slice(None)
+        mask = np.zeros(self.n_lists, dtype=bool)
+        mask[probes] = True
+        return mask
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, trained_size=np.int64(self.trained_size))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, n_probe: int) -> Optional["IVFIndex"]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return cls(data["centroids"], n_probe, int(data["trained_size"]))
+        except Exception as e:
+            print(f"Vector index: Ignoring unreadable ANN file {path}: {e}")
+            return None
@@ -0,0 +1,164 @@
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, Optional, Set, Tuple
+import numpy as np
+
+from .query_cache import normalize_query
+
+
+def context_fingerprint(items: Iterable[Tuple[str, int, int]]) -> str:
+    """Stable digest of the retrieved (kind, item_id, class_id) items, independent of their order"""
+    keys = sorted(f"{kind}:{item_id}" for kind, item_id, _ in items)
+    return hashlib.sha1(",".join(keys).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """Semantic cache of generated answers for repeated course questions.
+
+    Answers are grouped by (class set, context fingerprint), so an answer is only reused for a
+    question asked over the same classes that retrieved exactly the same materials. Within a
+    group the cached question closest to the new one is returned if its embedding similarity
+    reaches the threshold (identical normalized text always matches, even without embeddings).
+    Groups are shared across users, so the prompt must not carry anything user-specific.
+    Content changes invalidate every entry of the affected classes, and all-class (admin)
+    entries; a TTL bounds staleness from changes made elsewhere.
+    """
+
+    def __init__(self, max_size: int = 2048, ttl_seconds: float = 3600, similarity_threshold: float = 0.95):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        # entry id -> (stored_at, group, normalized query, embedding or None, answer)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._groups: Dict[tuple, Set[int]] = defaultdict(set)
+        self._class_entries: Dict[int, Set[int]] = defaultdict(set)
+        self._all_class_entries: Set[int] = set()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Bumped by every invalidation so answers generated from since-changed content are not stored
+        self.epoch = 0
+
+    @staticmethod
+    def group_key(class_ids: Optional[Iterable[int]], fingerprint: str) -> tuple:
+        return (None if class_ids is None else tuple(sorted(set(class_ids))), fingerprint)
+
+    def get(self, query: str, class_ids: Optional[Iterable[int]], fingerprint: str,
+            query_embedding: Optional[np.ndarray] = None) -> Optional[str]:
+        """Cached answer for a sufficiently similar question over the same context, if any"""
+        if self.max_size <= 0:
+            return None
+        normalized = normalize_query(query)
+        group = self.group_key(class_ids, fingerprint)
+
+        with self._lock:
+            now = time.monotonic()
+            best_id, best_score = None, -1.0
+            for entry_id in list(self._groups.get(group, ())):
+                stored_at, _, cached_query, embedding, _ = self._entries[entry_id]
+                if self.ttl_seconds and now - stored_at >= self.ttl_seconds:
+                    self._forget(entry_id)
+                    continue
+                if cached_query == normalized:
+                    score = 1.0
+                elif query_embedding is not None and embedding is not None:
+                    score = float(np.dot(embedding, query_embedding))
+                else:
+                    continue
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None or best_score < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            print(f"Answer cache: Hit (similarity {best_score:.3f}) for '{query}'")
+            return self._entries[best_id][4]
+
+    def put(self, query: str, class_ids: Optional[Iterable[int]], fingerprint: str,
+            query_embedding: Optional[np.ndarray], answer: str, epoch: Optional[int] = None):
+        """Store an answer; pass the epoch read before retrieval to skip answers that went stale meanwhile"""
+        if self.max_size <= 0 or not answer:
+            return
+        normalized = normalize_query(query)
+        group = self.group_key(class_ids, fingerprint)
+        if query_embedding is not None:
+            query_embedding = np.array(query_embedding, dtype=np.float32)
+            query_embedding.setflags(write=False)
+
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            for entry_id in list(self._groups.get(group, ())):
+                if self._entries[entry_id][2] == normalized:
+                    self._forget(entry_id)
+
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (time.monotonic(), group, normalized, query_embedding, answer)
+            self._groups[group].add(entry_id)
+            if group[0] is None:
+                self._all_class_entries.add(entry_id)
+            else:
+                for class_id in group[0]:
+                    self._class_entries[class_id].add(entry_id)
+            while len(self._entries) > self.max_size:
+                self._forget(next(iter(self._entries)))
+
+    def invalidate_classes(self, class_ids: Iterable[int]):
+        """Drop every answer generated from one of the classes, plus all answers spanning every class"""
+        with self._lock:
+            self.epoch += 1
+            affected = set(self._all_class_entries)
+            for class_id in class_ids:
+                affected |= self._class_entries.get(class_id, set())
+            for entry_id in affected:
+                if entry_id in self._entries:
+                    self.invalidations += 1
+                self._forget(entry_id)
+
+    def clear(self):
+        with self._lock:
+            self.epoch += 1
+            self._entries.clear()
+            self._groups.clear()
+            self._class_entries.clear()
+            self._all_class_entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'similarity_threshold': self.similarity_threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def _forget(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        self._all_class_entries.discard(entry_id)
+        if entry is None:
+            return
+        group = entry[1]
+        members = self._groups.get(group)
+        if members is not None:
+            members.discard(entry_id)
+            if not members:
+                del self._groups[group]
+        for class_id in group[0] or ():
+            entries = self._class_entries.get(class_id)
+            if entries is not None:
+                entries.discard(entry_id)
+                if not entries:
+                    del self._class_entries[class_id]
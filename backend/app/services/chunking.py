@@ -0,0 +1,123 @@
+import re
+from collections import deque
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .context_packer import estimate_tokens
+
+# Sentence ends (terminal punctuation, possibly closed by a quote or bracket) and blank lines
+SENTENCE_BREAK = re.compile(r'(?:(?<=[.!?])|(?<=[.!?]["\')\]]))\s+|\n\s*\n')
+LINE_BREAK = re.compile(r'\s*\n\s*')
+WHITESPACE = re.compile(r'\s+')
+
+
+class Chunk(NamedTuple):
+    text: str
+    page_start: Optional[int]  # 1-based pages the chunk was taken from; None for text without pages
+    page_end: Optional[int]
+
+
+def format_pages(page_start: Optional[int], page_end: Optional[int]) -> str:
+    """'page 3' or 'pages 3-4' for a chunk's page range, '' when unknown"""
+    if page_start is None:
+        return ""
+    if page_end is None or page_end == page_start:
+        return f"page {page_start}"
+    return f"pages {page_start}-{page_end}"
+
+
+def iter_segments(text: str) -> Iterator[str]:
+    """Sentences and paragraphs of text in order, with their original line breaks"""
+    start = 0
+    for match in SENTENCE_BREAK.finditer(text):
+        if match.start() > start:
+            yield text[start:match.start()]
+        start = match.end()
+    if start < len(text):
+        yield text[start:]
+
+
+def _fits(chars: int, tokens: int, max_chars: int, max_tokens: int) -> bool:
+    return chars <= max_chars and (not max_tokens or tokens <= max_tokens)
+
+
+def split_segment(segment: str, max_chars: int, max_tokens: int = 0) -> Iterator[Tuple[str, int]]:
+    """Whitespace-normalized pieces of a segment that fit the limits, with their estimated tokens.
+
+    A segment that fits is returned whole; a longer one is cut at line breaks (slide bullets),
+    then between words, and only as a last resort inside a word.
+    """
+    text = WHITESPACE.sub(' ', segment).strip()
+    tokens = estimate_tokens(text)
+    if not text or _fits(len(text), tokens, max_chars, max_tokens):
+        if text:
+            yield text, tokens
+        return
+
+    # Every character costs at most one estimated token, so this many always fit
+    hard_size = min(max_chars, max_tokens) if max_tokens else max_chars
+    units: List[Tuple[str, int]] = []
+    for line in LINE_BREAK.split(segment.strip()):
+        line = WHITESPACE.sub(' ', line).strip()
+        line_tokens = estimate_tokens(line)
+        if not line:
+            continue
+        if _fits(len(line), line_tokens, max_chars, max_tokens):
+            units.append((line, line_tokens))
+            continue
+        for word in line.split(' '):
+            for start in range(0, len(word), hard_size):
+                piece = word[start:start + hard_size]
+                units.append((piece, estimate_tokens(piece)))
+
+    # Join units back up greedily; estimated tokens add up across a space
+    piece, piece_tokens = "", 0
+    for unit, unit_tokens in units:
+        if piece and not _fits(len(piece) + 1 + len(unit), piece_tokens + unit_tokens, max_chars, max_tokens):
+            yield piece, piece_tokens
+            piece, piece_tokens = "", 0
+        piece = f"{piece} {unit}" if piece else unit
+        piece_tokens += unit_tokens
+    if piece:
+        yield piece, piece_tokens
+
+
+def iter_page_chunks(pages: Iterable[Tuple[Optional[int], str]], max_chars: int = 1000,
+                     max_tokens: int = 0, overlap_chars: int = 200) -> Iterator[Chunk]:
+    """Split (page number, text) pairs into overlapping chunks in one forward pass.
+
+    Chunks are built from whole sentences (pieces of a sentence only when it alone exceeds a
+    limit) and hold at most max_chars characters and, if set, max_tokens estimated tokens.
+    Consecutive chunks share the trailing sentences of the previous chunk up to overlap_chars.
+    Chunks may span pages and record the first and last page they draw from. Each sentence is
+    added and dropped once, so the work is linear in the text and only one chunk is held.
+    """
+    window = deque()  # (sentence, page, tokens) of the chunk being built
+    chars = tokens = 0  # Totals over the window; joined length is chars + len(window) - 1
+    pending = False  # The window has sentences not yet emitted in a chunk
+
+    def chunk() -> Chunk:
+        return Chunk(" ".join(sentence for sentence, _, _ in window), window[0][1], window[-1][1])
+
+    for page_number, text in pages:
+        for segment in iter_segments(text or ""):
+            for sentence, sentence_tokens in split_segment(segment, max_chars, max_tokens):
+                if window and not _fits(chars + len(window) + len(sentence), tokens + sentence_tokens, max_chars, max_tokens):
+                    if pending:
+                        yield chunk()
+                        pending = False
+                    # Carry the previous chunk's tail over, as long as the new sentence still fits
+                    while window and (
+                        chars + len(window) - 1 > overlap_chars
+                        or not _fits(chars + len(window) + len(sentence), tokens + sentence_tokens, max_chars, max_tokens)
+                    ):
+                        dropped, _, dropped_tokens = window.popleft()
+                        chars -= len(dropped)
+                        tokens -= dropped_tokens
+
+                window.append((sentence, page_number, sentence_tokens))
+                chars += len(sentence)
+                tokens += sentence_tokens
+                pending = True
+
+    if pending:
+        yield chunk()
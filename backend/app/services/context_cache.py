@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, Optional, Set
+
+
+class UserContextCache:
+    """Per-user cache of resolved retrieval context (class set plus candidate chunk/flashcard ids).
+
+    Entries are dropped precisely by the events that change them: enrollment changes invalidate
+    one user, content changes invalidate every user of the affected classes (and all admins,
+    whose context spans every class). A TTL bounds staleness from changes made elsewhere.
+    """
+
+    def __init__(self, max_size: int = 4096, ttl_seconds: float = 300):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._class_users: Dict[int, Set[int]] = defaultdict(set)
+        self._admins: Set[int] = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                stored_at, context = entry
+                if not self.ttl_seconds or time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return context
+                self._forget(user_id)
+            self.misses += 1
+            return None
+
+    def put(self, user_id: int, context: Dict[str, Any], is_admin: bool = False):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._forget(user_id)
+            self._entries[user_id] = (time.monotonic(), context)
+            if is_admin:
+                self._admins.add(user_id)
+            for class_id, _ in context['classes']:
+                self._class_users[class_id].add(user_id)
+            while len(self._entries) > self.max_size:
+                self._forget(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            if user_id in self._entries:
+                self.invalidations += 1
+            self._forget(user_id)
+
+    def invalidate_classes(self, class_ids: Iterable[int]):
+        """Drop every cached context that includes one of the classes, plus all admin contexts"""
+        with self._lock:
+            affected = set(self._admins)
+            for class_id in class_ids:
+                affected |= self._class_users.get(class_id, set())
+            for user_id in affected:
+                if user_id in self._entries:
+                    self.invalidations += 1
+                self._forget(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._class_users.clear()
+            self._admins.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def _forget(self, user_id: int):
+        entry = self._entries.pop(user_id, None)
+        self._admins.discard(user_id)
+        if entry is None:
+            return
+        for class_id, _ in entry[1]['classes']:
+            users = self._class_users.get(class_id)
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self._class_users[class_id]
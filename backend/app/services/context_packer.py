@@ -0,0 +1,117 @@
+import re
+from typing import Any, Dict, List
+
+# Approximates a BPE tokenizer offline: common words are one token, long words cost one token
+# per ~5 letters, numbers split into groups of up to three digits, and each symbol is its own token
+TOKEN_PIECE = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+LETTERS_PER_TOKEN = 5
+
+# Chunks of the same document overlap by design (200 characters); shorter matches are coincidence
+MIN_OVERLAP = 20
+MAX_OVERLAP = 400
+
+# Don't bother truncating a passage into less room than this
+MIN_PASSAGE_TOKENS = 40
+TRUNCATION_MARK = " ..."
+
+
+def _piece_tokens(piece: str) -> int:
+    if piece.isalpha():
+        return max(1, (len(piece) + LETTERS_PER_TOKEN - 1) // LETTERS_PER_TOKEN)
+    return 1
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of text for an OpenAI chat model, without a tokenizer"""
+    if not text:
+        return 0
+    return sum(_piece_tokens(piece) for piece in TOKEN_PIECE.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of text estimated at no more than max_tokens, cut at a word boundary"""
+    used = 0
+    end = 0
+    for match in TOKEN_PIECE.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > max_tokens:
+            break
+        end = match.end()
+    else:
+        return text
+    return text[:end].rstrip() + TRUNCATION_MARK
+
+
+def overlap_length(first: str, second: str) -> int:
+    """Length of the longest suffix of first that is also a prefix of second (0 if under MIN_OVERLAP)"""
+    for size in range(min(len(first), len(second), MAX_OVERLAP), MIN_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+
+def pack_context(passages: List[Dict[str, Any]], token_budget: int) -> Dict[str, Any]:
+    """Fill a token budget with the highest-scoring passages.
+
+    passages are dicts with 'kind', 'id', 'class_id', 'score', 'header', 'body' and 'group'
+    (the slide of a chunk, None for flashcards); the formatted text is header + body. Passages
+    are taken best score first. Bodies repeating an already packed one are skipped, text a chunk
+    shares with a packed chunk of the same slide is trimmed, and the last passage that does not
+    fit is truncated when enough room is left for it to be useful.
+
+    Returns 'texts' and 'items' ([(kind, id, class_id)]) of the packed passages, the estimated
+    'tokens' they use, and counts of 'dropped', 'duplicates' and 'trimmed' passages.
+    """
+    packed: List[Dict[str, Any]] = []
+    seen_bodies = set()
+    remaining = token_budget
+    dropped = duplicates = trimmed = 0
+
+    for passage in sorted(passages, key=lambda passage: passage['score'], reverse=True):
+        body = passage['body']
+        normalized = " ".join(body.split()).lower()
+        if normalized in seen_bodies:
+            duplicates += 1
+            continue
+
+        if passage['group'] is not None:
+            for other in packed:
+                if other['group'] != passage['group']:
+                    continue
+                # The overlap may sit at either end depending on which chunk was packed first;
+                # compare with the other chunk's full text since it may have been trimmed itself
+                head = overlap_length(other['source_body'], body)
+                if head:
+                    body = body[head:].lstrip()
+                tail = overlap_length(body, other['source_body'])
+                if tail:
+                    body = body[:-tail].rstrip()
+            if not body.strip():
+                duplicates += 1
+                continue
+
+        text = passage['header'] + body
+        tokens = estimate_tokens(text) + 1  # newline separator
+        if tokens > remaining:
+            header_tokens = estimate_tokens(passage['header']) + 1
+            if remaining - header_tokens < MIN_PASSAGE_TOKENS:
+                dropped += 1
+                continue
+            body = truncate_to_tokens(body, remaining - header_tokens - estimate_tokens(TRUNCATION_MARK))
+            text = passage['header'] + body
+            tokens = estimate_tokens(text) + 1
+
+        if body != passage['body']:
+            trimmed += 1
+        seen_bodies.add(normalized)
+        packed.append({**passage, 'source_body': passage['body'], 'body': body, 'text': text})
+        remaining -= tokens
+
+    return {
+        'texts': [passage['text'] for passage in packed],
+        'items': [(passage['kind'], passage['id'], passage['class_id']) for passage in packed],
+        'tokens': token_budget - remaining,
+        'dropped': dropped,
+        'duplicates': duplicates,
+        'trimmed': trimmed,
+    }
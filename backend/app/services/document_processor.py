@@ -1,110 +1,151 @@
+import hashlib
+import itertools
 import os
-import pypdf
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
+from sqlalchemy import func, insert, or_, update
 from sqlalchemy.orm import Session
-import re
+import numpy as np
 
+from ..core.config import settings
 from ..models.models import Slide, DocumentChunk
+from .embedding_codec import embedding_columns, stored_vector
+from .embedding_provider import embedding_provider, embedding_model_id, encoder_available
+from .vector_index import ENCODE_BATCH_SIZE
+from .pdf_extraction import PageText, count_pdf_pages, iter_pdf_pages
+from .chunking import Chunk, iter_page_chunks
 
-class DocumentProcessor:
-    def __init__(self):
-        try:
-            # Use the same lightweight model as RAG service
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-            print("Document processor: Embedding model loaded successfully")
-        except Exception as e:
-            print(f"Warning: Failed to load embedding model: {e}")
-            self.embedding_model = None
+# Called as progress(stage, fraction) while a document is processed; may raise ProcessingCancelled
+ProgressCallback = Callable[[str, float], None]
 
-    def extract_pdf_text(self, pdf_path: str) -> str:
-        """Extract text from PDF file"""
-        try:
-            # Handle relative paths by making them absolute
-            if not os.path.isabs(pdf_path):
-                # Assuming uploads are relative to backend directory
-                base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))  # Go up from app/services/
-                pdf_path = os.path.join(base_dir, pdf_path)
 
-            print(f"Document processor: Extracting text from PDF: {pdf_path}")
+class ProcessingCancelled(Exception):
+    """Raised from a progress callback to abandon processing (e.g. the slide was deleted)"""
 
-            if not os.path.exists(pdf_path):
-                print(f"Document processor: PDF file not found at: {pdf_path}")
-                return ""
 
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = pypdf.PdfReader(file)
-                text = ""
-                for page_num, page in enumerate(pdf_reader.pages):
-                    page_text = page.extract_text()
-                    text += f"\n--- Page {page_num + 1} ---\n{page_text}\n"
+def _no_progress(stage: str, fraction: float):
+    pass
 
-                print(f"Document processor: Extracted {len(text)} characters from {len(pdf_reader.pages)} pages")
-                return text.strip()
-        except Exception as e:
-            print(f"Error extracting PDF text from {pdf_path}: {e}")
-            return ""
 
-    def chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
-        """Split text into overlapping chunks"""
-        if not text:
-            return []
+def content_hash(text: str) -> str:
+    """Identity of a chunk's text for embedding reuse"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-        # Clean up the text - remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text.strip())
 
-        chunks = []
-        start = 0
+class DocumentProcessor:
+    def __init__(self, encoder=None):
+        # Same shared, lazily loaded model as the RAG service unless an encoder is injected
+        self.embedding_model = encoder if encoder is not None else embedding_provider
 
-        while start < len(text):
-            # Find the end of this chunk
-            end = start + chunk_size
+    def resolve_path(self, pdf_path: str) -> str:
+        # Handle relative paths by making them absolute
+        if not os.path.isabs(pdf_path):
+            # Assuming uploads are relative to backend directory
+            base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))  # Go up from app/services/
+            pdf_path = os.path.join(base_dir, pdf_path)
+        return pdf_path
 
-            if end >= len(text):
-                # Last chunk
-                chunks.append(text[start:].strip())
-                break
+    def iter_chunks(self, pages: Iterable[PageText]) -> Iterator[Chunk]:
+        """Split extracted pages into sentence-aligned chunks tagged with their page range"""
+        return iter_page_chunks(
+            ((page.number, page.text) for page in pages),
+            settings.chunk_max_chars, settings.chunk_max_tokens, settings.chunk_overlap_chars
+        )
 
-            # Try to break at a sentence or paragraph boundary
-            break_point = end
-            for i in range(end, max(start + chunk_size - 200, start), -1):
-                if text[i] in '.!?':
-                    break_point = i + 1
-                    break
-                elif text[i] in '\n\r':
-                    break_point = i
-                    break
-
-            chunk = text[start:break_point].strip()
-            if chunk:
-                chunks.append(chunk)
-
-            # Move start position with overlap
-            start = break_point - overlap
-            if start < 0:
-                start = 0
-
-        print(f"Document processor: Split text into {len(chunks)} chunks")
-        return chunks
-
-    def generate_embeddings(self, chunks: List[str]) -> List[List[float]]:
-        """Generate embeddings for text chunks"""
-        if not self.embedding_model or not chunks:
+    def generate_embeddings(self, chunks: List[str], progress: Optional[ProgressCallback] = None) -> List[np.ndarray]:
+        """Generate float32 embeddings for text chunks, in batches so progress can be reported"""
+        if not chunks or not encoder_available(self.embedding_model):
             return []
 
+        progress = progress or _no_progress
         try:
             print(f"Document processor: Generating embeddings for {len(chunks)} chunks")
-            embeddings = self.embedding_model.encode(chunks)
-            # Convert numpy arrays to Python lists for JSON storage
-            return [embedding.tolist() for embedding in embeddings]
+            embeddings = []
+            for start in range(0, len(chunks), ENCODE_BATCH_SIZE):
+                batch = chunks[start:start + ENCODE_BATCH_SIZE]
+                embeddings.extend(np.asarray(self.embedding_model.encode(batch), dtype=np.float32))
+                progress("embedding", (start + len(batch)) / len(chunks))
+            return embeddings
+        except ProcessingCancelled:
+            raise
         except Exception as e:
             print(f"Error generating embeddings: {e}")
             return []
 
-    def process_document(self, slide: Slide, db: Session) -> bool:
-        """Process a document: extract text, chunk it, generate embeddings, and store in database"""
+    def reusable_embeddings(self, hashes: Iterable[str], db: Session) -> Dict[str, np.ndarray]:
+        """Stored embeddings from the current model for any chunk (of any slide) with one of these content hashes"""
+        hashes = set(hashes)
+        if not hashes:
+            return {}
+        rows = db.query(DocumentChunk.content_hash, DocumentChunk.embedding, DocumentChunk.embedding_blob).filter(
+            DocumentChunk.content_hash.in_(hashes),
+            DocumentChunk.embedding_model == embedding_model_id(self.embedding_model),
+            or_(DocumentChunk.embedding_blob.isnot(None), DocumentChunk.embedding.isnot(None))
+        ).all()
+
+        found = {}
+        for chunk_hash, embedding, embedding_blob in rows:
+            if chunk_hash not in found:
+                vector = stored_vector(embedding, embedding_blob)
+                if vector is not None:
+                    found[chunk_hash] = vector
+        return found
+
+    def embed_with_reuse(self, texts: List[str], hashes: List[str], db: Session) -> Tuple[List[Optional[np.ndarray]], int]:
+        """Embeddings for texts, reusing stored ones for unchanged content and encoding only the rest
+
+        Returns the embeddings (None where none could be produced) and how many were reused.
+        """
+        reused = self.reusable_embeddings(hashes, db)
+        # Identical new texts within the batch are encoded once
+        missing = list(dict.fromkeys(
+            (chunk_hash, text) for chunk_hash, text in zip(hashes, texts) if chunk_hash not in reused
+        ))
+        fresh = self.generate_embeddings([text for _, text in missing]) if missing else []
+        vectors = {**reused, **{chunk_hash: vector for (chunk_hash, _), vector in zip(missing, fresh)}}
+        return [vectors.get(chunk_hash) for chunk_hash in hashes], sum(chunk_hash in reused for chunk_hash in hashes)
+
+    def chunk_rows(self, slide_id: int, batch: List[Tuple[int, Chunk]], db: Session) -> Tuple[List[Dict], int, int]:
+        """Insert-ready DocumentChunk rows for (chunk_index, chunk) pairs; also returns counts reused and embedded"""
+        hashes = [content_hash(chunk.text) for _, chunk in batch]
+        embeddings, reused = self.embed_with_reuse([chunk.text for _, chunk in batch], hashes, db)
+        model_id = embedding_model_id(self.embedding_model)
+        rows = [
+            {
+                'slide_id': slide_id,
+                'chunk_text': chunk.text,
+                'chunk_index': index,
+                'page_start': chunk.page_start,
+                'page_end': chunk.page_end,
+                'content_hash': chunk_hash,
+                # Still store text chunks without embeddings as fallback
+                'embedding_model': model_id if embedding is not None else None,
+                **embedding_columns(embedding)
+            }
+            for (index, chunk), chunk_hash, embedding in zip(batch, hashes, embeddings)
+        ]
+        embedded = sum(embedding is not None for embedding in embeddings) - reused
+        return rows, reused, embedded
+
+    def process_document(self, slide: Slide, db: Session, progress: Optional[ProgressCallback] = None,
+                         resume: bool = False, page_count: Optional[int] = None) -> bool:
+        """Process a document: extract text, chunk it, generate embeddings, and store in database
+
+        Runs as a streaming pipeline - pages -> chunks -> embedding batches -> bulk inserts
+        committed per batch (settings.ingestion_batch_size) - so memory stays flat whatever the
+        size of the document. With resume=True the chunks an interrupted earlier run already
+        committed are kept and only the rest is embedded; otherwise existing chunks are replaced
+        once the new ones are stored. Chunks whose text is unchanged (same content hash, here or
+        in any other slide) reuse the stored embedding instead of being encoded again.
+
+        progress is called with the current stage and its completed fraction; ProcessingCancelled
+        raised from it rolls back the current batch and propagates to the caller. page_count
+        spares parsing the PDF again when the caller has already counted its pages.
+        """
+        progress = progress or _no_progress
+        # Read once: if the slide is deleted meanwhile, the expired instance can no longer be loaded
+        slide_id, title = slide.id, slide.title
         try:
-            print(f"Document processor: Processing document {slide.title} (ID: {slide.id})")
+            print(f"Document processor: Processing document {title} (ID: {slide_id})")
             print(f"Document processor: File type is: '{slide.file_type}' (lowered: '{slide.file_type.lower()}')")
 
             # Only process PDF files
@@ -112,49 +153,148 @@ class DocumentProcessor:
                 print(f"Document processor: Skipping non-PDF file: {slide.file_type}")
                 return True
 
-            # Extract text from PDF
-            text = self.extract_pdf_text(slide.file_path)
-            if not text:
-                print(f"Document processor: No text extracted from {slide.title}")
+            pdf_path = self.resolve_path(slide.file_path)
+            if not os.path.exists(pdf_path):
+                print(f"Document processor: PDF file not found at: {pdf_path}")
                 return False
 
-            # Split text into chunks
-            chunks = self.chunk_text(text)
-            if not chunks:
-                print(f"Document processor: No chunks created from {slide.title}")
-                return False
+            progress("extracting", 0.0)
+            if page_count is None:
+                page_count = count_pdf_pages(pdf_path)
 
-            # Generate embeddings
-            embeddings = self.generate_embeddings(chunks)
-            if not embeddings:
-                print(f"Document processor: No embeddings generated for {slide.title}")
-                # Still store text chunks without embeddings as fallback
-                embeddings = [None] * len(chunks)
-
-            # Delete existing chunks for this slide (in case of reprocessing)
-            db.query(DocumentChunk).filter(DocumentChunk.slide_id == slide.id).delete()
-
-            # Store chunks and embeddings in database
-            for i, (chunk_text, embedding) in enumerate(zip(chunks, embeddings)):
-                document_chunk = DocumentChunk(
-                    slide_id=slide.id,
-                    chunk_text=chunk_text,
-                    chunk_index=i,
-                    embedding=embedding
-                )
-                db.add(document_chunk)
-
-            # Commit the vectorization to database
-            db.commit()
+            # Chunks are stored in order and committed batch by batch, so the committed ones form a prefix
+            chunks_query = db.query(DocumentChunk).filter(DocumentChunk.slide_id == slide_id)
+            resume_from = 0
+            replaced_up_to = 0
+            if resume:
+                resume_from = chunks_query.count()
+                chunks_query.filter(DocumentChunk.chunk_index >= resume_from).delete()
+                db.commit()
+                if resume_from:
+                    print(f"Document processor: Resuming {title} after {resume_from} stored chunks")
+            else:
+                # Previous chunks stay until the new ones are stored, so their embeddings can be reused
+                replaced_up_to = db.query(func.max(DocumentChunk.id)).filter(DocumentChunk.slide_id == slide_id).scalar() or 0
+
+            pages_read = 0
+
+            def pages() -> Iterator[PageText]:
+                nonlocal pages_read
+                for page in iter_pdf_pages(pdf_path, page_count):
+                    pages_read += 1
+                    yield page
+
+            chunk_count = 0
+            embedded = 0
+            reused = 0
+            batches = batched(enumerate(self.iter_chunks(pages())), settings.ingestion_batch_size)
+            for batch in batches:
+                chunk_count += len(batch)
+                batch = [(index, chunk) for index, chunk in batch if index >= resume_from]
+                if not batch:
+                    continue
 
-            # Print success message after vectorization is complete
-            print(f"Document processor: Successfully processed {slide.title} - stored {len(chunks)} chunks with embeddings")
+                rows, batch_reused, batch_embedded = self.chunk_rows(slide_id, batch, db)
+                reused += batch_reused
+                embedded += batch_embedded
+                db.execute(insert(DocumentChunk), rows)
+                db.commit()
+                progress("embedding", pages_read / page_count if page_count else 1.0)
+
+            if not chunk_count:
+                print(f"Document processor: No chunks created from {title}")
+                return False
+
+            progress("storing", 1.0)
+            if replaced_up_to:
+                chunks_query.filter(DocumentChunk.id <= replaced_up_to).delete()
+                db.commit()
+            print(f"Document processor: Successfully processed {title} - {page_count} pages, "
+                  f"{chunk_count} chunks ({chunk_count - resume_from} new: {embedded} embedded, {reused} reused)")
             return True
 
+        except ProcessingCancelled:
+            print(f"Document processor: Processing of {title} cancelled")
+            db.rollback()
+            raise
         except Exception as e:
-            print(f"Error processing document {slide.title}: {e}")
+            print(f"Error processing document {title}: {e}")
             db.rollback()
             return False
 
+    def refresh_embeddings(self, db: Session, slide_ids: Optional[Iterable[int]] = None,
+                           batch_size: int = 256, encode: Optional[Callable[[List[str]], List[np.ndarray]]] = None) -> Dict[str, int]:
+        """Bring stored chunk embeddings up to date with the current model
+
+        Only chunks with no embedding, or one recorded for another model, are touched (after a
+        model change that is everything once; afterwards nothing). Unchanged text reuses an
+        embedding already computed with the current model. encode overrides how the remaining
+        texts are embedded (e.g. across processes). Commits per batch, so it can be interrupted
+        and run again. Returns counts of chunks 'checked', 'reused' and 'embedded'.
+        """
+        if encode is None and not encoder_available(self.embedding_model):
+            print("Document processor: No embedding model available - nothing refreshed")
+            return {'checked': 0, 'reused': 0, 'embedded': 0}
+
+        model_id = embedding_model_id(self.embedding_model)
+        stale = db.query(DocumentChunk.id, DocumentChunk.chunk_text, DocumentChunk.content_hash).filter(
+            or_(
+                DocumentChunk.embedding_model.is_(None),
+                DocumentChunk.embedding_model != model_id,
+                DocumentChunk.embedding_blob.is_(None) & DocumentChunk.embedding.is_(None)
+            )
+        )
+        if slide_ids is not None:
+            stale = stale.filter(DocumentChunk.slide_id.in_(list(slide_ids)))
+
+        counts = {'checked': 0, 'reused': 0, 'embedded': 0}
+        last_id = 0
+        while True:
+            rows = stale.filter(DocumentChunk.id > last_id).order_by(DocumentChunk.id).limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            hashes = [chunk_hash or content_hash(text) for _, text, chunk_hash in rows]
+            reused = self.reusable_embeddings(hashes, db)
+            missing = list(dict.fromkeys(
+                (chunk_hash, text) for (_, text, _), chunk_hash in zip(rows, hashes) if chunk_hash not in reused
+            ))
+            if missing:
+                texts = [text for _, text in missing]
+                fresh = encode(texts) if encode is not None else self.generate_embeddings(texts)
+                if len(fresh) != len(missing):
+                    raise RuntimeError(f"Embedding failed for chunks up to {last_id}")
+                vectors = {**reused, **{chunk_hash: vector for (chunk_hash, _), vector in zip(missing, fresh)}}
+            else:
+                vectors = reused
+
+            db.execute(update(DocumentChunk), [
+                {
+                    'id': chunk_id,
+                    'content_hash': chunk_hash,
+                    'embedding_model': model_id,
+                    **embedding_columns(vectors[chunk_hash])
+                }
+                for (chunk_id, _, _), chunk_hash in zip(rows, hashes)
+            ])
+            db.commit()
+
+            counts['checked'] += len(rows)
+            counts['reused'] += sum(chunk_hash in reused for chunk_hash in hashes)
+            counts['embedded'] += len(missing)
+            print(f"Document processor: Refreshed embeddings up to chunk {last_id} - {counts}")
+        return counts
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    """Consecutive lists of up to size items"""
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, max(1, size)))
+        if not batch:
+            return
+        yield batch
+
 # Global instance
 document_processor = DocumentProcessor()
\ No newline at end of file
@@ -0,0 +1,129 @@
+import hashlib
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Type
+import numpy as np
+
+from ..core.config import settings
+
+WORD = re.compile(r"\w+")
+
+
+class EmbeddingBackend:
+    """Turns texts into fixed-size vectors for ingestion and retrieval.
+
+    Subclasses set model_name (recorded with stored embeddings) and dim, load whatever they need
+    in load(), and embed one batch in encode_batch(). encode() splits the input into batch_size
+    batches, optionally L2-normalizes the rows and returns them as the configured dtype.
+    from_settings() builds one with its own options taken from settings.
+    """
+
+    model_name = "embedding"
+    dim: Optional[int] = None
+
+    def __init__(self, batch_size: int = 64, normalize: bool = False, dtype: str = "float32"):
+        self.batch_size = max(1, batch_size)
+        self.normalize = normalize
+        self.dtype = np.dtype(dtype)
+
+    @classmethod
+    def from_settings(cls, **options) -> "EmbeddingBackend":
+        return cls(**options)
+
+    def load(self):
+        """Prepare the backend for encoding; raises if it cannot be used"""
+
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=self.dtype)
+
+        vectors = np.vstack([
+            np.asarray(self.encode_batch(texts[start:start + self.batch_size]), dtype=np.float32)
+            for start in range(0, len(texts), self.batch_size)
+        ])
+        if self.normalize:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            vectors /= norms
+        return vectors.astype(self.dtype, copy=False)
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """A sentence-transformers model; weights are downloaded on first load if not cached"""
+
+    def __init__(self, model_name: str, **kwargs):
+        super().__init__(**kwargs)
+        self.model_name = model_name
+        self._model = None
+
+    @classmethod
+    def from_settings(cls, **options) -> "SentenceTransformerBackend":
+        return cls(settings.embedding_model_name, **options)
+
+    def load(self):
+        from sentence_transformers import SentenceTransformer
+        self._model = SentenceTransformer(self.model_name)
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        return self._model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+
+
+@lru_cache(maxsize=65536)
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class HashingBackend(EmbeddingBackend):
+    """Deterministic encoder without model weights, for CI and offline installs.
+
+    Words and word bigrams are hashed into dim signed buckets with log-scaled counts - a fixed
+    random +/-1 projection of the bag of words. Texts sharing vocabulary get similar vectors,
+    which is enough to exercise ingestion and retrieval end to end, but there is no semantics.
+    Results are identical across processes and machines.
+    """
+
+    def __init__(self, dim: int = 384, **kwargs):
+        super().__init__(**kwargs)
+        self.dim = dim
+        self.model_name = f"hashing-{dim}"
+
+    @classmethod
+    def from_settings(cls, **options) -> "HashingBackend":
+        return cls(settings.embedding_dim, **options)
+
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = WORD.findall(text.lower())
+            features = Counter(words)
+            features.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+            for feature, count in features.items():
+                bucket = _feature_hash(feature)
+                sign = 1.0 if bucket >> 63 else -1.0
+                vectors[row, bucket % self.dim] += sign * (1.0 + math.log(count))
+        return vectors
+
+
+BACKENDS: Dict[str, Type[EmbeddingBackend]] = {
+    "sentence-transformers": SentenceTransformerBackend,
+    "hashing": HashingBackend,
+}
+
+
+def create_backend(name: Optional[str] = None) -> EmbeddingBackend:
+    """The embedding backend selected in settings (or by name), configured from settings"""
+    name = (name or settings.embedding_backend).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}' (choose from: {', '.join(BACKENDS)})")
+    return BACKENDS[name].from_settings(
+        batch_size=settings.embedding_batch_size,
+        normalize=settings.embedding_normalize,
+        dtype=settings.embedding_dtype,
+    )
@@ -0,0 +1,43 @@
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+from ..core.config import settings
+
+# Embeddings are persisted as raw little-endian float32, 4 bytes per dimension
+EMBEDDING_DTYPE = np.dtype('<f4')
+
+
+def pack_embedding(vector) -> bytes:
+    """Serialize a vector to raw float32 bytes for a LargeBinary column"""
+    return np.ascontiguousarray(vector, dtype=EMBEDDING_DTYPE).tobytes()
+
+
+def unpack_embedding(blob: bytes) -> np.ndarray:
+    """Read-only float32 view over a stored blob (no copy)"""
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+
+
+def stack_embeddings(blobs: Sequence[bytes]) -> np.ndarray:
+    """Turn equally sized blobs into one (n, dim) float32 matrix with a single buffer read"""
+    if not blobs:
+        return np.zeros((0, 0), dtype=np.float32)
+    dim = len(blobs[0]) // EMBEDDING_DTYPE.itemsize
+    return np.frombuffer(b''.join(blobs), dtype=EMBEDDING_DTYPE).reshape(len(blobs), dim)
+
+
+def stored_vector(embedding_json: Optional[List[float]], embedding_blob: Optional[bytes]) -> Optional[np.ndarray]:
+    """A row's vector from whichever column holds it (binary preferred, legacy JSON otherwise)"""
+    if embedding_blob:
+        return unpack_embedding(embedding_blob)
+    if embedding_json:
+        return np.asarray(embedding_json, dtype=np.float32)
+    return None
+
+
+def embedding_columns(vector) -> Dict[str, Any]:
+    """Column values for storing a vector according to settings.embedding_storage"""
+    if vector is None:
+        return {'embedding': None, 'embedding_blob': None}
+    if settings.embedding_storage == 'json':
+        return {'embedding': np.asarray(vector, dtype=np.float32).tolist(), 'embedding_blob': None}
+    return {'embedding': None, 'embedding_blob': pack_embedding(vector)}
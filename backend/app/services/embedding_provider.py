@@ -0,0 +1,109 @@
+import threading
+from typing import Optional
+import numpy as np
+
+from .embedding_backends import EmbeddingBackend, create_backend
+
+
+class EmbeddingProvider:
+    """Process-wide embedding backend shared by ingestion and retrieval.
+
+    The backend (and e.g. the sentence_transformers import itself) is only loaded on first use or
+    by warm_up_in_background(), so workers can start serving requests such as /health immediately.
+    """
+
+    def __init__(self, backend: EmbeddingBackend):
+        self.backend = backend
+        self.model_name = backend.model_name
+        self._model: Optional[EmbeddingBackend] = None
+        self._load_error: Optional[str] = None
+        self._loading = False
+        self._lock = threading.Lock()
+
+    def get_model(self) -> Optional[EmbeddingBackend]:
+        """Return the loaded backend, loading it on first call; None if it cannot be loaded"""
+        if self._model is not None or self._load_error is not None:
+            return self._model
+
+        with self._lock:
+            if self._model is None and self._load_error is None:
+                self._loading = True
+                try:
+                    self.backend.load()
+                    self._model = self.backend
+                    print(f"Embedding provider: Loaded model {self.model_name}")
+                except Exception as e:
+                    print(f"Warning: Failed to load embedding model {self.model_name}: {e} - "
+                          f"documents and questions will not be embedded (EMBEDDING_BACKEND=hashing works offline)")
+                    self._load_error = str(e)
+                finally:
+                    self._loading = False
+        return self._model
+
+    def available(self) -> bool:
+        return self.get_model() is not None
+
+    def encode(self, texts) -> np.ndarray:
+        model = self.get_model()
+        if model is None:
+            raise RuntimeError(f"Embedding model {self.model_name} is not available: {self._load_error}")
+        return model.encode(texts)
+
+    def warm_up_in_background(self) -> threading.Thread:
+        """Start loading the model on a daemon thread and return it"""
+        thread = threading.Thread(target=self.get_model, name="embedding-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def dim(self) -> Optional[int]:
+        """Vector size, once known (the hashing backend knows it up front, models after loading)"""
+        return self.backend.dim
+
+    @property
+    def is_ready(self) -> bool:
+        return self._model is not None
+
+    def status(self) -> str:
+        if self._model is not None:
+            return "ready"
+        if self._load_error is not None:
+            return "failed"
+        return "loading" if self._loading else "not_loaded"
+
+
+def embedding_model_id(encoder) -> str:
+    """Name recorded with stored embeddings, so vectors from a different model are recognised as stale"""
+    return getattr(encoder, 'model_name', None) or type(encoder).__name__
+
+
+def embedding_dim(encoder) -> Optional[int]:
+    """Size of the encoder's vectors, or None while it is not known yet"""
+    return getattr(encoder, 'dim', None)
+
+
+def encoder_ready(encoder) -> bool:
+    """Whether an encoder can be used right now without waiting for a model load.
+
+    A provider that has not started loading yet is warmed up in the background, so callers can
+    serve this request some other way and use embeddings once the model is in memory.
+    """
+    if encoder is None:
+        return False
+    if not isinstance(encoder, EmbeddingProvider) or encoder.is_ready:
+        return True
+    if encoder.status() == "not_loaded":
+        encoder.warm_up_in_background()
+    return False
+
+
+def encoder_available(encoder) -> bool:
+    """Whether an encoder can be used: providers load on demand, injected encoders are assumed ready"""
+    if encoder is None:
+        return False
+    available = getattr(encoder, "available", None)
+    return available() if callable(available) else True
+
+
+# Global instance
+embedding_provider = EmbeddingProvider(create_backend())
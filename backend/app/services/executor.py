@@ -0,0 +1,15 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from ..core.config import settings
+
+# Dedicated pool for CPU-bound retrieval work (embedding, vector and keyword search), kept separate
+# from the default threadpool that serves sync endpoints so neither can starve the other
+retrieval_executor = ThreadPoolExecutor(max_workers=settings.retrieval_workers, thread_name_prefix="retrieval")
+
+
+async def run_in_retrieval_executor(func, *args, **kwargs):
+    """Run a blocking callable on the retrieval executor without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(retrieval_executor, functools.partial(func, *args, **kwargs))
@@ -0,0 +1,232 @@
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set, Tuple
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.models import DocumentChunk, IngestionJob, Slide
+from .document_processor import document_processor, ProcessingCancelled
+from .rag_service import rag_service
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Share of overall progress at which each processing stage starts; embedding dominates
+STAGE_PROGRESS = {
+    "extracting": (0.0, 0.1),
+    "chunking": (0.1, 0.2),
+    "embedding": (0.2, 0.9),
+    "storing": (0.9, 0.95),
+    "indexing": (0.95, 1.0),
+}
+
+# Only persist progress when it moved at least this much, to keep job-row writes cheap
+PROGRESS_STEP = 0.05
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class IngestionQueue:
+    """Background slide processing with a small worker pool and a persisted job table.
+
+    Uploads create an IngestionJob row and return; worker threads extract, chunk, embed and
+    index the slide, recording stage and progress on the job as they go. Failed attempts are
+    retried after a delay up to max_attempts, resuming after the chunks already stored. Deleting a
+    slide cancels its job: the worker stops at the next progress report and discards anything it
+    stored (a job waiting for its retry is dropped when it finds its row gone). Jobs left queued or
+    running by a previous process are picked up again by requeue_pending() at startup.
+    """
+
+    def __init__(self, workers: int = 2, max_attempts: int = 3, retry_delay_seconds: float = 5):
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay_seconds = retry_delay_seconds
+        self._queue: "queue.Queue[Optional[Tuple[int, int]]]" = queue.Queue()
+        self._threads = []
+        # Slide id -> jobs of it submitted to this process and not finished yet
+        self._active: Dict[int, int] = {}
+        # Slides deleted while a job of theirs is active; forgotten once none is
+        self._cancelled: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"ingestion-{number}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            print(f"Ingestion queue: Started {self.workers} workers")
+
+    def shutdown(self):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+
+    def enqueue(self, slide: Slide, db) -> IngestionJob:
+        """Create a queued job for the slide and hand it to the workers"""
+        job = IngestionJob(slide_id=slide.id, status=QUEUED, stage=None, progress=0.0, attempts=0, chunks_created=0)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        with self._lock:
+            self._cancelled.discard(slide.id)
+        self.submit(job.id, slide.id)
+        return job
+
+    def submit(self, job_id: int, slide_id: int):
+        self.start()
+        with self._lock:
+            self._active[slide_id] = self._active.get(slide_id, 0) + 1
+        self._queue.put((job_id, slide_id))
+
+    def cancel(self, slide_id: int):
+        """Stop any processing of the slide; call before deleting it
+
+        Only recorded while a job of the slide is queued or running here: a job waiting for a
+        retry, or one of another process, finds its row deleted instead.
+        """
+        with self._lock:
+            if slide_id in self._active:
+                self._cancelled.add(slide_id)
+
+    def is_cancelled(self, slide_id: int) -> bool:
+        with self._lock:
+            return slide_id in self._cancelled
+
+    def requeue_pending(self):
+        """Resubmit jobs that were queued or interrupted mid-run when the last process stopped"""
+        db = SessionLocal()
+        try:
+            jobs = db.query(IngestionJob).filter(IngestionJob.status.in_([QUEUED, RUNNING])).order_by(IngestionJob.id).all()
+            for job in jobs:
+                job.status = QUEUED
+            db.commit()
+            pending = [(job.id, job.slide_id) for job in jobs]
+        finally:
+            db.close()
+
+        for job_id, slide_id in pending:
+            self.submit(job_id, slide_id)
+        if pending:
+            print(f"Ingestion queue: Requeued {len(pending)} unfinished jobs")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queued': self._queue.qsize(),
+                'slides_in_progress': len(self._active),
+                'cancelling': len(self._cancelled),
+            }
+
+    def _update_job(self, job_id: int, **fields) -> bool:
+        """Write job fields in a short session of their own; False if the job no longer exists"""
+        db = SessionLocal()
+        try:
+            updated = db.query(IngestionJob).filter(IngestionJob.id == job_id).update(fields)
+            db.commit()
+            return bool(updated)
+        finally:
+            db.close()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            job_id, slide_id = item
+            try:
+                self._run(job_id)
+            except Exception as e:
+                print(f"Ingestion queue: Unexpected error in job {job_id}: {e}")
+            finally:
+                with self._lock:
+                    self._active[slide_id] -= 1
+                    if not self._active[slide_id]:
+                        del self._active[slide_id]
+                        self._cancelled.discard(slide_id)
+                self._queue.task_done()
+
+    def _run(self, job_id: int):
+        db = SessionLocal()
+        try:
+            job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+            if job is None or job.status not in (QUEUED, RUNNING):
+                return
+            slide = db.query(Slide).filter(Slide.id == job.slide_id).first()
+            if slide is None or self.is_cancelled(job.slide_id):
+                db.delete(job)
+                db.commit()
+                return
+
+            attempt = (job.attempts or 0) + 1
+            slide_id, class_id, title = slide.id, slide.class_id, slide.title
+            job.status = RUNNING
+            job.attempts = attempt
+            job.started_at = _now()
+            job.error = None
+            db.commit()
+            print(f"Ingestion queue: Processing slide {title} (job {job_id}, attempt {attempt})")
+
+            last_reported = {'stage': None, 'progress': 0.0}
+
+            def report(stage: str, fraction: float):
+                if self.is_cancelled(slide_id):
+                    raise ProcessingCancelled()
+                start, end = STAGE_PROGRESS.get(stage, (0.0, 1.0))
+                overall = start + (end - start) * min(max(fraction, 0.0), 1.0)
+                if stage != last_reported['stage'] or overall - last_reported['progress'] >= PROGRESS_STEP:
+                    last_reported.update(stage=stage, progress=overall)
+                    if not self._update_job(job_id, stage=stage, progress=round(overall, 3)):
+                        raise ProcessingCancelled()
+
+            cancelled = False
+            try:
+                success = document_processor.process_document(slide, db, progress=report, resume=True)
+                if success:
+                    report("indexing", 0.0)
+            except ProcessingCancelled:
+                success, cancelled = False, True
+
+            if cancelled or self.is_cancelled(slide_id):
+                # The slide was deleted meanwhile; drop chunks a late commit may have left behind
+                db.query(DocumentChunk).filter(DocumentChunk.slide_id == slide_id).delete()
+                db.commit()
+                rag_service.remove_slide(class_id, slide_id)
+                print(f"Ingestion queue: Job {job_id} cancelled")
+                return
+
+            if success:
+                rag_service.index_slide(slide, db)
+                chunks_created = db.query(DocumentChunk).filter(DocumentChunk.slide_id == slide_id).count()
+                self._update_job(job_id, status=DONE, stage=None, progress=1.0,
+                                 chunks_created=chunks_created, finished_at=_now())
+                print(f"Ingestion queue: Slide {title} ready - {chunks_created} searchable chunks")
+                return
+
+            error = f"Processing failed during {last_reported['stage'] or 'setup'} (attempt {attempt} of {self.max_attempts})"
+            if attempt < self.max_attempts:
+                self._update_job(job_id, status=QUEUED, error=error)
+                print(f"Ingestion queue: {error} - retrying in {self.retry_delay_seconds}s")
+                timer = threading.Timer(self.retry_delay_seconds, self.submit, [job_id, slide_id])
+                timer.daemon = True
+                timer.start()
+            else:
+                self._update_job(job_id, status=FAILED, error=error, finished_at=_now())
+                print(f"Ingestion queue: Giving up on slide {title}: {error}")
+        finally:
+            db.close()
+
+
+# Global instance
+ingestion_queue = IngestionQueue(
+    settings.ingestion_workers, settings.ingestion_max_attempts, settings.ingestion_retry_delay_seconds
+)
@@ -0,0 +1,188 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Keeps acronyms, form numbers and product codes together ("4506-c", "w-2", "1003", "fha/va")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-/.][a-z0-9]+)*")
+
+# (key, text, class_ids, slide_id) as taken by LexicalIndex.add
+Document = Tuple[Tuple[str, int], str, Iterable[int], Optional[int]]
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it its me my of on or the this to
+was what when where which who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms of text; compound tokens also contribute their parts ("w-2" -> "w-2", "w", "2")"""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in re.split(r"[-/.]", token) if part and part not in STOPWORDS)
+    return terms
+
+
+class LexicalIndex:
+    """Incrementally maintained BM25 inverted index over chunk text and flashcards.
+
+    Documents are keyed by (kind, item_id) like the vector index and remember which classes
+    (and, for chunks, which slide) they belong to so results can be restricted per user and
+    whole slides can be removed at once.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[Tuple[str, int], int]] = defaultdict(dict)
+        self.doc_terms: Dict[Tuple[str, int], Counter] = {}
+        self.doc_lengths: Dict[Tuple[str, int], int] = {}
+        self.doc_classes: Dict[Tuple[str, int], Set[int]] = {}
+        self.slide_docs: Dict[int, Set[Tuple[str, int]]] = defaultdict(set)
+        self.doc_slide: Dict[Tuple[str, int], int] = {}
+        self.total_length = 0
+        self.is_built = False
+        self.built_at: Optional[datetime] = None
+        self._lock = threading.RLock()
+
+    def clear(self):
+        with self._lock:
+            self.postings.clear()
+            self.doc_terms.clear()
+            self.doc_lengths.clear()
+            self.doc_classes.clear()
+            self.slide_docs.clear()
+            self.doc_slide.clear()
+            self.total_length = 0
+            self.is_built = False
+            self.built_at = None
+
+    def replace(self, documents: Iterable[Document]):
+        """Rebuild the whole index from (key, text, class_ids, slide_id) documents"""
+        with self._lock:
+            self.clear()
+            for key, text, class_ids, slide_id in documents:
+                self.add(key, text, class_ids, slide_id)
+            self.is_built = True
+            self.built_at = datetime.now(timezone.utc)
+
+    def ensure_built(self, documents: Callable[[], Iterable[Document]]) -> bool:
+        """Build from documents() unless already built; True if it was built now"""
+        with self._lock:
+            if self.is_built:
+                return False
+            self.replace(documents())
+            return True
+
+    def add(self, key: Tuple[str, int], text: str, class_ids: Iterable[int], slide_id: Optional[int] = None):
+        """Index (or re-index) one document"""
+        with self._lock:
+            self.remove(key)
+            terms = Counter(tokenize(text))
+            class_ids = set(class_ids)
+            if not terms or not class_ids:
+                return
+
+            for term, frequency in terms.items():
+                self.postings[term][key] = frequency
+            self.doc_terms[key] = terms
+            self.doc_lengths[key] = sum(terms.values())
+            self.doc_classes[key] = class_ids
+            self.total_length += self.doc_lengths[key]
+            if slide_id is not None:
+                self.slide_docs[slide_id].add(key)
+                self.doc_slide[key] = slide_id
+
+    def remove(self, key: Tuple[str, int]):
+        with self._lock:
+            terms = self.doc_terms.pop(key, None)
+            if terms is None:
+                return
+            for term in terms:
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(key, None)
+                    if not postings:
+                        del self.postings[term]
+            self.total_length -= self.doc_lengths.pop(key)
+            self.doc_classes.pop(key, None)
+            slide_id = self.doc_slide.pop(key, None)
+            if slide_id is not None:
+                keys = self.slide_docs.get(slide_id)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.slide_docs[slide_id]
+
+    def remove_slide(self, slide_id: int) -> int:
+        with self._lock:
+            keys = self.slide_docs.pop(slide_id, set())
+            for key in keys:
+                self.remove(key)
+            return len(keys)
+
+    def drop_class(self, class_id: int):
+        """Forget a class; documents that belong to no other class are removed"""
+        with self._lock:
+            for key in [key for key, classes in self.doc_classes.items() if class_id in classes]:
+                classes = self.doc_classes[key]
+                classes.discard(class_id)
+                if not classes:
+                    self.remove(key)
+
+    def search(self, query: str, class_ids: Optional[Iterable[int]], top_k: int) -> List[Tuple[str, int, int, float]]:
+        """Top-k (kind, item_id, class_id, bm25_score) among documents of the given classes (all when None)"""
+        allowed = None if class_ids is None else set(class_ids)
+        scores: Dict[Tuple[str, int], float] = defaultdict(float)
+
+        with self._lock:
+            doc_count = len(self.doc_terms)
+            if doc_count == 0:
+                return []
+            average_length = self.total_length / doc_count
+
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, frequency in postings.items():
+                    if allowed is not None and allowed.isdisjoint(self.doc_classes[key]):
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[key] / average_length)
+                    scores[key] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            results = []
+            for (kind, item_id), score in ranked:
+                classes = self.doc_classes[(kind, item_id)]
+                class_id = min(classes if allowed is None else classes & allowed)
+                results.append((kind, item_id, class_id, score))
+            return results
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'documents': len(self.doc_terms), 'terms': len(self.postings)}
+
+
+def reciprocal_rank_fusion(result_lists: List[Tuple[float, List[Tuple[str, int, int, float]]]], top_k: int, k: int = 60) -> List[Tuple[str, int, int, float]]:
+    """Fuse ranked (kind, item_id, class_id, score) lists given as (weight, results) pairs.
+
+    Each list contributes weight / (k + rank) per item, so differently scaled scores (cosine
+    vs. BM25) can be combined without calibration. Returns fused scores in the last field.
+    """
+    fused: Dict[Tuple[str, int], float] = defaultdict(float)
+    class_of: Dict[Tuple[str, int], int] = {}
+    for weight, results in result_lists:
+        for rank, (kind, item_id, class_id, _) in enumerate(results):
+            fused[(kind, item_id)] += weight / (k + rank + 1)
+            class_of.setdefault((kind, item_id), class_id)
+
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [(kind, item_id, class_of[(kind, item_id)], score) for (kind, item_id), score in ranked]
@@ -0,0 +1,109 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from ..core.config import settings
+
+
+class LLMBusyError(Exception):
+    """Raised when no LLM slot frees up within settings.llm_queue_timeout_seconds"""
+
+
+# Bounds the number of in-flight completions per worker so chat cannot starve everything else
+_llm_semaphore = asyncio.Semaphore(settings.llm_max_concurrency)
+
+
+@asynccontextmanager
+async def llm_slot():
+    """Hold one of the worker's LLM concurrency slots for the duration of a completion"""
+    try:
+        await asyncio.wait_for(_llm_semaphore.acquire(), timeout=settings.llm_queue_timeout_seconds)
+    except asyncio.TimeoutError:
+        raise LLMBusyError("Too many chat requests in progress, please try again shortly")
+    try:
+        yield
+    finally:
+        _llm_semaphore.release()
+
+
+class FakeChatCompletions:
+    """Offline stand-in for ``AsyncOpenAI().chat.completions`` that mimics the OpenAI response shapes.
+
+    The reply is deterministic (it quotes the question and counts the course materials in the
+    system prompt) and is emitted word by word with a configurable delay, so streaming, latency
+    and persistence can be exercised without network access or an API key.
+    """
+
+    def __init__(self, token_delay_seconds: float = 0.0, first_token_delay_seconds: float = 0.0):
+        self.token_delay_seconds = token_delay_seconds
+        self.first_token_delay_seconds = first_token_delay_seconds
+
+    def reply_tokens(self, messages: List[Dict[str, str]], max_tokens: int) -> List[str]:
+        question = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+        sources = system_prompt.count("[FLASHCARD]") + system_prompt.count("[DOCUMENT_CHUNK]")
+        reply = (
+            f"This is an offline test response to: \"{question}\". "
+            f"It was generated with {sources} course material excerpts in context."
+        )
+        words = reply.split(" ")
+        return [word if i == 0 else f" {word}" for i, word in enumerate(words)][:max_tokens]
+
+    async def create(self, model: str, messages: List[Dict[str, str]], max_tokens: int = 500, stream: bool = False, **kwargs):
+        tokens = self.reply_tokens(messages, max_tokens)
+        if stream:
+            return self._stream(tokens)
+
+        await asyncio.sleep(self.first_token_delay_seconds + self.token_delay_seconds * len(tokens))
+        message = SimpleNamespace(role="assistant", content="".join(tokens))
+        return SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")])
+
+    async def _stream(self, tokens: List[str]) -> AsyncIterator[SimpleNamespace]:
+        await asyncio.sleep(self.first_token_delay_seconds)
+        for token in tokens:
+            await asyncio.sleep(self.token_delay_seconds)
+            delta = SimpleNamespace(content=token)
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)])
+        yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=None), finish_reason="stop")])
+
+
+class FakeChatClient:
+    """AsyncOpenAI-compatible client exposing only ``chat.completions.create``"""
+
+    def __init__(self, token_delay_seconds: float = 0.0, first_token_delay_seconds: float = 0.0):
+        self.chat = SimpleNamespace(completions=FakeChatCompletions(token_delay_seconds, first_token_delay_seconds))
+
+    async def close(self):
+        pass
+
+
+def create_chat_client(transport: Optional[httpx.AsyncBaseTransport] = None):
+    """Async chat client for settings.llm_provider: OpenAI (needs an API key) or the offline fake
+
+    The OpenAI client shares one pooled HTTP connection pool per worker and applies explicit
+    connect/read timeouts; close it with ``await client.close()`` on shutdown. transport replaces
+    the network (e.g. an httpx.ASGITransport around an in-process stub server).
+    """
+    if settings.llm_provider == "fake":
+        print("Chat: Using offline fake LLM client")
+        return FakeChatClient(settings.fake_llm_token_delay_seconds, settings.fake_llm_first_token_delay_seconds)
+    if settings.openai_api_key:
+        http_client = httpx.AsyncClient(
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_connections
+            ),
+            timeout=httpx.Timeout(settings.llm_timeout_seconds, connect=settings.llm_connect_timeout_seconds)
+        )
+        return AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url or None,
+            http_client=http_client,
+            max_retries=settings.llm_max_retries
+        )
+    return None
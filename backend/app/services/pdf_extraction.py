@@ -0,0 +1,118 @@
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, NamedTuple, Optional
+import pypdf
+
+from ..core.config import settings
+
+# Pages per worker task: small enough to keep uneven pages balanced and bound memory,
+# large enough that each task's PDF parse is shared by several pages
+RANGE_PAGES = 8
+
+
+class PageText(NamedTuple):
+    number: int  # 1-based page number
+    text: str
+    seconds: float  # Time spent extracting this page
+
+
+def iter_page_range(pdf_path: str, start: int, end: int) -> Iterator[PageText]:
+    """Extract pages [start, end) of a PDF one at a time"""
+    with open(pdf_path, 'rb') as file:
+        reader = pypdf.PdfReader(file)
+        for index in range(start, end):
+            started = time.perf_counter()
+            try:
+                text = reader.pages[index].extract_text() or ""
+            except Exception as e:
+                print(f"Document processor: Failed to extract page {index + 1} of {pdf_path}: {e}")
+                text = ""
+            yield PageText(index + 1, text, time.perf_counter() - started)
+
+
+def extract_page_range(pdf_path: str, start: int, end: int) -> List[PageText]:
+    """Extract pages [start, end) of a PDF; runs inside worker processes, so it opens the file itself"""
+    return list(iter_page_range(pdf_path, start, end))
+
+
+def extract_worker_count() -> int:
+    return settings.pdf_extract_workers if settings.pdf_extract_workers > 0 else (os.cpu_count() or 1)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_extract_pool() -> ProcessPoolExecutor:
+    """Shared process pool for page extraction, created on first use.
+
+    Uses the spawn start method: forking a process that already runs model and ingestion
+    threads can deadlock the child.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=extract_worker_count(), mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_extract_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    with open(pdf_path, 'rb') as file:
+        return len(pypdf.PdfReader(file).pages)
+
+
+def iter_pdf_pages(pdf_path: str, page_count: Optional[int] = None) -> Iterator[PageText]:
+    """Text of every page in order, extracted across the process pool for large PDFs
+
+    PDFs with fewer than settings.pdf_parallel_min_pages pages (or a single worker configured)
+    are read in-process, where pool overhead would outweigh the gain. At most two ranges of
+    RANGE_PAGES pages per worker are in flight at once, so memory depends on the worker count,
+    not on the length of the document. Pass page_count when it is already known, to save
+    parsing the file once more just to count its pages.
+    """
+    if page_count is None:
+        page_count = count_pdf_pages(pdf_path)
+
+    workers = extract_worker_count()
+    if workers <= 1 or page_count < settings.pdf_parallel_min_pages:
+        yield from iter_page_range(pdf_path, 0, page_count)
+        return
+
+    ranges = ((start, min(start + RANGE_PAGES, page_count)) for start in range(0, page_count, RANGE_PAGES))
+    next_page = 0
+    in_flight = deque()
+    try:
+        pool = get_extract_pool()
+        for start, end in itertools.islice(ranges, workers * 2):
+            in_flight.append(pool.submit(extract_page_range, pdf_path, start, end))
+        # Results are joined in submission (page) order regardless of which worker finished first
+        while in_flight:
+            pages = in_flight.popleft().result()
+            for start, end in itertools.islice(ranges, 1):
+                in_flight.append(pool.submit(extract_page_range, pdf_path, start, end))
+            for page in pages:
+                yield page
+                next_page = page.number
+    except BrokenProcessPool as e:
+        print(f"Document processor: Extraction pool failed ({e}); extracting the remaining pages serially")
+        shutdown_extract_pool()
+        yield from iter_page_range(pdf_path, next_page, page_count)
+    finally:
+        # Don't leave queued ranges running when the consumer stops early (e.g. cancellation)
+        for future in in_flight:
+            future.cancel()
+
@@ -0,0 +1,68 @@
+from typing import Optional, Tuple, Union
+import numpy as np
+
+# In-memory vector precisions: bytes per dimension are 4, 2 and 1 (+ one float32 scale per int8 row)
+PRECISIONS = {
+    'float32': np.float32,
+    'float16': np.float16,
+    'int8': np.int8,
+}
+
+# Quantized rows are widened to float32 this many at a time while scoring (bounds temporary memory)
+SCORE_BLOCK_ROWS = 4096
+
+Rows = Union[slice, np.ndarray]
+
+
+def precision_dtype(precision: str) -> np.dtype:
+    try:
+        return np.dtype(PRECISIONS[precision])
+    except KeyError:
+        raise ValueError(f"Unknown vector precision '{precision}' (choose from: {', '.join(PRECISIONS)})")
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-row symmetric int8 codes and float32 scales, so that row ~= codes * scale"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.zeros(0, dtype=np.float32)
+    scales = scales.astype(np.float32)
+    safe = np.where(scales > 0, scales, 1.0)
+    codes = np.clip(np.rint(vectors / safe[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def encode_rows(vectors: np.ndarray, dtype: np.dtype) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """float32 rows in the storage dtype, plus per-row scales for int8 (None otherwise)"""
+    if dtype == np.int8:
+        return quantize_int8(vectors)
+    return np.asarray(vectors, dtype=dtype), None
+
+
+def decode_rows(matrix: np.ndarray, scales: Optional[np.ndarray], rows: Rows = slice(None)) -> np.ndarray:
+    """float32 copy of the selected rows of a stored matrix"""
+    decoded = matrix[rows].astype(np.float32)
+    if scales is not None:
+        decoded *= scales[rows][:, None]
+    return decoded
+
+
+def score_rows(matrix: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray,
+               rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """Dot product of a float32 query with every (or the selected) row of a float32, float16 or int8 matrix
+
+    float32 is a single BLAS call. Quantized rows are widened block by block, so no full-size
+    float32 copy is ever made; for int8 the per-row scale is applied to the scores rather than
+    to the rows (codes . q * scale == (codes * scale) . q).
+    """
+    if matrix.dtype == np.float32:
+        return matrix @ query if rows is None else matrix[rows] @ query
+
+    count = len(matrix) if rows is None else len(rows)
+    scores = np.empty(count, dtype=np.float32)
+    for start in range(0, count, SCORE_BLOCK_ROWS):
+        end = min(start + SCORE_BLOCK_ROWS, count)
+        block = matrix[start:end] if rows is None else matrix[rows[start:end]]
+        scores[start:end] = block.astype(np.float32) @ query
+    if scales is not None:
+        scores *= scales if rows is None else scales[rows]
+    return scores
@@ -0,0 +1,75 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a question used as the cache key (case, spacing and trailing punctuation ignored)"""
+    return re.sub(r'\s+', ' ', query).strip().lower().rstrip('?!. ')
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU cache of query embeddings keyed by normalized query text, with optional TTL"""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, embedding = entry
+                if not self.ttl_seconds or time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, embedding: np.ndarray):
+        if self.max_size <= 0:
+            return
+        embedding = np.array(embedding, dtype=np.float32)
+        embedding.setflags(write=False)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, query: str, compute: Callable[[str], np.ndarray]) -> np.ndarray:
+        """Cached embedding for the query, computing it from the normalized text on a miss"""
+        key = normalize_query(query)
+        embedding = self.get(key)
+        if embedding is None:
+            embedding = compute(key)
+            self.put(key, embedding)
+        return embedding
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -1,122 +1,393 @@
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterable, List, Tuple
+from sqlalchemy.orm import Session, selectinload
 import numpy as np
 
-from ..models.models import User, Class, Flashcard, DocumentChunk
+from ..models.models import User, Class, Flashcard, DocumentChunk, Slide, class_users, class_flashcards
 from ..core.config import settings
+from .vector_index import VectorIndex, CHUNK, FLASHCARD, ENCODE_BATCH_SIZE, flashcard_text, normalize_rows
+from .embedding_codec import pack_embedding
+from .embedding_provider import embedding_provider, embedding_model_id, encoder_available, encoder_ready
+from .lexical_index import LexicalIndex, reciprocal_rank_fusion
+from .query_cache import QueryEmbeddingCache
+from .context_cache import UserContextCache
+from .answer_cache import AnswerCache, context_fingerprint
+from .context_packer import estimate_tokens, pack_context
+from .chunking import format_pages
 
 class RAGService:
-    def __init__(self):
-        try:
-            # Use a lightweight, fast sentence transformer model
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        except Exception as e:
-            print(f"Warning: Failed to load embedding model: {e}")
-            self.embedding_model = None
-
-    def get_user_context(self, user: User, db: Session) -> Dict[str, List[str]]:
-        """Get all relevant context for a user (flashcards and document chunks from enrolled classes)"""
-        context = {
-            'flashcards': [],
-            'document_chunks': []
+    def __init__(self, encoder=None):
+        # Anything with an encode(texts) method; defaults to the shared, lazily loaded model
+        self.embedding_model = encoder if encoder is not None else embedding_provider
+
+        # Repeated questions skip the encoder entirely
+        self.query_cache = QueryEmbeddingCache(settings.query_cache_size, settings.query_cache_ttl_seconds)
+
+        # Consecutive messages from the same user reuse their resolved class set and candidates
+        self.context_cache = UserContextCache(settings.context_cache_size, settings.context_cache_ttl_seconds)
+
+        # Generated answers, reused for near-identical questions over the same retrieved materials
+        self.answer_cache = AnswerCache(
+            settings.answer_cache_size, settings.answer_cache_ttl_seconds, settings.answer_cache_similarity
+        )
+
+        # Per-class vector shards and a BM25 keyword index, built at startup and updated incrementally by the API
+        self.index = VectorIndex(encoder=self.embedding_model)
+        self.lexical_index = LexicalIndex()
+
+    def ensure_indexes(self, db: Session):
+        """Build the vector and keyword indexes if that has not happened yet"""
+        self.index.ensure_built(db)
+        if self.lexical_index.ensure_built(lambda: self._lexical_documents(db)):
+            print(f"Lexical index: Built - {self.lexical_index.stats()}")
+
+    def _lexical_documents(self, db: Session):
+        """Every active chunk and flashcard as (key, text, class_ids, slide_id) for the keyword index"""
+        chunk_rows = db.query(
+            DocumentChunk.id, DocumentChunk.slide_id, Slide.class_id, DocumentChunk.chunk_text
+        ).join(
+            Slide, DocumentChunk.slide_id == Slide.id
+        ).join(
+            Class, Slide.class_id == Class.id
+        ).filter(Class.is_active == True).yield_per(1000)
+
+        for chunk_id, slide_id, class_id, chunk_text in chunk_rows:
+            yield (CHUNK, chunk_id), chunk_text, [class_id], slide_id
+
+        flashcards = db.query(Flashcard).options(
+            selectinload(Flashcard.assigned_classes)
+        ).filter(Flashcard.is_active == True).all()
+        for flashcard in flashcards:
+            yield self._flashcard_document(flashcard)
+
+    def _flashcard_document(self, flashcard: Flashcard):
+        class_ids = [class_obj.id for class_obj in flashcard.assigned_classes if class_obj.is_active]
+        return (FLASHCARD, flashcard.id), flashcard_text(flashcard.term, flashcard.definition, flashcard.category), class_ids, None
+
+    def index_slide(self, slide: Slide, db: Session):
+        """Make a freshly processed slide's chunks searchable"""
+        self.index.add_slide(slide, db)
+        self.lexical_index.remove_slide(slide.id)
+        chunk_rows = db.query(DocumentChunk.id, DocumentChunk.chunk_text).filter(DocumentChunk.slide_id == slide.id).all()
+        for chunk_id, chunk_text in chunk_rows:
+            self.lexical_index.add((CHUNK, chunk_id), chunk_text, [slide.class_id], slide.id)
+        self.invalidate_classes([slide.class_id])
+
+    def remove_slide(self, class_id: int, slide_id: int):
+        self.index.remove_slide(class_id, slide_id)
+        self.lexical_index.remove_slide(slide_id)
+        self.invalidate_classes([class_id])
+
+    def drop_class(self, class_id: int):
+        self.index.drop_class(class_id)
+        self.lexical_index.drop_class(class_id)
+        self.invalidate_classes([class_id])
+
+    def sync_flashcard(self, flashcard: Flashcard, previous_class_ids: Iterable[int] = ()):
+        """Re-index a flashcard after its text, status or class assignments changed
+
+        previous_class_ids are the classes it was assigned to before the change, so their
+        users' cached contexts and answers are dropped as well as those of the current classes.
+        """
+        self.index.sync_flashcard(flashcard)
+        self.lexical_index.remove((FLASHCARD, flashcard.id))
+        if flashcard.is_active:
+            self.lexical_index.add(*self._flashcard_document(flashcard))
+        self.invalidate_classes(
+            set(previous_class_ids) | {class_obj.id for class_obj in flashcard.assigned_classes}
+        )
+
+    def enrollment_changed(self, user_id: int):
+        """A user joined or left a class"""
+        self.context_cache.invalidate_user(user_id)
+
+    def class_changed(self, class_id: int):
+        """A class was created or renamed"""
+        self.invalidate_classes([class_id])
+
+    def invalidate_classes(self, class_ids: Iterable[int]):
+        """Drop cached contexts and answers that depend on the content of these classes"""
+        class_ids = set(class_ids)
+        self.context_cache.invalidate_classes(class_ids)
+        self.answer_cache.invalidate_classes(class_ids)
+
+    def indexes_built_at(self) -> Dict[str, Any]:
+        """When this process built its in-memory indexes (None = not yet); each worker process has its own"""
+        return {'vector_index': self.index.built_at, 'lexical_index': self.lexical_index.built_at}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'answer_cache': self.answer_cache.stats(),
+            'context_cache': self.context_cache.stats(),
+            'query_cache': self.query_cache.stats(),
+            'vector_index': self.index.stats(),
+            'lexical_index': self.lexical_index.stats(),
         }
 
-        # Admin users get access to ALL content, regular users only their enrolled classes
-        if user.is_admin:
-            print(f"RAG Debug: Admin user {user.username} - accessing ALL content")
-            classes_to_process = db.query(Class).filter(Class.is_active == True).all()
-        else:
-            print(f"RAG Debug: User {user.username} enrolled in {len(user.enrolled_classes)} classes")
-            classes_to_process = user.enrolled_classes
-
-        # Get flashcards from relevant classes
-        for enrolled_class in classes_to_process:
-            print(f"RAG Debug: Processing class {enrolled_class.name} (ID: {enrolled_class.id})")
-
-            # Get flashcards assigned to this class
-            class_flashcards = db.query(Flashcard).filter(
-                Flashcard.assigned_classes.any(Class.id == enrolled_class.id),
-                Flashcard.is_active == True
-            ).all()
-
-            print(f"RAG Debug: Found {len(class_flashcards)} flashcards for class {enrolled_class.name}")
-
-            for flashcard in class_flashcards:
-                flashcard_text = f"Term: {flashcard.term}\nDefinition: {flashcard.definition}"
-                if flashcard.category:
-                    flashcard_text += f"\nCategory: {flashcard.category}"
-                flashcard_text += f"\nClass: {enrolled_class.name}"
-                context['flashcards'].append(flashcard_text)
-
-            # Get pre-computed document chunks from class slides
-            for slide in enrolled_class.slides:
-                # Get all chunks for this slide
-                slide_chunks = db.query(DocumentChunk).filter(
-                    DocumentChunk.slide_id == slide.id
-                ).order_by(DocumentChunk.chunk_index).all()
-
-                print(f"RAG Debug: Found {len(slide_chunks)} chunks for document {slide.title}")
-
-                for chunk in slide_chunks:
-                    chunk_text = f"Document: {slide.title}\nClass: {enrolled_class.name}\nContent: {chunk.chunk_text}"
-                    context['document_chunks'].append(chunk_text)
-
-        print(f"RAG Debug: Total context - {len(context['flashcards'])} flashcards, {len(context['document_chunks'])} document chunks")
-        return context
+    def embed_flashcards(self, flashcards: List[Flashcard]) -> int:
+        """Compute and attach stored embeddings for flashcards in batches; returns how many were embedded
 
+        Callers commit the session afterwards. Without an embedding model the flashcards are left
+        unembedded and the vector index encodes them when they are first indexed.
+        """
+        if not flashcards or not encoder_available(self.embedding_model):
+            return 0
 
-    def find_relevant_context(self, query: str, user_context: Dict[str, List[str]], top_k: int = 5) -> List[str]:
-        """Find the most relevant context pieces for a given query using semantic similarity"""
-        all_context = []
-
-        # Combine all context with source labels
-        for flashcard in user_context['flashcards']:
-            all_context.append(f"[FLASHCARD] {flashcard}")
-
-        for chunk in user_context['document_chunks']:
-            all_context.append(f"[DOCUMENT_CHUNK] {chunk}")
+        model_id = embedding_model_id(self.embedding_model)
+        try:
+            for start in range(0, len(flashcards), ENCODE_BATCH_SIZE):
+                batch = flashcards[start:start + ENCODE_BATCH_SIZE]
+                embeddings = self.embedding_model.encode([
+                    flashcard_text(flashcard.term, flashcard.definition, flashcard.category) for flashcard in batch
+                ])
+                for flashcard, embedding in zip(batch, embeddings):
+                    flashcard.embedding_blob = pack_embedding(embedding)
+                    flashcard.embedding_model = model_id
+            return len(flashcards)
+        except Exception as e:
+            print(f"Error generating flashcard embeddings: {e}")
+            return 0
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """Unit-length embedding of a single query"""
+        return normalize_rows(np.asarray(self.embedding_model.encode([query]), dtype=np.float32))[0]
+
+    def get_user_context(self, user: User, db: Session) -> Dict[str, Any]:
+        """Cached per-user retrieval context; see resolve_user_context"""
+        context = self.context_cache.get(user.id)
+        if context is None:
+            context = self.resolve_user_context(user, db)
+            self.context_cache.put(user.id, context, user.is_admin)
+        else:
+            print(f"RAG Debug: User {user.username} - using cached context")
+        return context
 
-        print(f"RAG Debug: Query: '{query}' - Processing {len(all_context)} total context items")
+    def resolve_user_context(self, user: User, db: Session) -> Dict[str, Any]:
+        """Resolve the classes and candidate items a user may retrieve from, as plain tuples
+
+        Uses a constant three queries regardless of how many classes, slides or chunks there are:
+        'classes' is [(class_id, class_name)], 'flashcards' is [(flashcard_id, class_id)] and
+        'chunks' is [(chunk_id, slide_id, class_id)]. Admins search every class shard
+        (class_ids is None); everyone else only the shards of their active enrolled classes.
+        """
+        class_query = db.query(Class.id, Class.name).filter(Class.is_active == True)
+        if not user.is_admin:
+            class_query = class_query.join(
+                class_users, class_users.c.class_id == Class.id
+            ).filter(class_users.c.user_id == user.id)
+        classes = class_query.order_by(Class.id).all()
+        class_ids = [class_id for class_id, _ in classes]
+
+        flashcards = db.query(Flashcard.id, class_flashcards.c.class_id).join(
+            class_flashcards, class_flashcards.c.flashcard_id == Flashcard.id
+        ).filter(
+            class_flashcards.c.class_id.in_(class_ids),
+            Flashcard.is_active == True
+        ).order_by(Flashcard.id).all() if class_ids else []
+
+        chunks = db.query(DocumentChunk.id, DocumentChunk.slide_id, Slide.class_id).join(
+            Slide, DocumentChunk.slide_id == Slide.id
+        ).filter(
+            Slide.class_id.in_(class_ids)
+        ).order_by(Slide.class_id, Slide.upload_order, DocumentChunk.chunk_index).all() if class_ids else []
 
-        if not all_context:
-            print("RAG Debug: No context available")
-            return []
+        if user.is_admin:
+            print(f"RAG Debug: Admin user {user.username} - accessing ALL content")
+        print(f"RAG Debug: User {user.username} - {len(classes)} active classes, "
+              f"{len(flashcards)} flashcards, {len(chunks)} document chunks")
+
+        return {
+            'class_ids': None if user.is_admin else class_ids,
+            'classes': [tuple(row) for row in classes],
+            'flashcards': [tuple(row) for row in flashcards],
+            'chunks': [tuple(row) for row in chunks],
+        }
 
-        # If embedding model is not available, return all context (fallback)
-        if not self.embedding_model:
-            return all_context[:top_k]
+    def first_candidates(self, user_context: Dict[str, Any], limit: int) -> List[Tuple[str, int, int]]:
+        """The first few candidate items (flashcards first), used when nothing can be ranked"""
+        items = []
+        seen = set()
+        for flashcard_id, class_id in user_context['flashcards']:
+            if len(items) >= limit:
+                break
+            if flashcard_id not in seen:
+                seen.add(flashcard_id)
+                items.append((FLASHCARD, flashcard_id, class_id))
+        items.extend((CHUNK, chunk_id, class_id) for chunk_id, _, class_id in user_context['chunks'][:limit])
+        return items[:limit]
+
+    def load_chunk_passages(self, chunk_ids: List[int], db: Session) -> Dict[int, Dict[str, Any]]:
+        """Fetch the given chunks as header/body passages grouped by slide, keyed by chunk id"""
+        if not chunk_ids:
+            return {}
+
+        rows = db.query(
+            DocumentChunk.id, DocumentChunk.slide_id, DocumentChunk.chunk_text,
+            DocumentChunk.page_start, DocumentChunk.page_end, Slide.title, Class.name
+        ).join(
+            Slide, DocumentChunk.slide_id == Slide.id
+        ).join(
+            Class, Slide.class_id == Class.id
+        ).filter(DocumentChunk.id.in_(chunk_ids)).all()
+
+        passages = {}
+        for chunk_id, slide_id, chunk_text, page_start, page_end, slide_title, class_name in rows:
+            pages = format_pages(page_start, page_end)
+            source = f"{slide_title} ({pages})" if pages else slide_title
+            passages[chunk_id] = {
+                'header': f"[DOCUMENT_CHUNK] Document: {source}\nClass: {class_name}\nContent: ",
+                'body': chunk_text,
+                'group': slide_id,
+            }
+        return passages
+
+    def load_flashcard_passages(self, flashcard_classes: Dict[int, int], db: Session, class_names: Dict[int, str] = None) -> Dict[int, Dict[str, Any]]:
+        """Fetch and format the given flashcards, keyed by flashcard id, labelled with the class they matched in"""
+        if not flashcard_classes:
+            return {}
+
+        flashcards = db.query(
+            Flashcard.id, Flashcard.term, Flashcard.definition, Flashcard.category
+        ).filter(Flashcard.id.in_(list(flashcard_classes))).all()
+        if class_names is None:
+            class_names = dict(db.query(Class.id, Class.name).filter(Class.id.in_(set(flashcard_classes.values()))).all())
+
+        return {
+            flashcard_id: {
+                'header': '',
+                'body': f"[FLASHCARD] {flashcard_text(term, definition, category)}"
+                        f"\nClass: {class_names.get(flashcard_classes[flashcard_id], '')}",
+                'group': None,
+            }
+            for flashcard_id, term, definition, category in flashcards
+        }
 
+    def load_passages(self, hits: List[Tuple[str, int, int, float]], db: Session, class_names: Dict[int, str] = None) -> List[Dict[str, Any]]:
+        """Passages for (kind, item_id, class_id, score) hits in order, loading only their rows from the database"""
+        chunk_passages = self.load_chunk_passages([item_id for kind, item_id, _, _ in hits if kind == CHUNK], db)
+        flashcard_passages = self.load_flashcard_passages(
+            {item_id: class_id for kind, item_id, class_id, _ in hits if kind == FLASHCARD}, db, class_names
+        )
+        passages = []
+        for kind, item_id, class_id, score in hits:
+            passage = chunk_passages.get(item_id) if kind == CHUNK else flashcard_passages.get(item_id)
+            if passage:
+                passages.append({'kind': kind, 'id': item_id, 'class_id': class_id, 'score': score, **passage})
+        return passages
+
+    def find_relevant_context(self, query: str, user_context: Dict[str, Any], db: Session, top_k: int = 5) -> List[str]:
+        """Find the most relevant context pieces for a given query; see retrieve_context"""
+        return self.retrieve_context(query, user_context, db, top_k)['texts']
+
+    def retrieve_context(self, query: str, user_context: Dict[str, Any], db: Session, top_k: int = 5) -> Dict[str, Any]:
+        """Retrieve the most relevant context for a query (hybrid semantic + keyword search)
+
+        Only the query is encoded; it is scored against the pre-built class shards of the vector
+        index, fused with BM25 keyword matches, and the text of the top-k hits is loaded afterwards.
+        While the embedding model is unavailable or still warming up, keyword matches are used alone.
+
+        Returns 'passages' (scored, for pack_context), 'texts' (formatted context), 'items'
+        ([(kind, item_id, class_id)] that were used) and 'query_embedding' (None when the query
+        could not be embedded).
+        """
+        self.ensure_indexes(db)
+        class_ids = user_context['class_ids']
+        class_names = dict(user_context['classes'])
+        candidate_k = top_k * 4
+
+        print(f"RAG Debug: Query: '{query}' - Searching {'all' if class_ids is None else len(class_ids)} class shards")
+
+        lexical_hits = self.lexical_index.search(query, class_ids, candidate_k)
+
+        # If embedding model is not ready, use keyword candidates, then the first few items (fallback)
+        if not encoder_ready(self.embedding_model):
+            print(f"RAG Debug: Embedding model not ready - using {len(lexical_hits)} keyword matches")
+            return self._retrieved(lexical_hits[:top_k] or self._ranked(self.first_candidates(user_context, top_k)), db, class_names)
+
+        query_embedding = None
         try:
-            # Generate embeddings
-            query_embedding = self.embedding_model.encode([query])
-            context_embeddings = self.embedding_model.encode(all_context)
+            query_embedding = self.query_cache.get_or_compute(query, self.encode_query)
+            rerank = settings.vector_precision != 'float32' and settings.vector_rerank_candidates > 0
+            vector_hits = self.index.search(
+                query_embedding, class_ids, max(candidate_k, settings.vector_rerank_candidates) if rerank else candidate_k
+            )
+            if rerank:
+                # Quantized scores are approximate; order the best candidates by their exact vectors
+                vector_hits = self.index.rerank(vector_hits, query_embedding, db)[:candidate_k]
 
-            # Calculate similarities
-            similarities = cosine_similarity(query_embedding, context_embeddings)[0]
+            # Filter out very low similarity scores (threshold: 0.1 - lowered for better recall)
+            vector_hits = [hit for hit in vector_hits if hit[3] > 0.1]
+            for kind, item_id, _, score in vector_hits[:top_k]:
+                print(f"RAG Debug: Relevant {kind} {item_id} (similarity {score:.3f})")
 
-            # Get top_k most similar contexts
-            top_indices = np.argsort(similarities)[-top_k:][::-1]
+            if settings.hybrid_search:
+                hits = reciprocal_rank_fusion([(1.0, vector_hits), (settings.lexical_weight, lexical_hits)], top_k)
+            else:
+                hits = vector_hits[:top_k]
 
-            # Filter out very low similarity scores (threshold: 0.1 - lowered for better recall)
-            relevant_contexts = []
-            for idx in top_indices:
-                if similarities[idx] > 0.1:
-                    relevant_contexts.append(all_context[idx])
-                    print(f"RAG Debug: Relevant context (similarity {similarities[idx]:.3f}): {all_context[idx][:100]}...")
+            if not hits:
+                print("RAG Debug: No context available")
+                return self._retrieved([], db, class_names, query_embedding)
 
-            print(f"RAG Debug: Found {len(relevant_contexts)} relevant contexts above threshold 0.1")
-            return relevant_contexts
+            retrieved = self._retrieved(hits, db, class_names, query_embedding)
+            print(f"RAG Debug: Found {len(retrieved['texts'])} relevant contexts "
+                  f"({len(vector_hits)} semantic above threshold 0.1, {len(lexical_hits)} keyword)")
+            return retrieved
 
         except Exception as e:
             print(f"Error in semantic search: {e}")
-            # Fallback to returning first few contexts
-            return all_context[:top_k]
+            # Fallback to keyword matches, then the first few contexts
+            return self._retrieved(
+                lexical_hits[:top_k] or self._ranked(self.first_candidates(user_context, top_k)), db, class_names, query_embedding
+            )
+
+    @staticmethod
+    def _ranked(items: List[Tuple[str, int, int]]) -> List[Tuple[str, int, int, float]]:
+        """Give unscored fallback items descending scores in their listed order"""
+        return [(kind, item_id, class_id, 1.0 / (rank + 1)) for rank, (kind, item_id, class_id) in enumerate(items)]
+
+    def _retrieved(self, hits: List[Tuple[str, int, int, float]], db: Session, class_names: Dict[int, str],
+                   query_embedding: np.ndarray = None) -> Dict[str, Any]:
+        passages = self.load_passages(hits, db, class_names)
+        return {
+            'passages': passages,
+            'texts': [passage['header'] + passage['body'] for passage in passages],
+            'items': [(passage['kind'], passage['id'], passage['class_id']) for passage in passages],
+            'query_embedding': query_embedding,
+        }
+
+    def context_token_budget(self, user: User, query: str) -> int:
+        """Tokens available for course materials in the system prompt
+
+        The configured budget, capped so the base prompt, the question and the answer's
+        max_tokens still fit in the model's context window.
+        """
+        overhead = estimate_tokens(self.create_system_prompt(user, [""])) + estimate_tokens(query) + 8
+        return max(0, min(settings.context_token_budget, settings.llm_context_window - settings.llm_max_tokens - overhead))
+
+    def pack_context(self, user: User, query: str, retrieved: Dict[str, Any]) -> Dict[str, Any]:
+        """Fit the retrieved passages into the prompt budget; see context_packer.pack_context"""
+        budget = self.context_token_budget(user, query)
+        packed = pack_context(retrieved['passages'], budget)
+        print(f"Context packer: {len(packed['texts'])}/{len(retrieved['passages'])} passages, "
+              f"{packed['tokens']}/{budget} tokens ({packed['trimmed']} trimmed, "
+              f"{packed['duplicates']} duplicate, {packed['dropped']} over budget)")
+        return packed
+
+    def cached_answer(self, query: str, user_context: Dict[str, Any], items: List[Tuple[str, int, int]],
+                      query_embedding: np.ndarray = None):
+        """Previously generated answer to an equivalent question over the same materials, if any"""
+        return self.answer_cache.get(query, user_context['class_ids'], context_fingerprint(items), query_embedding)
+
+    def remember_answer(self, query: str, user_context: Dict[str, Any], items: List[Tuple[str, int, int]],
+                        query_embedding: np.ndarray, answer: str, epoch: int = None):
+        self.answer_cache.put(query, user_context['class_ids'], context_fingerprint(items), query_embedding, answer, epoch)
 
     def create_system_prompt(self, user: User, relevant_context: List[str]) -> str:
-        """Create a system prompt with relevant context"""
-        base_prompt = f"""You are a helpful educational AI assistant for {user.username} on the PhoenixTeam Education Platform.
+        """Create a system prompt with relevant context
+
+        Nothing user-specific goes in: cached answers are shared by every user of the same classes.
+        """
+        base_prompt = """You are a helpful educational AI assistant on the PhoenixTeam Education Platform.
 
 Your role is to help students understand their course materials, including flashcards and documents from their enrolled classes.
 
@@ -126,7 +397,7 @@ IMPORTANT GUIDELINES:
 - Be encouraging and educational in your responses
 - Provide clear, concise explanations
 - When referencing flashcards, you can quote the term and definition
-- For document-related questions, refer to the document titles available
+- For document-related questions, refer to the document titles available, citing page numbers when given
 
 """
 
@@ -0,0 +1,503 @@
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy.orm import Session, selectinload
+
+from ..models.models import Class, Flashcard, DocumentChunk, Slide
+from .embedding_codec import stack_embeddings, stored_vector
+from .embedding_provider import embedding_dim, embedding_model_id, encoder_available
+from .ann_index import IVFIndex, auto_n_lists, default_index_dir
+from .quantization import decode_rows, encode_rows, precision_dtype, score_rows
+from ..core.config import settings
+
+CHUNK = 'chunk'
+FLASHCARD = 'flashcard'
+
+# How many texts to hand to the encoder at once when the index has to embed them itself
+ENCODE_BATCH_SIZE = 64
+
+# Quantized rows decoded at once when assigning them to IVF lists
+ASSIGN_BLOCK_ROWS = 65536
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so that a dot product equals cosine similarity"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k highest scores, best first, via argpartition instead of a full sort"""
+    if top_k <= 0 or scores.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    if top_k < scores.size:
+        candidates = np.argpartition(scores, -top_k)[-top_k:]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+
+def current_vector(embedding: Optional[List[float]], embedding_blob: Optional[bytes], embedding_model: Optional[str],
+                   model_id: str, dim: Optional[int]) -> Optional[np.ndarray]:
+    """A row's stored vector if the current model produced it, else None (the row must be re-encoded)
+
+    Rows without a recorded model predate model tracking and are assumed current, as long as
+    their size matches the current model's.
+    """
+    if embedding_model not in (None, model_id):
+        return None
+    vector = stored_vector(embedding, embedding_blob)
+    if vector is None or (dim is not None and vector.shape[0] != dim):
+        return None
+    return vector
+
+
+def flashcard_text(term: str, definition: str, category: Optional[str] = None) -> str:
+    """Text that represents a flashcard for embedding purposes (independent of the class it is assigned to)"""
+    text = f"Term: {term}\nDefinition: {definition}"
+    if category:
+        text += f"\nCategory: {category}"
+    return text
+
+
+class VectorTable:
+    """Growable, contiguous matrix of unit vectors with parallel id and group columns.
+
+    Rows are appended into spare capacity and removed by compacting in place, so a table is
+    never rebuilt from scratch. ``group`` is the slide id for chunks and unused for flashcards.
+    When an IVF index is attached, each row also records the list it belongs to.
+
+    Vectors are held as float32, float16 or per-row scaled int8 (``precision``) and scored
+    directly in that form; see quantization.score_rows.
+    """
+
+    def __init__(self, dim: int, initial_capacity: int = 64, precision: str = "float32"):
+        self.dim = dim
+        self.size = 0
+        self.ann: Optional[IVFIndex] = None
+        self.dtype = precision_dtype(precision)
+        self._matrix = np.zeros((initial_capacity, dim), dtype=self.dtype)
+        self._scales = np.ones(initial_capacity, dtype=np.float32) if self.dtype == np.int8 else None
+        self._ids = np.zeros(initial_capacity, dtype=np.int64)
+        self._groups = np.zeros(initial_capacity, dtype=np.int64)
+        self._lists = np.full(initial_capacity, -1, dtype=np.int32)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Stored rows in the table's precision"""
+        return self._matrix[:self.size]
+
+    @property
+    def scales(self) -> Optional[np.ndarray]:
+        return self._scales[:self.size] if self._scales is not None else None
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the vectors (including spare capacity)"""
+        return self._matrix.nbytes + (self._scales.nbytes if self._scales is not None else 0)
+
+    def float_matrix(self) -> np.ndarray:
+        """The rows as float32: the stored matrix itself, or a temporary decoded copy"""
+        return self.matrix if self.dtype == np.float32 else decode_rows(self.matrix, self.scales)
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[:self.size]
+
+    @property
+    def groups(self) -> np.ndarray:
+        return self._groups[:self.size]
+
+    @property
+    def lists(self) -> np.ndarray:
+        return self._lists[:self.size]
+
+    def add(self, ids: Sequence[int], vectors: np.ndarray, groups: Sequence[int]):
+        count = len(ids)
+        if count == 0:
+            return
+        self._reserve(self.size + count)
+        rows = slice(self.size, self.size + count)
+        normalized = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(count, self.dim))
+        self._matrix[rows], scales = encode_rows(normalized, self.dtype)
+        if scales is not None:
+            self._scales[rows] = scales
+        self._ids[rows] = ids
+        self._groups[rows] = groups
+        if self.ann is not None:
+            self._lists[rows] = self.ann.assign(normalized)
+        self.size += count
+
+    def remove_where(self, mask: np.ndarray) -> int:
+        """Drop the rows selected by mask, shifting the survivors down; returns the number removed"""
+        keep = ~mask
+        kept = int(keep.sum())
+        removed = self.size - kept
+        if removed:
+            self._matrix[:kept] = self.matrix[keep]
+            if self._scales is not None:
+                self._scales[:kept] = self.scales[keep]
+            self._ids[:kept] = self.ids[keep]
+            self._groups[:kept] = self.groups[keep]
+            self._lists[:kept] = self.lists[keep]
+            self.size = kept
+        return removed
+
+    def remove_ids(self, ids: Iterable[int]) -> int:
+        return self.remove_where(np.isin(self.ids, list(ids)))
+
+    def remove_group(self, group: int) -> int:
+        return self.remove_where(self.groups == group)
+
+    def attach_ann(self, ann: Optional[IVFIndex]):
+        """Switch to approximate search with the given IVF index (None reverts to exact search)"""
+        self.ann = ann
+        if ann is not None:
+            if self.dtype == np.float32:
+                self._lists[:self.size] = ann.assign(self.matrix)
+            else:
+                for start in range(0, self.size, ASSIGN_BLOCK_ROWS):
+                    rows = slice(start, min(start + ASSIGN_BLOCK_ROWS, self.size))
+                    self._lists[rows] = ann.assign(decode_rows(self._matrix, self._scales, rows))
+
+    def scores(self, query_embedding: np.ndarray):
+        """(row indices, scores) of the rows worth scoring: all rows, or only the probed IVF lists"""
+        if self.ann is None:
+            return np.arange(self.size), score_rows(self.matrix, self.scales, query_embedding)
+        rows = np.flatnonzero(self.ann.probe(query_embedding)[self.lists])
+        return rows, score_rows(self._matrix, self._scales, query_embedding, rows)
+
+    def _reserve(self, needed: int):
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        matrix = np.zeros((new_capacity, self.dim), dtype=self.dtype)
+        if self._scales is not None:
+            scales = np.ones(new_capacity, dtype=np.float32)
+            scales[:self.size] = self.scales
+            self._scales = scales
+        ids = np.zeros(new_capacity, dtype=np.int64)
+        groups = np.zeros(new_capacity, dtype=np.int64)
+        lists = np.full(new_capacity, -1, dtype=np.int32)
+        matrix[:self.size] = self.matrix
+        ids[:self.size] = self.ids
+        groups[:self.size] = self.groups
+        lists[:self.size] = self.lists
+        self._matrix, self._ids, self._groups, self._lists = matrix, ids, groups, lists
+
+
+class ClassShard:
+    """Chunk and flashcard vectors belonging to one class"""
+
+    def __init__(self, dim: int, precision: str = "float32"):
+        self.chunks = VectorTable(dim, precision=precision)
+        self.flashcards = VectorTable(dim, precision=precision)
+
+    def tables(self) -> List[Tuple[str, VectorTable]]:
+        return [(FLASHCARD, self.flashcards), (CHUNK, self.chunks)]
+
+
+class VectorIndex:
+    """In-memory vector index of chunk and flashcard embeddings, sharded by class id.
+
+    Built once from the database, then kept current by the slide, flashcard and class
+    endpoints so retrieval never has to reload or re-encode the corpus. With
+    settings.retrieval_mode == "ivf", chunk tables of at least settings.ann_min_vectors rows
+    are searched through an IVF index whose centroids are persisted in default_index_dir().
+    """
+
+    def __init__(self, encoder=None):
+        self.encoder = encoder
+        self.dim: Optional[int] = None
+        self.shards: Dict[int, ClassShard] = {}
+        self.is_built = False
+        self.built_at: Optional[datetime] = None
+        self._lock = threading.RLock()
+
+    def build(self, db: Session):
+        """(Re)build every shard from DocumentChunk and the active flashcards"""
+        with self._lock:
+            self.shards = {}
+            # Taken from the first vectors added, so a rebuild after a model change picks up its size
+            self.dim = None
+
+            chunk_rows = db.query(
+                DocumentChunk.id, DocumentChunk.slide_id, Slide.class_id,
+                DocumentChunk.embedding, DocumentChunk.embedding_blob, DocumentChunk.embedding_model
+            ).join(
+                Slide, DocumentChunk.slide_id == Slide.id
+            ).join(
+                Class, Slide.class_id == Class.id
+            ).filter(Class.is_active == True).all()
+
+            self._add_chunk_rows(chunk_rows, db)
+            for class_id in self.shards:
+                self._refresh_ann(class_id)
+
+            flashcards = db.query(Flashcard).options(
+                selectinload(Flashcard.assigned_classes)
+            ).filter(Flashcard.is_active == True).all()
+            self._add_flashcards(flashcards)
+
+            self.is_built = True
+            self.built_at = datetime.now(timezone.utc)
+            print(f"Vector index: Built {len(self.shards)} class shards - {self.stats()}")
+
+    def ensure_built(self, db: Session):
+        with self._lock:
+            if not self.is_built:
+                self.build(db)
+
+    def add_slide(self, slide: Slide, db: Session):
+        """Index (or re-index) the stored chunks of one slide"""
+        with self._lock:
+            self.remove_slide(slide.class_id, slide.id)
+            chunk_rows = db.query(
+                DocumentChunk.id, DocumentChunk.slide_id, Slide.class_id,
+                DocumentChunk.embedding, DocumentChunk.embedding_blob, DocumentChunk.embedding_model
+            ).join(
+                Slide, DocumentChunk.slide_id == Slide.id
+            ).filter(DocumentChunk.slide_id == slide.id).all()
+            self._add_chunk_rows(chunk_rows, db)
+            self._refresh_ann(slide.class_id)
+
+    def remove_slide(self, class_id: int, slide_id: int) -> int:
+        with self._lock:
+            shard = self.shards.get(class_id)
+            return shard.chunks.remove_group(slide_id) if shard else 0
+
+    def drop_class(self, class_id: int):
+        with self._lock:
+            self.shards.pop(class_id, None)
+            ann_path = self._ann_path(class_id)
+            if os.path.exists(ann_path):
+                os.remove(ann_path)
+
+    def sync_flashcard(self, flashcard: Flashcard):
+        """Bring a single flashcard's vectors in line with its current text, status and class assignments"""
+        with self._lock:
+            for shard in self.shards.values():
+                shard.flashcards.remove_ids([flashcard.id])
+            if flashcard.is_active:
+                self._add_flashcards([flashcard])
+
+    def search(self, query_embedding: np.ndarray, class_ids: Optional[Iterable[int]], top_k: int) -> List[Tuple[str, int, int, float]]:
+        """Top-k (kind, item_id, class_id, score) across the given class shards (all shards when class_ids is None)"""
+        query_embedding = normalize_rows(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+        best: Dict[Tuple[str, int], Tuple[int, float]] = {}
+
+        with self._lock:
+            for class_id, shard in self._select_shards(class_ids):
+                for kind, table in shard.tables():
+                    if table.size == 0:
+                        continue
+                    rows, scores = table.scores(query_embedding)
+                    for idx in top_k_indices(scores, top_k):
+                        key = (kind, int(table.ids[rows[idx]]))
+                        score = float(scores[idx])
+                        # A flashcard assigned to several classes only counts once
+                        if key not in best or score > best[key][1]:
+                            best[key] = (class_id, score)
+
+        ranked = sorted(best.items(), key=lambda item: item[1][1], reverse=True)[:top_k]
+        return [(kind, item_id, class_id, score) for (kind, item_id), (class_id, score) in ranked]
+
+    def rerank(self, hits: List[Tuple[str, int, int, float]], query_embedding: np.ndarray,
+               db: Session) -> List[Tuple[str, int, int, float]]:
+        """Re-score hits with the exact float32 vectors stored in the database, best first
+
+        Meant for quantized precisions, where in-memory scores are approximate. Hits without a
+        usable stored vector (e.g. encoded on the fly when the index was built) keep their score.
+        """
+        if not hits:
+            return hits
+        query_embedding = normalize_rows(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+        model_id = embedding_model_id(self.encoder)
+        dim = embedding_dim(self.encoder)
+        vectors: Dict[Tuple[str, int], np.ndarray] = {}
+
+        chunk_ids = [item_id for kind, item_id, _, _ in hits if kind == CHUNK]
+        if chunk_ids:
+            for chunk_id, embedding, embedding_blob, embedding_model in db.query(
+                DocumentChunk.id, DocumentChunk.embedding, DocumentChunk.embedding_blob, DocumentChunk.embedding_model
+            ).filter(DocumentChunk.id.in_(chunk_ids)).all():
+                vector = current_vector(embedding, embedding_blob, embedding_model, model_id, dim)
+                if vector is not None:
+                    vectors[(CHUNK, chunk_id)] = vector
+
+        flashcard_ids = [item_id for kind, item_id, _, _ in hits if kind == FLASHCARD]
+        if flashcard_ids:
+            for flashcard_id, embedding_blob, embedding_model in db.query(
+                Flashcard.id, Flashcard.embedding_blob, Flashcard.embedding_model
+            ).filter(Flashcard.id.in_(flashcard_ids), Flashcard.embedding_blob.isnot(None)).all():
+                vector = current_vector(None, embedding_blob, embedding_model, model_id, dim)
+                if vector is not None:
+                    vectors[(FLASHCARD, flashcard_id)] = vector
+
+        reranked = []
+        for kind, item_id, class_id, score in hits:
+            vector = vectors.get((kind, item_id))
+            if vector is not None and vector.shape == query_embedding.shape:
+                norm = float(np.linalg.norm(vector))
+                score = float(vector @ query_embedding) / norm if norm else 0.0
+            reranked.append((kind, item_id, class_id, score))
+        return sorted(reranked, key=lambda hit: hit[3], reverse=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'classes': len(self.shards),
+                'chunks': sum(shard.chunks.size for shard in self.shards.values()),
+                'flashcards': sum(shard.flashcards.size for shard in self.shards.values()),
+                'ann_shards': sum(1 for shard in self.shards.values() if shard.chunks.ann is not None),
+                'vector_bytes': sum(
+                    shard.chunks.nbytes + shard.flashcards.nbytes for shard in self.shards.values()
+                ),
+            }
+
+    def _ann_path(self, class_id: int) -> str:
+        return os.path.join(default_index_dir(), f"ivf_class_{class_id}.npz")
+
+    def _refresh_ann(self, class_id: int):
+        """Attach, reuse or retrain the IVF index of a class's chunk table according to the settings"""
+        shard = self.shards.get(class_id)
+        if shard is None:
+            return
+        table = shard.chunks
+
+        # Exact search stays the default, and is always used for small corpora
+        if settings.retrieval_mode != 'ivf' or table.size < settings.ann_min_vectors:
+            if table.ann is not None:
+                table.attach_ann(None)
+            return
+
+        # Centroids stay representative until the table has doubled since training
+        if table.ann is not None and table.size <= 2 * table.ann.trained_size:
+            return
+
+        ann_path = self._ann_path(class_id)
+        if table.ann is None:
+            ann = IVFIndex.load(ann_path, settings.ann_n_probe)
+            if ann is not None and ann.dim == table.dim and table.size <= 2 * ann.trained_size:
+                table.attach_ann(ann)
+                return
+
+        ann = IVFIndex.train(table.float_matrix(), auto_n_lists(table.size), settings.ann_n_probe)
+        table.attach_ann(ann)
+        try:
+            ann.save(ann_path)
+        except OSError as e:
+            print(f"Vector index: Could not persist ANN index for class {class_id}: {e}")
+        print(f"Vector index: Trained IVF index for class {class_id} - {ann.n_lists} lists over {table.size} chunks")
+
+    def _select_shards(self, class_ids: Optional[Iterable[int]]) -> List[Tuple[int, ClassShard]]:
+        if class_ids is None:
+            return list(self.shards.items())
+        return [(class_id, self.shards[class_id]) for class_id in class_ids if class_id in self.shards]
+
+    def _shard(self, class_id: int, dim: int) -> ClassShard:
+        if self.dim is None:
+            self.dim = dim
+        shard = self.shards.get(class_id)
+        if shard is None:
+            shard = self.shards[class_id] = ClassShard(self.dim, settings.vector_precision)
+        return shard
+
+    def _encode(self, texts: List[str]) -> Optional[np.ndarray]:
+        if not texts or not encoder_available(self.encoder):
+            return None
+        try:
+            batches = [
+                np.asarray(self.encoder.encode(texts[i:i + ENCODE_BATCH_SIZE]), dtype=np.float32)
+                for i in range(0, len(texts), ENCODE_BATCH_SIZE)
+            ]
+            return np.vstack(batches)
+        except Exception as e:
+            print(f"Vector index: Failed to encode {len(texts)} texts: {e}")
+            return None
+
+    def _add_chunk_rows(self, chunk_rows, db: Session):
+        """Add (chunk_id, slide_id, class_id, embedding, embedding_blob, embedding_model) rows
+
+        Chunks without a stored embedding, or with one from a different model (not yet
+        re-embedded after a model change), are encoded with the current model instead.
+        """
+        by_class = defaultdict(lambda: ([], [], []))
+        blobs_by_class = defaultdict(list)
+        missing = []
+        model_id = embedding_model_id(self.encoder)
+        dim = embedding_dim(self.encoder)
+
+        for chunk_id, slide_id, class_id, embedding, embedding_blob, embedding_model in chunk_rows:
+            vector = current_vector(embedding, embedding_blob, embedding_model, model_id, dim)
+            if vector is not None:
+                ids, groups, vectors = by_class[class_id]
+                ids.append(chunk_id)
+                groups.append(slide_id)
+                vectors.append(vector)
+                blobs_by_class[class_id].append(embedding_blob)
+            else:
+                missing.append((chunk_id, slide_id, class_id))
+
+        if missing:
+            texts = dict(db.query(DocumentChunk.id, DocumentChunk.chunk_text).filter(
+                DocumentChunk.id.in_([chunk_id for chunk_id, _, _ in missing])
+            ).all())
+            encoded = self._encode([texts[chunk_id] for chunk_id, _, _ in missing])
+            if encoded is not None:
+                for (chunk_id, slide_id, class_id), vector in zip(missing, encoded):
+                    ids, groups, vectors = by_class[class_id]
+                    ids.append(chunk_id)
+                    groups.append(slide_id)
+                    vectors.append(vector)
+
+        for class_id, (ids, groups, vectors) in by_class.items():
+            blobs = blobs_by_class[class_id]
+            if len(blobs) == len(ids) and all(blobs):
+                # All binary: read the class's vectors straight out of one buffer
+                matrix = stack_embeddings(blobs)
+            else:
+                matrix = np.asarray(vectors, dtype=np.float32)
+            self._shard(class_id, matrix.shape[1]).chunks.add(ids, matrix, groups)
+
+    def _add_flashcards(self, flashcards: List[Flashcard]):
+        assigned = [
+            (flashcard, [class_obj.id for class_obj in flashcard.assigned_classes if class_obj.is_active])
+            for flashcard in flashcards
+        ]
+        assigned = [(flashcard, class_ids) for flashcard, class_ids in assigned if class_ids]
+        if not assigned:
+            return
+
+        # Flashcards normally carry an embedding computed at write time; only encode the stragglers
+        # and those embedded by a different model (not yet re-embedded after a model change)
+        model_id = embedding_model_id(self.encoder)
+        dim = embedding_dim(self.encoder)
+        stored = {
+            flashcard.id: current_vector(None, flashcard.embedding_blob, flashcard.embedding_model, model_id, dim)
+            for flashcard, _ in assigned
+        }
+        missing = [flashcard for flashcard, _ in assigned if stored[flashcard.id] is None]
+        encoded = self._encode([
+            flashcard_text(flashcard.term, flashcard.definition, flashcard.category) for flashcard in missing
+        ])
+        fresh = dict(zip([flashcard.id for flashcard in missing], encoded)) if encoded is not None else {}
+
+        by_class = defaultdict(lambda: ([], []))
+        for flashcard, class_ids in assigned:
+            vector = stored[flashcard.id] if stored[flashcard.id] is not None else fresh.get(flashcard.id)
+            if vector is None:
+                continue
+            for class_id in class_ids:
+                ids, vectors = by_class[class_id]
+                ids.append(flashcard.id)
+                vectors.append(vector)
+
+        for class_id, (ids, vectors) in by_class.items():
+            matrix = np.asarray(vectors, dtype=np.float32)
+            self._shard(class_id, matrix.shape[1]).flashcards.add(ids, matrix, [0] * len(ids))
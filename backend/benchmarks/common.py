@@ -0,0 +1,249 @@
+"""Shared helpers for the benchmark scripts in this directory.
+
+Benchmarks run from the backend directory (e.g. python -m benchmarks.retrieval_bench) against a
+throwaway SQLite database and, unless EMBEDDING_BACKEND is set, the deterministic hashing
+embedding backend, so they need neither network access nor a model download. Each run writes
+its results as JSON; pass an earlier file as --baseline to print the change per metric.
+"""
+import atexit
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+
+
+def use_temporary_database(name: str) -> str:
+    """Point the app at a fresh SQLite file in a temporary directory and return the directory.
+
+    Must run before any app module is imported: the engine and settings are created at import.
+    The directory is removed when the process exits.
+    """
+    directory = tempfile.mkdtemp(prefix=f"phoenix-{name}-bench-")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    os.environ.setdefault("EMBEDDING_BACKEND", "hashing")
+    os.environ.setdefault("ANN_INDEX_DIR", os.path.join(directory, "vector_index"))
+    return directory
+
+
+def parse_scale(value: str) -> int:
+    """'10k' -> 10000, '1m' -> 1000000, '500' -> 500"""
+    value = value.strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(value[-1:], 1)
+    return int(float(value[:-1] if multiplier > 1 else value) * multiplier)
+
+
+def latency_summary(seconds: Sequence[float]) -> Dict[str, float]:
+    """Count, mean and tail percentiles of a list of durations, in milliseconds"""
+    if not seconds:
+        return {'count': 0}
+    values = np.asarray(seconds, dtype=np.float64) * 1000.0
+    return {
+        'count': len(values),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'max_ms': round(float(values.max()), 3),
+    }
+
+
+def peak_rss_mib() -> Optional[float]:
+    """Peak resident set size of this process so far (None where the platform does not report it)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+@contextlib.contextmanager
+def quiet() -> Iterator[None]:
+    """Silence the app's print logging (it would dominate the timings and the output)"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+@contextlib.contextmanager
+def override_settings(**values) -> Iterator[None]:
+    """Temporarily change attributes of app.core.config.settings"""
+    from app.core.config import settings
+
+    previous = {name: getattr(settings, name) for name in values}
+    for name, value in values.items():
+        setattr(settings, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(settings, name, value)
+
+
+COMMON_WORDS = (
+    "the a of and to in is for that with as on be by this are or it from at an which can must "
+    "should will may when if each all any other more most such their these those than then also "
+    "under over between into through during before after about against within without"
+).split()
+SYLLABLES = [consonant + vowel for consonant in "bcdfghjklmnprstvwz" for vowel in "aeiou"]
+
+
+class Corpus:
+    """Deterministic synthetic course material: each class has its own topics, each topic its own terms"""
+
+    def __init__(self, seed: int = 0, vocabulary_size: int = 20000, topic_size: int = 60):
+        self.rng = np.random.default_rng(seed)
+        words = set()
+        while len(words) < vocabulary_size:
+            length = int(self.rng.integers(2, 5))
+            words.add("".join(self.rng.choice(SYLLABLES, length)))
+        self.vocabulary = sorted(words)
+        self.topic_size = topic_size
+
+    def topic(self, number: int) -> List[str]:
+        start = (number * self.topic_size) % (len(self.vocabulary) - self.topic_size)
+        return self.vocabulary[start:start + self.topic_size]
+
+    def sentence(self, topic: List[str], length: int) -> str:
+        # Zipf-like term frequencies within a topic, mixed with filler words
+        ranks = np.minimum(self.rng.zipf(1.3, length), len(topic)) - 1
+        words = [topic[rank] if self.rng.random() < 0.45 else self.rng.choice(COMMON_WORDS) for rank in ranks]
+        return " ".join(words).capitalize() + "."
+
+    def passage(self, topic: List[str], sentences: int = 4) -> str:
+        return " ".join(self.sentence(topic, int(self.rng.integers(8, 16))) for _ in range(sentences))
+
+    def lines(self, topic: List[str], count: int, width: int = 90) -> List[str]:
+        """count lines of running text at most width characters long, e.g. one page of a PDF"""
+        lines: List[str] = []
+        while len(lines) < count:
+            lines.extend(textwrap.wrap(self.passage(topic), width))
+        return lines[:count]
+
+    def query(self, text: str, words: int) -> str:
+        candidates = [word.strip(".").lower() for word in text.split() if word.strip(".").lower() not in COMMON_WORDS]
+        picked = self.rng.choice(candidates, min(words, len(candidates)), replace=False) if candidates else []
+        return "What about " + " ".join(picked) + "?"
+
+
+def _pdf_string(text: str) -> str:
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def make_pdf(pages: Sequence[Sequence[str]]) -> bytes:
+    """A minimal valid PDF with one Helvetica text line per string on each page (ASCII text only)"""
+    page_count = len(pages)
+    # Objects: 1 catalog, 2 page tree, 3 font, then a page and its content stream per page
+    kids = " ".join(f"{4 + 2 * number} 0 R" for number in range(page_count))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for number, lines in enumerate(pages):
+        text = " ".join(f"{_pdf_string(line)} Tj T*" for line in lines)
+        content = f"BT /F1 11 Tf 14 TL 50 780 Td {text} ET".encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {5 + 2 * number} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    output += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(output)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    """What a result depends on besides the code: revision, interpreter, hardware and embedding backend"""
+    from app.core.config import settings
+
+    return {
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'embedding_backend': settings.embedding_backend,
+        'embedding_model': settings.embedding_model_name if settings.embedding_backend != "hashing" else None,
+    }
+
+
+def write_results(name: str, parameters: Dict[str, Any], results: List[Dict[str, Any]],
+                  output: Optional[str] = None) -> str:
+    """Write a benchmark run as JSON (default: benchmarks/results/<name>-<timestamp>.json); returns the path"""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    payload = {
+        'benchmark': name,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': environment(),
+        'parameters': parameters,
+        'results': results,
+    }
+    with open(output, "w") as file:
+        json.dump(payload, file, indent=2)
+    return output
+
+
+def _lookup(result: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = result
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value if isinstance(value, (int, float)) else None
+
+
+def compare_to_baseline(baseline_path: str, results: List[Dict[str, Any]], keys: Iterable[str], metrics: Iterable[str]):
+    """Print each metric next to the baseline run's value for the same key fields"""
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    keys, metrics = list(keys), list(metrics)
+    previous = {tuple(result.get(key) for key in keys): result for result in baseline.get('results', [])}
+
+    print(f"\nCompared with {baseline_path} (revision {baseline.get('environment', {}).get('git_revision')}):")
+    for result in results:
+        key = tuple(result.get(key) for key in keys)
+        old = previous.get(key)
+        label = " ".join(f"{name}={value}" for name, value in zip(keys, key))
+        if old is None:
+            print(f"  {label}: not in baseline")
+            continue
+        changes = []
+        for metric in metrics:
+            new_value, old_value = _lookup(result, metric), _lookup(old, metric)
+            if new_value is None or old_value is None:
+                continue
+            change = f" ({(new_value - old_value) / old_value:+.1%})" if old_value else ""
+            changes.append(f"{metric} {old_value:g} -> {new_value:g}{change}")
+        print(f"  {label}: " + "; ".join(changes))
@@ -0,0 +1,236 @@
+"""Ingestion benchmark: throughput and memory of DocumentProcessor, stage by stage.
+
+Generates PDFs of every --pages count at every text --densities level in a temporary directory,
+then times each ingestion stage separately:
+- extract:  iter_pdf_pages (pypdf, across the extraction process pool for large PDFs)
+- chunk:    DocumentProcessor.iter_chunks, the page-aware chunker, with the configured limits and overlap
+- embed:    DocumentProcessor.generate_embeddings
+- insert:   bulk INSERTs of the DocumentChunk rows, committed per INGESTION_BATCH_SIZE
+- pipeline: DocumentProcessor.process_document end to end, as the ingestion queue runs it
+and reports pages/s and chunks/s (median of --repeats runs) plus the peak traced Python memory
+of every stage, measured in one extra traced run. Traced memory does not include the
+extraction worker processes; peak RSS of this process is reported per document.
+
+Usage (from the backend directory):
+    python -m benchmarks.ingestion_bench
+    python -m benchmarks.ingestion_bench --pages 10,100,500 --densities normal,dense --repeats 5
+    python -m benchmarks.ingestion_bench --batch-size 256 --baseline benchmarks/results/ingestion-<...>.json
+"""
+import argparse
+import os
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from .common import use_temporary_database
+
+# The app reads DATABASE_URL and the embedding backend at import time
+WORK_DIR = use_temporary_database("ingestion")
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.models import models
+from app.models.models import Class, DocumentChunk, Slide, User
+from app.services.document_processor import batched, content_hash, document_processor
+from app.services.embedding_codec import embedding_columns
+from app.services.embedding_provider import embedding_model_id, embedding_provider
+from app.services.chunking import Chunk
+from app.services.pdf_extraction import iter_pdf_pages, shutdown_extract_pool
+from .common import Corpus, compare_to_baseline, make_pdf, override_settings, peak_rss_mib, quiet, write_results
+
+# Lines of up to LINE_WIDTH characters per page
+DENSITIES = {'sparse': 12, 'normal': 35, 'dense': 52}
+LINE_WIDTH = 90
+STAGES = ("extract", "chunk", "embed", "insert", "pipeline")
+
+
+def write_document(corpus: Corpus, pages: int, density: str) -> str:
+    """A generated PDF in the work directory; one topic per 10 pages, like a lecture deck"""
+    path = os.path.join(WORK_DIR, f"deck-{pages}-{density}.pdf")
+    with open(path, "wb") as file:
+        file.write(make_pdf([
+            corpus.lines(corpus.topic(page // 10), DENSITIES[density], LINE_WIDTH) for page in range(pages)
+        ]))
+    return path
+
+
+def insert_chunks(db, slide_id: int, chunks: List[Chunk], embeddings) -> None:
+    """Store chunks the way process_document does: bulk INSERT, one commit per ingestion batch"""
+    model_id = embedding_model_id(embedding_provider)
+    for batch in batched(enumerate(zip(chunks, embeddings)), settings.ingestion_batch_size):
+        db.execute(insert(DocumentChunk), [
+            {
+                'slide_id': slide_id, 'chunk_text': chunk.text, 'chunk_index': index,
+                'page_start': chunk.page_start, 'page_end': chunk.page_end,
+                'content_hash': content_hash(chunk.text), 'embedding_model': model_id, **embedding_columns(embedding),
+            }
+            for index, (chunk, embedding) in batch
+        ])
+        db.commit()
+
+
+def delete_chunks(db, slide_id: int) -> None:
+    db.query(DocumentChunk).filter(DocumentChunk.slide_id == slide_id).delete()
+    db.commit()
+
+
+def run_stages(db, slide: Slide, path: str, measure: Callable[[str, Callable[[], Any]], Any]) -> Tuple[int, int, int]:
+    """Run every stage once through measure(stage, function); returns characters, chunks and the
+    chunks process_document stored (the same chunker, so the two counts match)"""
+    pages = measure("extract", lambda: list(iter_pdf_pages(path)))
+    chunks = measure("chunk", lambda: list(document_processor.iter_chunks(pages)))
+    embeddings = measure("embed", lambda: document_processor.generate_embeddings([chunk.text for chunk in chunks]))
+    measure("insert", lambda: insert_chunks(db, slide.id, chunks, embeddings))
+    delete_chunks(db, slide.id)
+    # End to end; the stored chunks are removed again so the next run cannot reuse their embeddings
+    if not measure("pipeline", lambda: document_processor.process_document(slide, db)):
+        raise RuntimeError(f"process_document failed for {path}")
+    stored = db.query(DocumentChunk).filter(DocumentChunk.slide_id == slide.id).count()
+    delete_chunks(db, slide.id)
+    return sum(len(page.text) for page in pages), len(chunks), stored
+
+
+def timed(seconds: Dict[str, List[float]]) -> Callable[[str, Callable[[], Any]], Any]:
+    def measure(stage: str, function: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        result = function()
+        seconds[stage].append(time.perf_counter() - started)
+        return result
+    return measure
+
+
+def traced(peaks: Dict[str, float]) -> Callable[[str, Callable[[], Any]], Any]:
+    def measure(stage: str, function: Callable[[], Any]) -> Any:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = function()
+        peaks[stage] = round((tracemalloc.get_traced_memory()[1] - baseline) / (1024 * 1024), 2)
+        return result
+    return measure
+
+
+def run_document(db, slide: Slide, path: str, pages: int, density: str, repeats: int) -> Dict[str, Any]:
+    seconds: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    with quiet():
+        for _ in range(repeats):
+            characters, chunk_count, pipeline_chunks = run_stages(db, slide, path, timed(seconds))
+
+        peaks: Dict[str, float] = {}
+        tracemalloc.start()
+        try:
+            run_stages(db, slide, path, traced(peaks))
+        finally:
+            tracemalloc.stop()
+
+    result: Dict[str, Any] = {
+        'pages': pages, 'density': density, 'characters': characters, 'chunks': chunk_count,
+        'pipeline_chunks': pipeline_chunks,
+        'pdf_kib': round(os.path.getsize(path) / 1024, 1),
+    }
+    for stage in STAGES:
+        median = statistics.median(seconds[stage])
+        chunks = pipeline_chunks if stage == "pipeline" else chunk_count
+        result[stage] = {
+            'seconds': round(median, 4),
+            'pages_per_second': round(pages / median, 1) if median else None,
+            'chunks_per_second': round(chunks / median, 1) if median else None,
+            'peak_traced_mib': peaks[stage],
+        }
+    result['peak_rss_mib'] = peak_rss_mib()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF extraction, chunking, embedding and chunk storage")
+    parser.add_argument("--pages", default="10,100", help="Comma-separated page counts, e.g. 10,100,500")
+    parser.add_argument("--densities", default=",".join(DENSITIES),
+                        help=f"Comma-separated subset of: {', '.join(DENSITIES)} (lines per page: "
+                             f"{', '.join(str(lines) for lines in DENSITIES.values())})")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per document (the median is reported)")
+    parser.add_argument("--batch-size", type=int, default=settings.ingestion_batch_size,
+                        help="Chunks embedded and committed per batch (INGESTION_BATCH_SIZE)")
+    parser.add_argument("--extract-workers", type=int, default=settings.pdf_extract_workers,
+                        help="PDF extraction processes (PDF_EXTRACT_WORKERS; 0 = one per CPU)")
+    parser.add_argument("--chunk-max-chars", type=int, default=settings.chunk_max_chars)
+    parser.add_argument("--chunk-overlap-chars", type=int, default=settings.chunk_overlap_chars)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/ingestion-<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    densities = [density.strip() for density in args.densities.split(",") if density.strip()]
+    unknown = [density for density in densities if density not in DENSITIES]
+    if unknown:
+        parser.error(f"unknown densities: {', '.join(unknown)}")
+    page_counts = [int(pages) for pages in args.pages.split(",") if pages.strip()]
+    overrides = dict(
+        ingestion_batch_size=args.batch_size,
+        pdf_extract_workers=args.extract_workers,
+        chunk_max_chars=args.chunk_max_chars,
+        chunk_overlap_chars=args.chunk_overlap_chars,
+    )
+
+    models.Base.metadata.create_all(bind=engine)
+    corpus = Corpus(args.seed, vocabulary_size=5000)
+    db = SessionLocal()
+    results = []
+    try:
+        admin = User(username="bench-admin", email="admin@example.com", hashed_password="-", is_admin=True)
+        db.add(admin)
+        db.commit()
+        class_obj = Class(name="Ingestion benchmark", created_by=admin.id)
+        db.add(class_obj)
+        db.commit()
+
+        with override_settings(**overrides):
+            with quiet():
+                # Load the embedding model and start the extraction pool outside the timings
+                warm_up = write_document(corpus, max(settings.pdf_parallel_min_pages, 1), "sparse")
+                document_processor.generate_embeddings(
+                    [chunk.text for chunk in document_processor.iter_chunks(iter_pdf_pages(warm_up))]
+                )
+
+            for pages in page_counts:
+                for density in densities:
+                    path = write_document(corpus, pages, density)
+                    slide = Slide(title=f"{pages} pages, {density}", filename=os.path.basename(path), file_path=path,
+                                  file_type="application/pdf", class_id=class_obj.id)
+                    db.add(slide)
+                    db.commit()
+
+                    result = run_document(db, slide, path, pages, density, args.repeats)
+                    results.append(result)
+                    print(f"{pages:>5} pages {density:>6}: {result['chunks']} chunks | "
+                          f"extract {result['extract']['pages_per_second']} pages/s, "
+                          f"chunk {result['chunk']['chunks_per_second']} chunks/s, "
+                          f"embed {result['embed']['chunks_per_second']} chunks/s, "
+                          f"insert {result['insert']['chunks_per_second']} chunks/s | "
+                          f"pipeline {result['pipeline']['pages_per_second']} pages/s, "
+                          f"{result['pipeline']['chunks_per_second']} chunks/s, "
+                          f"peak {result['pipeline']['peak_traced_mib']} MiB traced, {result['peak_rss_mib']} MiB RSS")
+    finally:
+        db.close()
+        shutdown_extract_pool()
+
+    parameters = {
+        'pages': page_counts, 'densities': {density: DENSITIES[density] for density in densities},
+        'line_width': LINE_WIDTH, 'repeats': args.repeats, 'seed': args.seed, **overrides,
+    }
+    path = write_results("ingestion", parameters, results, args.output)
+    print(f"Results written to {path}")
+    if args.baseline:
+        compare_to_baseline(args.baseline, results, ['pages', 'density'], [
+            f"{stage}.{metric}"
+            for stage, metric in (
+                ('extract', 'pages_per_second'), ('chunk', 'chunks_per_second'), ('embed', 'chunks_per_second'),
+                ('insert', 'chunks_per_second'), ('pipeline', 'pages_per_second'), ('pipeline', 'chunks_per_second'),
+                ('pipeline', 'peak_traced_mib'),
+            )
+        ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""OpenAI-compatible chat completions server with configurable latency, for load tests.
+
+Implements POST /v1/chat/completions, both the JSON response and the Server-Sent Events stream,
+with the deterministic replies of the app's offline fake LLM. Every completion waits
+first_token_delay seconds and then token_delay seconds per token (each +/- jitter), so the app
+sees upstream latency like a hosted model's without the network, the cost or the rate limits.
+
+The load test runs it in-process via httpx.ASGITransport. To point a real backend at it instead:
+    python -m benchmarks.llm_stub --port 8001 --first-token-delay 0.5
+    OPENAI_BASE_URL=http://localhost:8001/v1 OPENAI_API_KEY=stub uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from app.services.context_packer import estimate_tokens
+from app.services.llm_client import FakeChatCompletions
+
+
+class StubStats:
+    """Completions served and the most that were in flight at once"""
+
+    def __init__(self):
+        self.completions = 0
+        self.streamed = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {'completions': self.completions, 'streamed': self.streamed, 'peak_in_flight': self.peak_in_flight}
+
+
+def create_stub_app(first_token_delay: float = 0.3, token_delay: float = 0.02, jitter: float = 0.0,
+                    seed: int = 0) -> FastAPI:
+    """The stub as an ASGI app; its StubStats are at app.state.stats"""
+    app = FastAPI(title="OpenAI-compatible LLM stub")
+    app.state.stats = stats = StubStats()
+    replies = FakeChatCompletions()
+    rng = random.Random(seed)
+
+    def delay(seconds: float) -> float:
+        return max(0.0, seconds * (1.0 + rng.uniform(-jitter, jitter))) if jitter else seconds
+
+    def chunk(completion_id: str, model: str, delta: Dict[str, str], finish_reason=None) -> str:
+        payload = {
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def stream(completion_id: str, model: str, tokens: List[str]) -> AsyncIterator[str]:
+        try:
+            await asyncio.sleep(delay(first_token_delay))
+            yield chunk(completion_id, model, {'role': 'assistant', 'content': ''})
+            for token in tokens:
+                await asyncio.sleep(delay(token_delay))
+                yield chunk(completion_id, model, {'content': token})
+            yield chunk(completion_id, model, {}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+        finally:
+            stats.in_flight -= 1
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> Any:
+        body = await request.json()
+        messages = body.get('messages', [])
+        model = body.get('model', 'stub')
+        tokens = replies.reply_tokens(messages, body.get('max_tokens') or 500)
+        completion_id = f"chatcmpl-stub-{stats.completions}"
+
+        stats.completions += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+
+        if body.get('stream'):
+            stats.streamed += 1
+            return StreamingResponse(stream(completion_id, model, tokens), media_type="text/event-stream")
+
+        try:
+            await asyncio.sleep(delay(first_token_delay) + sum(delay(token_delay) for _ in tokens))
+        finally:
+            stats.in_flight -= 1
+        prompt_tokens = sum(estimate_tokens(message.get('content', '')) for message in messages)
+        return {
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': "".join(tokens)},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(tokens),
+                'total_tokens': prompt_tokens + len(tokens),
+            },
+        }
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve an OpenAI-compatible chat completions stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--first-token-delay", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds per further token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Relative +/- variation of every delay, e.g. 0.5")
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_stub_app(args.first_token_delay, args.token_delay, args.jitter), host=args.host, port=args.port)
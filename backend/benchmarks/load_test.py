@@ -0,0 +1,434 @@
+"""API load test: throughput, tail latency and error rates per route under mixed student traffic.
+
+Drives the FastAPI app in-process through httpx.ASGITransport - one event loop and one thread
+pool, i.e. one uvicorn worker - against a temporary SQLite database seeded with classes,
+enrolled students, ingested slide decks and flashcards. Chat completions go to the in-process
+OpenAI-compatible stub (benchmarks/llm_stub.py) with configurable latency, so the app's own
+client, connection pool and concurrency limit are exercised without network access.
+
+For every --users level, that many virtual users run for --duration seconds, each repeatedly
+picking a weighted action (--mix) that replays the requests the dashboards make:
+- login:      POST /api/auth/token, GET /api/auth/me
+- dashboard:  GET /api/auth/me, GET /api/classes/, then per class its stats and flashcards
+- class_page: GET /api/slides/class/{class_id}, GET /api/flashcards/class/{class_id}
+- slide_view: GET /api/slides/{slide_id}
+- chat:       POST /api/chat/stream (chat_plain: POST /api/chat/)
+- history:    GET /api/chat/history
+- upload:     POST /api/slides/upload/{class_id} as admin, then GET /api/slides/{slide_id}/status
+Per route it reports requests/s, error rate, status codes and p50/p95/p99 latency. ASGITransport
+buffers response bodies, so streamed chat latency is the time to the complete answer.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --users 10,50,100 --duration 30 --llm-first-token-delay 1.0
+    python -m benchmarks.load_test --mix dashboard=5,class_page=5,chat=1 --baseline benchmarks/results/load-<...>.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .common import BENCHMARK_DIR, use_temporary_database
+
+# The app reads DATABASE_URL, the embedding backend and the LLM settings at import time
+WORK_DIR = use_temporary_database("load")
+# app.main mounts ../frontend/src and ../uploads relative to the working directory: run inside a
+# sandbox tree so uploads land in the temporary directory too
+for directory in ("backend", "frontend/src", "uploads/slides"):
+    os.makedirs(os.path.join(WORK_DIR, directory), exist_ok=True)
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+os.chdir(os.path.join(WORK_DIR, "backend"))
+os.environ["LLM_PROVIDER"] = "openai"
+os.environ["OPENAI_API_KEY"] = "stub"
+os.environ["OPENAI_BASE_URL"] = "http://llm-stub/v1"
+
+import httpx
+from sqlalchemy import insert
+
+from app.api import chat
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.security import create_access_token, get_password_hash
+from app.main import app, build_vector_index
+from app.models.models import Class, DocumentChunk, Flashcard, Slide, User, class_flashcards, class_users
+from app.services import llm_client
+from app.services.document_processor import document_processor
+from app.services.embedding_codec import pack_embedding
+from app.services.embedding_provider import embedding_model_id, embedding_provider
+from app.services.ingestion_queue import ingestion_queue
+from app.services.vector_index import flashcard_text
+from .common import Corpus, compare_to_baseline, latency_summary, make_pdf, peak_rss_mib, quiet, write_results
+from .llm_stub import create_stub_app
+
+settings.uploads_path = os.path.join(WORK_DIR, "uploads")
+settings.slides_path = os.path.join(settings.uploads_path, "slides")
+
+DEFAULT_MIX = "login=1,dashboard=3,class_page=4,slide_view=3,chat=2,history=1,upload=0.2"
+PASSWORD = "load-test-password"
+CLASSES_PER_STUDENT = 2
+PAGES_PER_DECK = 8
+LINES_PER_PAGE = 35
+FLASHCARDS_PER_CLASS = 40
+QUESTIONS_PER_CLASS = 200
+
+
+class VirtualUser:
+    """One simulated dashboard session: credentials, a bearer token and the classes it may see"""
+
+    def __init__(self, username: str, token: str, class_ids: List[int], is_admin: bool = False):
+        self.username = username
+        self.headers = {'Authorization': f"Bearer {token}"}
+        self.class_ids = class_ids
+        self.is_admin = is_admin
+
+
+class Recorder:
+    """Latency, outcome and status code of every request, grouped by route template"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    async def request(self, client: httpx.AsyncClient, route: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        method = route.split(" ", 1)[0]
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception as e:
+            self.latencies[route].append(time.perf_counter() - start)
+            self.errors[route] += 1
+            self.statuses[route][type(e).__name__] += 1
+            return None
+        self.latencies[route].append(time.perf_counter() - start)
+        self.statuses[route][str(response.status_code)] += 1
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+    def summary(self, users: int, seconds: float) -> List[Dict[str, Any]]:
+        rows = []
+        all_latencies = []
+        for route in sorted(self.latencies):
+            latencies = self.latencies[route]
+            all_latencies.extend(latencies)
+            rows.append({
+                'users': users,
+                'route': route,
+                'requests': len(latencies),
+                'throughput_rps': round(len(latencies) / seconds, 2),
+                'errors': self.errors[route],
+                'error_rate': round(self.errors[route] / len(latencies), 4),
+                'status_codes': dict(self.statuses[route]),
+                'latency': latency_summary(latencies),
+            })
+        total_errors = sum(self.errors.values())
+        rows.append({
+            'users': users,
+            'route': 'all',
+            'requests': len(all_latencies),
+            'throughput_rps': round(len(all_latencies) / seconds, 2),
+            'errors': total_errors,
+            'error_rate': round(total_errors / len(all_latencies), 4) if all_latencies else 0.0,
+            'latency': latency_summary(all_latencies),
+        })
+        return rows
+
+
+class Workload:
+    """Seeded data the actions draw from, and the actions themselves"""
+
+    def __init__(self, students: List[VirtualUser], admin: VirtualUser, slides: Dict[int, List[int]],
+                 questions: Dict[int, List[str]], corpus: Corpus):
+        self.students = students
+        self.admin = admin
+        self.slides = slides
+        self.questions = questions
+        self.corpus = corpus
+        self.upload_pdfs = [
+            make_pdf([corpus.lines(corpus.topic(number * PAGES_PER_DECK + page), LINES_PER_PAGE)
+                      for page in range(PAGES_PER_DECK)])
+            for number in range(4)
+        ]
+
+    async def login(self, client, recorder: Recorder, user: VirtualUser, rng: random.Random):
+        response = await recorder.request(client, "POST /api/auth/token", "/api/auth/token",
+                                          data={'username': user.username, 'password': PASSWORD})
+        if response is not None and response.status_code == 200:
+            headers = {'Authorization': f"Bearer {response.json()['access_token']}"}
+            await recorder.request(client, "GET /api/auth/me", "/api/auth/me", headers=headers)
+
+    async def dashboard(self, client, recorder: Recorder, user: VirtualUser, rng: random.Random):
+        await recorder.request(client, "GET /api/auth/me", "/api/auth/me", headers=user.headers)
+        await recorder.request(client, "GET /api/classes/", "/api/classes/", headers=user.headers)
+        for class_id in user.class_ids:
+            await recorder.request(client, "GET /api/classes/{class_id}/stats", f"/api/classes/{class_id}/stats",
+                                   headers=user.headers)
+            await recorder.request(client, "GET /api/flashcards/class/{class_id}", f"/api/flashcards/class/{class_id}",
+                                   headers=user.headers)
+
+    async def class_page(self, client, recorder: Recorder, user: VirtualUser, rng: random.Random):
+        class_id = rng.choice(user.class_ids)
+        await recorder.request(client, "GET /api/slides/class/{class_id}", f"/api/slides/class/{class_id}",
+                               headers=user.headers)
+        await recorder.request(client, "GET /api/flashcards/class/{class_id}", f"/api/flashcards/class/{class_id}",
+                               headers=user.headers)
+
+    async def slide_view(self, client, recorder: Recorder, user: VirtualUser, rng: random.Random):
+        slide_id = rng.choice(self.slides[rng.choice(user.class_ids)])
+        await recorder.request(client, "GET /api/slides/{slide_id}", f"/api/slides/{slide_id}", headers=user.headers)
+
+    async def chat(self, client, recorder: Recorder, user: VirtualUser, rng: random.Random):
+        message = rng.choice(self.questions[rng.choice(user.class_ids)])
+        await recorder.request(client, "POST /api/chat/stream", "/api/chat/stream",
+                               json={'message': message}, headers=user.headers)
+
+    async def chat_plain(self, client, recorder: Recorder, user: VirtualUser, rng: random.Random):
+        message = rng.choice(self.questions[rng.choice(user.class_ids)])
+        await recorder.request(client, "POST /api/chat/", "/api/chat/", json={'message': message}, headers=user.headers)
+
+    async def history(self, client, recorder: Recorder, user: VirtualUser, rng: random.Random):
+        await recorder.request(client, "GET /api/chat/history", "/api/chat/history", headers=user.headers)
+
+    async def upload(self, client, recorder: Recorder, user: VirtualUser, rng: random.Random):
+        class_id = rng.choice(user.class_ids)
+        response = await recorder.request(
+            client, "POST /api/slides/upload/{class_id}", f"/api/slides/upload/{class_id}",
+            params={'title': f"Load test deck {rng.randrange(10 ** 6)}"},
+            files={'file': ("deck.pdf", rng.choice(self.upload_pdfs), "application/pdf")},
+            headers=self.admin.headers,
+        )
+        if response is not None and response.status_code == 200:
+            slide_id = response.json()['id']
+            await recorder.request(client, "GET /api/slides/{slide_id}/status", f"/api/slides/{slide_id}/status",
+                                   headers=self.admin.headers)
+
+
+ACTIONS = ("login", "dashboard", "class_page", "slide_view", "chat", "chat_plain", "history", "upload")
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """'dashboard=3,chat=1' -> {'dashboard': 3.0, 'chat': 1.0}"""
+    mix = {}
+    for part in value.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ACTIONS:
+            raise ValueError(f"unknown action '{name}' (choose from: {', '.join(ACTIONS)})")
+        mix[name] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("the mix needs at least one action with a positive weight")
+    return mix
+
+
+def seed(db, corpus: Corpus, student_count: int, class_count: int, decks_per_class: int) -> Dict[str, Any]:
+    """Classes with ingested slide decks and flashcards, an admin and enrolled students"""
+    password_hash = get_password_hash(PASSWORD)
+    admin = User(username="load-admin", email="admin@example.com", hashed_password=password_hash, is_admin=True)
+    db.add(admin)
+    db.commit()
+
+    db.execute(insert(Class), [
+        {'id': class_id, 'name': f"Class {class_id}", 'is_active': True, 'created_by': admin.id}
+        for class_id in range(1, class_count + 1)
+    ])
+    db.execute(insert(User), [
+        {'username': f"student{number}", 'email': f"student{number}@example.com", 'hashed_password': password_hash,
+         'is_admin': False, 'is_active': True}
+        for number in range(1, student_count + 1)
+    ])
+    students = db.query(User).filter(User.is_admin == False).order_by(User.id).all()
+    enrollments = {
+        student.id: sorted({(number + offset) % class_count + 1 for offset in range(CLASSES_PER_STUDENT)})
+        for number, student in enumerate(students)
+    }
+    db.execute(insert(class_users), [
+        {'class_id': class_id, 'user_id': user_id} for user_id, class_ids in enrollments.items() for class_id in class_ids
+    ])
+    db.commit()
+
+    slides: Dict[int, List[int]] = defaultdict(list)
+    for class_id in range(1, class_count + 1):
+        os.makedirs(os.path.join(settings.slides_path, str(class_id)), exist_ok=True)
+        for deck in range(decks_per_class):
+            topics = [corpus.topic(class_id * 8 + (deck + page) % 8) for page in range(PAGES_PER_DECK)]
+            file_path = os.path.join(settings.slides_path, str(class_id), f"deck-{deck + 1}.pdf")
+            with open(file_path, "wb") as file:
+                file.write(make_pdf([corpus.lines(topic, LINES_PER_PAGE) for topic in topics]))
+            slide = Slide(title=f"Class {class_id} deck {deck + 1}", filename=f"deck-{deck + 1}.pdf",
+                          file_path=file_path, file_type="application/pdf", class_id=class_id, upload_order=deck + 1)
+            db.add(slide)
+            db.commit()
+            document_processor.process_document(slide, db)
+            slides[class_id].append(slide.id)
+
+        rows = []
+        for _ in range(FLASHCARDS_PER_CLASS):
+            topic = corpus.topic(class_id * 8 + int(corpus.rng.integers(8)))
+            rows.append({
+                'term': " ".join(corpus.rng.choice(topic, 2)), 'definition': corpus.passage(topic, 1),
+                'category': f"Topic {class_id}", 'is_active': True, 'created_by': admin.id,
+                'embedding_model': embedding_model_id(embedding_provider),
+            })
+        vectors = embedding_provider.encode([flashcard_text(row['term'], row['definition'], row['category']) for row in rows])
+        for row, vector in zip(rows, vectors):
+            row['embedding_blob'] = pack_embedding(vector)
+        db.execute(insert(Flashcard), rows)
+        flashcard_ids = [flashcard_id for (flashcard_id,) in db.query(Flashcard.id).filter(Flashcard.category == f"Topic {class_id}")]
+        db.execute(insert(class_flashcards), [{'class_id': class_id, 'flashcard_id': flashcard_id} for flashcard_id in flashcard_ids])
+        db.commit()
+
+    # Questions made of terms from the class's own chunks, varied enough to miss the answer cache
+    questions = {}
+    for class_id, slide_ids in slides.items():
+        texts = [text for (text,) in db.query(DocumentChunk.chunk_text).filter(DocumentChunk.slide_id.in_(slide_ids))]
+        questions[class_id] = [
+            corpus.query(texts[int(corpus.rng.integers(len(texts)))], int(corpus.rng.integers(3, 8)))
+            for _ in range(QUESTIONS_PER_CLASS)
+        ]
+
+    return {
+        'admin': VirtualUser(admin.username, create_access_token({'sub': admin.username}),
+                             list(range(1, class_count + 1)), is_admin=True),
+        'students': [
+            VirtualUser(student.username, create_access_token({'sub': student.username}), enrollments[student.id])
+            for student in students
+        ],
+        'slides': dict(slides),
+        'questions': questions,
+        'chunks': db.query(DocumentChunk).count(),
+    }
+
+
+async def run_user(client: httpx.AsyncClient, workload: Workload, recorder: Recorder, user: VirtualUser,
+                   actions: List[Callable[..., Awaitable[None]]], weights: List[float], deadline: float,
+                   think_time: float, rng: random.Random):
+    while time.perf_counter() < deadline:
+        action = rng.choices(actions, weights)[0]
+        await action(client, recorder, user, rng)
+        if think_time > 0:
+            await asyncio.sleep(rng.expovariate(1.0 / think_time))
+
+
+async def run_level(workload: Workload, stub_app, users: int, duration: float, mix: Dict[str, float],
+                    think_time: float, seed_value: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """users concurrent virtual users for duration seconds; returns per-route rows and LLM stub stats"""
+    recorder = Recorder()
+    stats = stub_app.state.stats
+    completions_before = stats.completions
+    stats.peak_in_flight = stats.in_flight
+    actions = [getattr(workload, name) for name in mix]
+    weights = list(mix.values())
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*[
+            run_user(client, workload, recorder, workload.students[number % len(workload.students)],
+                     actions, weights, deadline, think_time, random.Random(seed_value * 100003 + number))
+            for number in range(users)
+        ])
+        elapsed = time.perf_counter() - start
+
+    llm = {
+        'completions': stats.completions - completions_before,
+        'peak_in_flight': stats.peak_in_flight,
+        'elapsed_seconds': round(elapsed, 3),
+    }
+    return recorder.summary(users, elapsed), llm
+
+
+def print_level(rows: List[Dict[str, Any]], llm: Dict[str, Any]):
+    print(f"  {'route':<42} {'req/s':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for row in rows:
+        latency = row['latency']
+        print(f"  {row['route']:<42} {row['throughput_rps']:>8.1f} {row['error_rate']:>7.1%} "
+              f"{latency.get('p50_ms', 0):>9.1f} {latency.get('p95_ms', 0):>9.1f} {latency.get('p99_ms', 0):>9.1f}")
+    print(f"  LLM stub: {llm['completions']} completions, at most {llm['peak_in_flight']} in flight")
+
+
+async def run(args, mix: Dict[str, float], user_levels: List[int]) -> List[Dict[str, Any]]:
+    corpus = Corpus(args.seed, vocabulary_size=5000)
+    db = SessionLocal()
+    try:
+        print(f"Seeding {args.classes} classes, {args.classes * args.decks} decks and {max(user_levels)} students...")
+        with quiet():
+            seeded = seed(db, corpus, max(user_levels), args.classes, args.decks)
+            build_vector_index()
+    finally:
+        db.close()
+    workload = Workload(seeded['students'], seeded['admin'], seeded['slides'], seeded['questions'], corpus)
+
+    # The app's own OpenAI client (pool, timeouts, retries) talking to the stub instead of the network
+    stub_app = create_stub_app(args.llm_first_token_delay, args.llm_token_delay, args.llm_jitter, args.seed)
+    chat.openai_client = llm_client.create_chat_client(transport=httpx.ASGITransport(app=stub_app))
+    if args.llm_concurrency:
+        settings.llm_max_concurrency = args.llm_concurrency
+        llm_client._llm_semaphore = asyncio.Semaphore(args.llm_concurrency)
+
+    results = []
+    try:
+        for users in user_levels:
+            print(f"{users} concurrent users for {args.duration:g}s")
+            with quiet():
+                rows, llm = await run_level(workload, stub_app, users, args.duration, mix, args.think_time, args.seed)
+            rows[-1].update(llm=llm, peak_rss_mib=peak_rss_mib())
+            print_level(rows, llm)
+            results.extend(rows)
+    finally:
+        await chat.openai_client.close()
+        with quiet():
+            ingestion_queue.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API in-process with mixed student traffic and a stub LLM")
+    parser.add_argument("--users", default="5,20,50", help="Comma-separated concurrent user levels")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per user level")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help=f"Comma-separated action=weight pairs from: {', '.join(ACTIONS)} (default: {DEFAULT_MIX})")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Mean pause between a user's actions, in seconds")
+    parser.add_argument("--llm-first-token-delay", type=float, default=0.5, help="Stub LLM seconds before the first token")
+    parser.add_argument("--llm-token-delay", type=float, default=0.02, help="Stub LLM seconds per further token")
+    parser.add_argument("--llm-jitter", type=float, default=0.3, help="Relative +/- variation of the stub's delays")
+    parser.add_argument("--llm-concurrency", type=int, default=0,
+                        help="Override LLM_MAX_CONCURRENCY, the per-worker limit on in-flight completions")
+    parser.add_argument("--classes", type=int, default=4)
+    parser.add_argument("--decks", type=int, default=3, help="Slide decks per class")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load-<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    user_levels = [int(level) for level in args.users.split(",") if level.strip()]
+
+    results = asyncio.run(run(args, mix, user_levels))
+
+    parameters = {
+        'users': user_levels, 'duration': args.duration, 'mix': mix, 'think_time': args.think_time,
+        'llm_first_token_delay': args.llm_first_token_delay, 'llm_token_delay': args.llm_token_delay,
+        'llm_jitter': args.llm_jitter, 'llm_max_concurrency': settings.llm_max_concurrency,
+        'classes': args.classes, 'decks': args.decks, 'seed': args.seed,
+    }
+    path = write_results("load", parameters, results, args.output)
+    print(f"Results written to {path}")
+    if args.baseline:
+        compare_to_baseline(args.baseline, results, ['users', 'route'], [
+            'throughput_rps', 'error_rate', 'latency.p50_ms', 'latency.p95_ms', 'latency.p99_ms',
+        ])
+
+
+if __name__ == "__main__":
+    main()
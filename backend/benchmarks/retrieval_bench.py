@@ -0,0 +1,288 @@
+"""Retrieval benchmark: latency, memory and recall of RAGService over synthetic corpora.
+
+Generates classes, slides, document chunks and flashcards at each requested scale (total items)
+in a temporary SQLite database, then for every retrieval mode measures:
+- index build time and peak traced memory, plus the memory held by the vectors
+- get_user_context latency, resolved from the database (cold) and from the context cache (warm)
+- find_relevant_context latency for a student and an admin (p50/p95/p99)
+- recall@k of the vector search against exact float32 search over the same query embeddings
+
+Usage (from the backend directory):
+    python -m benchmarks.retrieval_bench
+    python -m benchmarks.retrieval_bench --scales 1k,10k,100k,1m --queries 500
+    python -m benchmarks.retrieval_bench --modes exact,int8 --baseline benchmarks/results/retrieval-<...>.json
+"""
+import argparse
+import time
+import tracemalloc
+from typing import Any, Dict, List, Tuple
+
+from .common import use_temporary_database
+
+# The app reads DATABASE_URL and the embedding backend at import time
+WORK_DIR = use_temporary_database("retrieval")
+
+import numpy as np
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.models import models
+from app.models.models import Class, DocumentChunk, Flashcard, Slide, User, class_flashcards, class_users
+from app.services.embedding_codec import pack_embedding
+from app.services.embedding_provider import embedding_model_id, embedding_provider
+from app.services.rag_service import RAGService
+from app.services.vector_index import flashcard_text
+from .common import (
+    Corpus, compare_to_baseline, latency_summary, override_settings, parse_scale, peak_rss_mib, quiet, write_results
+)
+
+MODES: Dict[str, Dict[str, Any]] = {
+    'exact': {'retrieval_mode': 'exact', 'vector_precision': 'float32'},
+    'ivf': {'retrieval_mode': 'ivf', 'ann_min_vectors': 0, 'vector_precision': 'float32'},
+    'float16': {'retrieval_mode': 'exact', 'vector_precision': 'float16'},
+    'int8': {'retrieval_mode': 'exact', 'vector_precision': 'int8'},
+    'ivf-int8': {'retrieval_mode': 'ivf', 'ann_min_vectors': 0, 'vector_precision': 'int8'},
+}
+
+CHUNKS_PER_SLIDE = 50
+ITEMS_PER_CLASS = 5000
+FLASHCARD_SHARE = 0.1
+CLASSES_PER_STUDENT = 3
+INSERT_BATCH_SIZE = 5000
+
+
+def reset_database():
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+
+
+def generate(db, corpus: Corpus, items: int) -> Dict[str, Any]:
+    """Populate the database with about `items` chunks + flashcards; returns counts and the users"""
+    class_count = max(2, -(-items // ITEMS_PER_CLASS))
+    flashcard_count = int(items * FLASHCARD_SHARE)
+    chunk_count = items - flashcard_count
+    model_id = embedding_model_id(embedding_provider)
+
+    admin = User(username="bench-admin", email="admin@bench.local", hashed_password="-", is_admin=True)
+    student = User(username="bench-student", email="student@bench.local", hashed_password="-")
+    db.add_all([admin, student])
+    db.commit()
+
+    db.execute(insert(Class), [
+        {'id': class_id, 'name': f"Class {class_id}", 'is_active': True, 'created_by': admin.id}
+        for class_id in range(1, class_count + 1)
+    ])
+    enrolled = list(range(1, min(CLASSES_PER_STUDENT, class_count) + 1))
+    db.execute(insert(class_users), [{'class_id': class_id, 'user_id': student.id} for class_id in enrolled])
+
+    slide_count = max(1, -(-chunk_count // CHUNKS_PER_SLIDE))
+    db.execute(insert(Slide), [
+        {
+            'id': slide_id, 'title': f"Deck {slide_id}", 'filename': f"deck-{slide_id}.pdf",
+            'file_path': f"/nonexistent/deck-{slide_id}.pdf", 'file_type': 'application/pdf',
+            'class_id': (slide_id - 1) % class_count + 1, 'upload_order': slide_id,
+        }
+        for slide_id in range(1, slide_count + 1)
+    ])
+    db.commit()
+
+    topics_per_class = 8
+    for start in range(0, chunk_count, INSERT_BATCH_SIZE):
+        rows = []
+        for chunk_id in range(start + 1, min(start + INSERT_BATCH_SIZE, chunk_count) + 1):
+            slide_id = (chunk_id - 1) // CHUNKS_PER_SLIDE + 1
+            class_id = (slide_id - 1) % class_count + 1
+            topic = corpus.topic(class_id * topics_per_class + int(corpus.rng.integers(topics_per_class)))
+            rows.append({
+                'id': chunk_id, 'slide_id': slide_id, 'chunk_index': (chunk_id - 1) % CHUNKS_PER_SLIDE,
+                'chunk_text': corpus.passage(topic), 'embedding_model': model_id,
+            })
+        vectors = embedding_provider.encode([row['chunk_text'] for row in rows])
+        for row, vector in zip(rows, vectors):
+            row['embedding_blob'] = pack_embedding(vector)
+        db.execute(insert(DocumentChunk), rows)
+        db.commit()
+
+    for start in range(0, flashcard_count, INSERT_BATCH_SIZE):
+        rows, assignments = [], []
+        for flashcard_id in range(start + 1, min(start + INSERT_BATCH_SIZE, flashcard_count) + 1):
+            class_id = (flashcard_id - 1) % class_count + 1
+            topic = corpus.topic(class_id * topics_per_class + int(corpus.rng.integers(topics_per_class)))
+            rows.append({
+                'id': flashcard_id, 'term': " ".join(corpus.rng.choice(topic, 2)),
+                'definition': corpus.passage(topic, 1), 'category': f"Topic {class_id}",
+                'is_active': True, 'created_by': admin.id, 'embedding_model': model_id,
+            })
+            assignments.append({'class_id': class_id, 'flashcard_id': flashcard_id})
+            # Some flashcards are shared with a second class
+            if flashcard_id % 5 == 0 and class_count > 1:
+                assignments.append({'class_id': class_id % class_count + 1, 'flashcard_id': flashcard_id})
+        vectors = embedding_provider.encode([
+            flashcard_text(row['term'], row['definition'], row['category']) for row in rows
+        ])
+        for row, vector in zip(rows, vectors):
+            row['embedding_blob'] = pack_embedding(vector)
+        db.execute(insert(Flashcard), rows)
+        db.execute(insert(class_flashcards), assignments)
+        db.commit()
+
+    return {
+        'classes': class_count, 'slides': slide_count, 'chunks': chunk_count, 'flashcards': flashcard_count,
+        'admin': admin, 'student': student, 'student_classes': enrolled,
+    }
+
+
+def make_queries(db, corpus: Corpus, class_ids: List[int], count: int) -> List[str]:
+    """Questions built from the terms of random chunks of the given classes"""
+    chunk_ids = [chunk_id for (chunk_id,) in db.query(DocumentChunk.id).join(
+        Slide, DocumentChunk.slide_id == Slide.id
+    ).filter(Slide.class_id.in_(class_ids))]
+    picked = corpus.rng.choice(chunk_ids, min(count, len(chunk_ids)), replace=False)
+    texts = dict(db.query(DocumentChunk.id, DocumentChunk.chunk_text).filter(DocumentChunk.id.in_(picked.tolist())))
+    return [corpus.query(texts[int(chunk_id)], int(corpus.rng.integers(3, 8))) for chunk_id in picked]
+
+
+def vector_hits(service: RAGService, query_embedding: np.ndarray, class_ids, top_k: int, db) -> List[Tuple[str, int]]:
+    """The vector-search part of retrieve_context (re-ranked when quantized), as (kind, id) keys"""
+    rerank = settings.vector_precision != 'float32' and settings.vector_rerank_candidates > 0
+    hits = service.index.search(query_embedding, class_ids, max(top_k, settings.vector_rerank_candidates) if rerank else top_k)
+    if rerank:
+        hits = service.index.rerank(hits, query_embedding, db)
+    return [(kind, item_id) for kind, item_id, _, _ in hits[:top_k]]
+
+
+def run_mode(db, mode: str, generated: Dict[str, Any], queries: List[str], ground_truth: List[set],
+             top_k: int) -> Dict[str, Any]:
+    student, admin = generated['student'], generated['admin']
+    with override_settings(**MODES[mode]):
+        service = RAGService()
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        with quiet():
+            service.ensure_indexes(db)
+        build_seconds = time.perf_counter() - started
+        _, build_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        cold, warm = [], []
+        with quiet():
+            for _ in range(min(len(queries), 50)):
+                started = time.perf_counter()
+                service.resolve_user_context(student, db)
+                cold.append(time.perf_counter() - started)
+            service.get_user_context(student, db)
+            for _ in range(min(len(queries), 50)):
+                started = time.perf_counter()
+                service.get_user_context(student, db)
+                warm.append(time.perf_counter() - started)
+
+            student_context = service.get_user_context(student, db)
+            admin_context = service.get_user_context(admin, db)
+            student_latency, admin_latency = [], []
+            for number, query in enumerate(queries):
+                started = time.perf_counter()
+                service.find_relevant_context(query, student_context, db, top_k)
+                student_latency.append(time.perf_counter() - started)
+                if number % 4 == 0:
+                    started = time.perf_counter()
+                    service.find_relevant_context(f"{query} (all classes)", admin_context, db, top_k)
+                    admin_latency.append(time.perf_counter() - started)
+
+            recalls = []
+            for query, expected in zip(queries, ground_truth):
+                found = vector_hits(service, service.query_cache.get_or_compute(query, service.encode_query),
+                                    student_context['class_ids'], top_k, db)
+                if expected:
+                    recalls.append(len(expected.intersection(found)) / len(expected))
+
+        stats = service.index.stats()
+        return {
+            'mode': mode,
+            'build_seconds': round(build_seconds, 3),
+            'build_peak_mib': round(build_peak / 2 ** 20, 1),
+            'vector_mib': round(stats['vector_bytes'] / 2 ** 20, 1),
+            'peak_rss_mib': peak_rss_mib(),
+            'ann_shards': stats['ann_shards'],
+            'get_user_context_cold': latency_summary(cold),
+            'get_user_context_warm': latency_summary(warm),
+            'find_relevant_context_student': latency_summary(student_latency),
+            'find_relevant_context_admin': latency_summary(admin_latency),
+            'recall_at_k': round(float(np.mean(recalls)), 4) if recalls else None,
+        }
+
+
+def run_scale(items: int, modes: List[str], query_count: int, top_k: int, seed: int) -> List[Dict[str, Any]]:
+    corpus = Corpus(seed)
+    reset_database()
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        with quiet():
+            generated = generate(db, corpus, items)
+        print(f"Generated {generated['chunks']} chunks and {generated['flashcards']} flashcards in "
+              f"{generated['classes']} classes ({time.perf_counter() - started:.1f}s)")
+        queries = make_queries(db, corpus, generated['student_classes'], query_count)
+
+        # Ground truth: exact float32 search over the same query embeddings
+        with override_settings(**MODES['exact']), quiet():
+            reference = RAGService()
+            reference.ensure_indexes(db)
+            context = reference.get_user_context(generated['student'], db)
+            ground_truth = [
+                set(vector_hits(reference, reference.encode_query(query), context['class_ids'], top_k, db))
+                for query in queries
+            ]
+        del reference
+
+        results = []
+        for mode in modes:
+            result = run_mode(db, mode, generated, queries, ground_truth, top_k)
+            result.update(scale=items, chunks=generated['chunks'], flashcards=generated['flashcards'],
+                          classes=generated['classes'], top_k=top_k)
+            results.append(result)
+            student = result['find_relevant_context_student']
+            print(f"  {mode:>8}: find_relevant_context p50 {student['p50_ms']:.2f}ms p95 {student['p95_ms']:.2f}ms | "
+                  f"get_user_context cold p50 {result['get_user_context_cold']['p50_ms']:.2f}ms | "
+                  f"recall@{top_k} {result['recall_at_k']} | build {result['build_seconds']:.2f}s, "
+                  f"peak {result['build_peak_mib']} MiB, vectors {result['vector_mib']} MiB")
+        return results
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval latency, memory and recall on synthetic corpora")
+    parser.add_argument("--scales", default="1k,10k", help="Comma-separated total item counts, e.g. 1k,10k,100k,1m")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"Comma-separated subset of: {', '.join(MODES)}")
+    parser.add_argument("--queries", type=int, default=200, help="Questions per scale")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/retrieval-<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(unknown)}")
+    scales = [parse_scale(scale) for scale in args.scales.split(",") if scale.strip()]
+
+    results = []
+    for items in scales:
+        print(f"Scale {items} items")
+        results.extend(run_scale(items, modes, args.queries, args.top_k, args.seed))
+
+    parameters = {'scales': scales, 'modes': modes, 'queries': args.queries, 'top_k': args.top_k, 'seed': args.seed}
+    path = write_results("retrieval", parameters, results, args.output)
+    print(f"Results written to {path}")
+    if args.baseline:
+        compare_to_baseline(args.baseline, results, ['scale', 'mode'], [
+            'find_relevant_context_student.p50_ms', 'find_relevant_context_student.p95_ms',
+            'get_user_context_cold.p50_ms', 'recall_at_k', 'build_peak_mib', 'vector_mib',
+        ])
+
+
+if __name__ == "__main__":
+    main()
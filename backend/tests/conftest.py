@@ -0,0 +1,78 @@
+"""Run the app against a throwaway tree: SQLite database, uploads, the offline hashing encoder and
+the offline fake LLM.
+
+Runs before any test module imports the app: the engine and settings are created at import, and
+app.main mounts ../frontend/src and ../uploads relative to the working directory.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_directory = tempfile.mkdtemp(prefix="phoenix-tests-")
+for _subdirectory in ("backend", "frontend/src", "uploads/slides"):
+    os.makedirs(os.path.join(_directory, _subdirectory), exist_ok=True)
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(os.path.join(_directory, "backend"))
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_directory, 'test.db')}"
+os.environ["EMBEDDING_BACKEND"] = "hashing"
+os.environ["ANN_INDEX_DIR"] = os.path.join(_directory, "vector_index")
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ["FAKE_LLM_TOKEN_DELAY_SECONDS"] = "0"
+os.environ["FAKE_LLM_FIRST_TOKEN_DELAY_SECONDS"] = "0"
+os.environ["PDF_EXTRACT_WORKERS"] = "1"
+
+from app.core.config import settings  # noqa: E402
+
+# Absolute, as DocumentProcessor.resolve_path resolves relative paths against the source tree
+settings.uploads_path = os.path.join(_directory, "uploads")
+settings.slides_path = os.path.join(settings.uploads_path, "slides")
+settings.resources_path = os.path.join(settings.uploads_path, "resources")
+
+
+@pytest.fixture
+def db():
+    """A session on freshly created tables, dropped again afterwards
+
+    The shared RAG service is reset too, so no index or cache outlives the rows it was built from.
+    """
+    from app.core.database import SessionLocal, engine
+    from app.models import models
+    from app.services.rag_service import rag_service
+
+    models.Base.metadata.create_all(bind=engine)
+    rag_service.__init__()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        models.Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    """A TestClient for the app; startup hooks (index warm-up, requeueing) are not run"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def make_user(db):
+    """Create a user; returns it with the Authorization headers of a valid token"""
+    from app.core.security import create_access_token
+    from app.models.models import User
+
+    def make(username: str, is_admin: bool = False):
+        user = User(username=username, email=f"{username}@example.com", hashed_password="-", is_admin=is_admin)
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        return user, {'Authorization': f"Bearer {create_access_token(data={'sub': username})}"}
+
+    return make
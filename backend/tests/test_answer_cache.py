@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+from app.models.models import Class, Flashcard, User
+from app.services import answer_cache as answer_cache_module
+from app.services.answer_cache import AnswerCache, context_fingerprint
+from app.services.rag_service import rag_service
+
+ITEMS = [("chunk", 11, 1), ("flashcard", 5, 1)]
+
+
+def unit(*values) -> np.ndarray:
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def context(class_ids):
+    return {'class_ids': class_ids}
+
+
+def test_answers_are_only_shared_within_the_same_class_set():
+    cache = AnswerCache()
+    fingerprint = context_fingerprint(ITEMS)
+    cache.put("What is osmosis?", [1, 2], fingerprint, None, "answer for 1+2")
+
+    assert cache.get("What is osmosis?", [2, 1], fingerprint) == "answer for 1+2"
+    assert cache.get("What is osmosis?", [1], fingerprint) is None
+    assert cache.get("What is osmosis?", [1, 2, 3], fingerprint) is None
+    # Admins (every class) have their own entries
+    assert cache.get("What is osmosis?", None, fingerprint) is None
+
+
+def test_answers_are_not_shared_across_retrieved_contexts():
+    cache = AnswerCache()
+    cache.put("What is osmosis?", [1], context_fingerprint(ITEMS), None, "answer")
+
+    # The fingerprint ignores order but not membership
+    assert cache.get("What is osmosis?", [1], context_fingerprint(ITEMS[::-1])) == "answer"
+    assert cache.get("What is osmosis?", [1], context_fingerprint(ITEMS[:1])) is None
+    assert cache.get("What is osmosis?", [1], context_fingerprint(ITEMS + [("chunk", 12, 1)])) is None
+
+
+def test_similar_questions_hit_only_above_the_threshold():
+    cache = AnswerCache(similarity_threshold=0.95)
+    fingerprint = context_fingerprint(ITEMS)
+    cache.put("What is osmosis?", [1], fingerprint, unit(1, 0, 0), "answer")
+
+    assert cache.get("what is OSMOSIS", [1], fingerprint) == "answer"  # Same normalized text, no embedding needed
+    assert cache.get("Explain osmosis", [1], fingerprint, unit(1, 0.2, 0)) == "answer"  # cosine 0.98
+    assert cache.get("Explain diffusion", [1], fingerprint, unit(1, 0.5, 0)) is None  # cosine 0.89
+    assert cache.get("Explain diffusion", [1], fingerprint) is None
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 2
+
+
+def test_answers_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache_module.time, "monotonic", lambda: now[0])
+    cache = AnswerCache(ttl_seconds=60)
+    fingerprint = context_fingerprint(ITEMS)
+    cache.put("What is osmosis?", [1], fingerprint, None, "answer")
+
+    now[0] += 59
+    assert cache.get("What is osmosis?", [1], fingerprint) == "answer"
+    now[0] += 1
+    assert cache.get("What is osmosis?", [1], fingerprint) is None
+    assert cache.stats()['size'] == 0
+
+
+def test_answers_generated_before_an_invalidation_are_not_stored():
+    cache = AnswerCache()
+    fingerprint = context_fingerprint(ITEMS)
+    epoch = cache.epoch
+    cache.invalidate_classes([7])  # Content changed while the answer was being generated
+
+    cache.put("What is osmosis?", [1], fingerprint, None, "stale answer", epoch)
+    assert cache.get("What is osmosis?", [1], fingerprint) is None
+
+    cache.put("What is osmosis?", [1], fingerprint, None, "fresh answer", cache.epoch)
+    assert cache.get("What is osmosis?", [1], fingerprint) == "fresh answer"
+
+
+def remember(question: str, class_ids, items=ITEMS):
+    rag_service.remember_answer(question, context(class_ids), items, None, f"answer over {class_ids}",
+                                rag_service.answer_cache.epoch)
+
+
+def test_slide_changes_drop_the_answers_of_their_class(db):
+    remember("What is osmosis?", [1])
+    remember("What is osmosis?", [2])
+    remember("What is osmosis?", None)
+    epoch = rag_service.answer_cache.epoch
+
+    rag_service.remove_slide(1, 99)
+
+    assert rag_service.answer_cache.epoch > epoch
+    assert rag_service.cached_answer("What is osmosis?", context([1]), ITEMS) is None
+    assert rag_service.cached_answer("What is osmosis?", context(None), ITEMS) is None
+    assert rag_service.cached_answer("What is osmosis?", context([2]), ITEMS) == "answer over [2]"
+
+
+@pytest.fixture
+def classes(db):
+    admin = User(username="admin", email="admin@example.com", hashed_password="-", is_admin=True)
+    db.add(admin)
+    db.commit()
+    classes = [Class(name=name, created_by=admin.id) for name in ("Biology", "Chemistry", "History")]
+    db.add_all(classes)
+    db.commit()
+    return admin, classes
+
+
+def test_flashcard_changes_drop_the_answers_of_old_and_new_classes(db, classes):
+    admin, (biology, chemistry, history) = classes
+    flashcard = Flashcard(term="Osmosis", definition="Water crossing a membrane", created_by=admin.id)
+    flashcard.assigned_classes.append(biology)
+    db.add(flashcard)
+    db.commit()
+    for class_obj in (biology, chemistry, history):
+        remember("What is osmosis?", [class_obj.id])
+
+    # Moved from Biology to Chemistry
+    flashcard.assigned_classes = [chemistry]
+    db.commit()
+    rag_service.sync_flashcard(flashcard, previous_class_ids=[biology.id])
+
+    assert rag_service.cached_answer("What is osmosis?", context([biology.id]), ITEMS) is None
+    assert rag_service.cached_answer("What is osmosis?", context([chemistry.id]), ITEMS) is None
+    assert rag_service.cached_answer("What is osmosis?", context([history.id]), ITEMS) == f"answer over [{history.id}]"
+
+
+def test_system_prompt_has_nothing_user_specific():
+    # Cached answers are shared by every user of the same classes
+    student = User(id=3, username="ada-lovelace", email="ada@example.com", hashed_password="-")
+    prompt = rag_service.create_system_prompt(student, ["[FLASHCARD] Osmosis: Water crossing a membrane"])
+
+    assert "ada-lovelace" not in prompt
+    assert prompt == rag_service.create_system_prompt(User(id=4, username="grace"), ["[FLASHCARD] Osmosis: Water crossing a membrane"])
@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.security import create_access_token
+from app.main import app
+from app.models.models import User
+
+
+def test_authenticated_requests_wait_for_a_connection_off_the_event_loop(db):
+    """With every pooled connection checked out, authenticated requests must wait in the threadpool
+    rather than block the event loop in the pool checkout, and all complete once one is returned"""
+    db.add(User(username="student", email="student@example.com", hashed_password="-"))
+    db.commit()
+    headers = {'Authorization': f"Bearer {create_access_token(data={'sub': 'student'})}"}
+
+    # One connection, so the test can hold the whole pool
+    small_engine = create_engine(settings.database_url, connect_args={"check_same_thread": False},
+                                 pool_size=1, max_overflow=0, pool_timeout=5)
+    small_session = sessionmaker(autocommit=False, autoflush=False, bind=small_engine)
+
+    def get_small_db():
+        session = small_session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            held = small_engine.connect()
+            requests = [asyncio.create_task(client.get("/api/auth/me", headers=headers)) for _ in range(4)]
+            # The loop must keep running other work while the requests wait for the connection
+            ticks = 0
+            started = time.monotonic()
+            while time.monotonic() - started < 0.3:
+                await asyncio.sleep(0.01)
+                ticks += 1
+            held.close()
+            return ticks, await asyncio.wait_for(asyncio.gather(*requests), timeout=10)
+
+    app.dependency_overrides[get_db] = get_small_db
+    try:
+        ticks, responses = asyncio.run(scenario())
+    finally:
+        app.dependency_overrides.clear()
+        small_engine.dispose()
+
+    assert ticks >= 10
+    assert [response.status_code for response in responses] == [200] * 4
+    assert all(response.json()['username'] == "student" for response in responses)
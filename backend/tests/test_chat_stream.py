@@ -0,0 +1,102 @@
+import json
+from types import SimpleNamespace
+from typing import List, Tuple
+
+import pytest
+
+from app.api import chat
+from app.models.models import ChatMessage, Class, Flashcard
+from app.services.rag_service import rag_service
+
+
+@pytest.fixture
+def student(db, make_user):
+    """A student enrolled in one class with a flashcard, and their auth headers"""
+    admin, _ = make_user("admin", is_admin=True)
+    student, headers = make_user("student")
+    class_obj = Class(name="Biology", created_by=admin.id)
+    class_obj.students.append(student)
+    flashcard = Flashcard(term="Photosynthesis", definition="Plants turn light into sugar", created_by=admin.id)
+    flashcard.assigned_classes.append(class_obj)
+    db.add_all([class_obj, flashcard])
+    rag_service.embed_flashcards([flashcard])
+    db.commit()
+    return student, headers
+
+
+def read_events(response) -> List[Tuple[str, dict]]:
+    """(event name, data) of every Server-Sent Event; unnamed events are 'message'"""
+    events = []
+    for block in response.text.split("\n\n"):
+        if not block.strip():
+            continue
+        name = "message"
+        for line in block.split("\n"):
+            if line.startswith("event: "):
+                name = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        events.append((name, data))
+    return events
+
+
+def test_stream_sends_tokens_in_order_then_the_stored_message(db, client, student):
+    user, headers = student
+    question = "What is photosynthesis?"
+    # The fake LLM answers word by word, counting the course materials in the system prompt
+    reply = f'This is an offline test response to: "{question}". It was generated with 1 course material excerpts in context.'
+    expected = [word if index == 0 else f" {word}" for index, word in enumerate(reply.split(" "))]
+
+    response = client.post("/api/chat/stream", json={'message': question}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith("text/event-stream")
+    events = read_events(response)
+    tokens = [data['token'] for name, data in events[:-1]]
+    assert [name for name, _ in events[:-1]] == ["message"] * len(tokens)
+    assert tokens == expected
+
+    name, done = events[-1]
+    assert name == "done"
+    assert done['cached'] is False
+    assert done['message'] == question
+    assert done['response'] == "".join(tokens)
+    stored = db.query(ChatMessage).filter(ChatMessage.user_id == user.id).all()
+    assert [(message.id, message.response) for message in stored] == [(done['id'], "".join(tokens))]
+
+
+def test_stream_reports_client_errors_and_stores_nothing(db, client, student, monkeypatch):
+    user, headers = student
+
+    async def failing_stream():
+        yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content="Partial"))])
+        raise RuntimeError("upstream connection reset")
+
+    async def create(**kwargs):
+        assert kwargs['stream'] is True
+        return failing_stream()
+
+    monkeypatch.setattr(chat.openai_client.chat.completions, "create", create)
+
+    response = client.post("/api/chat/stream", json={'message': "What is photosynthesis?"}, headers=headers)
+
+    assert response.status_code == 200
+    events = read_events(response)
+    assert events[0] == ("message", {'token': "Partial"})
+    assert events[-1] == ("error", {'detail': "Error communicating with OpenAI: upstream connection reset"})
+    assert "done" not in [name for name, _ in events]
+    assert db.query(ChatMessage).filter(ChatMessage.user_id == user.id).count() == 0
+
+
+def test_stream_reports_errors_before_the_first_token(db, client, student, monkeypatch):
+    user, headers = student
+
+    async def create(**kwargs):
+        raise RuntimeError("model overloaded")
+
+    monkeypatch.setattr(chat.openai_client.chat.completions, "create", create)
+
+    response = client.post("/api/chat/stream", json={'message': "What is photosynthesis?"}, headers=headers)
+
+    assert read_events(response) == [("error", {'detail': "Error communicating with OpenAI: model overloaded"})]
+    assert db.query(ChatMessage).filter(ChatMessage.user_id == user.id).count() == 0
@@ -0,0 +1,88 @@
+from app.core.config import settings
+from app.services.chunking import Chunk, iter_page_chunks, iter_segments
+from app.services.context_packer import estimate_tokens
+from app.services.document_processor import document_processor
+from app.services.pdf_extraction import PageText, iter_pdf_pages
+from benchmarks.common import make_pdf
+
+SENTENCES = [f"Sentence {number} explains one step of how the cell cycle moves forward." for number in range(1, 13)]
+
+
+def pdf_pages(pages):
+    """(number, text) pairs as the PageText tuples document_processor.iter_chunks reads"""
+    return [PageText(number, text, 0.0) for number, text in pages]
+
+
+def sentences_of(text: str):
+    return [sentence.strip() for sentence in iter_segments(text)]
+
+
+def test_chunks_are_made_of_whole_sentences():
+    chunks = list(iter_page_chunks([(1, " ".join(SENTENCES))], max_chars=200, overlap_chars=0))
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert set(sentences_of(chunk.text)) <= set(SENTENCES)
+    # Without overlap every sentence is in exactly one chunk, in order
+    assert [sentence for chunk in chunks for sentence in sentences_of(chunk.text)] == SENTENCES
+
+
+def test_chunks_respect_the_configured_character_and_token_limits(monkeypatch):
+    pages = [(1, " ".join(SENTENCES))]
+
+    monkeypatch.setattr(settings, "chunk_max_chars", 250)
+    monkeypatch.setattr(settings, "chunk_max_tokens", 0)
+    by_chars = list(document_processor.iter_chunks(pdf_pages(pages)))
+    assert all(len(chunk.text) <= 250 for chunk in by_chars)
+    assert max(len(chunk.text) for chunk in by_chars) > 150
+
+    monkeypatch.setattr(settings, "chunk_max_tokens", 30)
+    by_tokens = list(document_processor.iter_chunks(pdf_pages(pages)))
+    assert all(estimate_tokens(chunk.text) <= 30 for chunk in by_tokens)
+    assert len(by_tokens) > len(by_chars)
+
+
+def test_a_sentence_longer_than_the_limit_is_split_between_words():
+    long_sentence = " ".join(["mitochondria"] * 40) + "."
+
+    chunks = list(iter_page_chunks([(1, long_sentence)], max_chars=100, overlap_chars=0))
+
+    assert len(chunks) > 1
+    assert all(len(chunk.text) <= 100 for chunk in chunks)
+    assert " ".join(chunk.text for chunk in chunks) == long_sentence
+
+
+def test_consecutive_chunks_overlap_by_whole_trailing_sentences():
+    chunks = list(iter_page_chunks([(1, " ".join(SENTENCES))], max_chars=250, overlap_chars=100))
+
+    assert len(chunks) > 2
+    for previous, current in zip(chunks, chunks[1:]):
+        previous_sentences, current_sentences = sentences_of(previous.text), sentences_of(current.text)
+        shared = [sentence for sentence in current_sentences if sentence in previous_sentences]
+        assert shared, "consecutive chunks share no sentence"
+        # The shared sentences are the tail of the previous chunk and the head of the next one
+        assert previous_sentences[-len(shared):] == shared == current_sentences[:len(shared)]
+        assert len(" ".join(shared)) <= 100
+
+
+def test_a_chunk_spanning_a_page_break_records_both_pages():
+    pages = [(1, " ".join(SENTENCES[:3])), (2, " ".join(SENTENCES[3:6]))]
+
+    assert list(iter_page_chunks(pages, max_chars=1000, overlap_chars=0)) == [Chunk(" ".join(SENTENCES[:6]), 1, 2)]
+
+    # A chunk that only carries the previous page's last sentence over still starts on that page
+    chunks = list(iter_page_chunks(pages, max_chars=250, overlap_chars=100))
+    assert chunks[0] == Chunk(" ".join(SENTENCES[:3]), 1, 1)
+    assert chunks[1] == Chunk(" ".join(SENTENCES[2:5]), 1, 2)
+
+
+def test_chunks_of_a_pdf_carry_no_page_markers(tmp_path):
+    path = tmp_path / "cycle.pdf"
+    path.write_bytes(make_pdf([SENTENCES[:6], SENTENCES[6:]]))
+
+    chunks = list(document_processor.iter_chunks(iter_pdf_pages(str(path))))
+
+    assert chunks
+    assert not any("--- Page" in chunk.text for chunk in chunks)
+    assert (chunks[0].page_start, chunks[-1].page_end) == (1, 2)
+
@@ -0,0 +1,108 @@
+from app.core.config import settings
+from app.models.models import User
+from app.services.context_packer import (
+    MIN_PASSAGE_TOKENS, TRUNCATION_MARK, estimate_tokens, pack_context, truncate_to_tokens
+)
+from app.services.rag_service import rag_service
+
+WORDS = "cells divide by mitosis and the chromosomes separate into two identical nuclei before cytokinesis".split()
+
+
+def text(words: int, offset: int = 0) -> str:
+    return " ".join(WORDS[(offset + index) % len(WORDS)] for index in range(words))
+
+
+def passage(item_id: int, body: str, score: float, group=None, header: str = "") -> dict:
+    return {'kind': "chunk" if group is not None else "flashcard", 'id': item_id, 'class_id': 1,
+            'score': score, 'header': header, 'body': body, 'group': group}
+
+
+def test_budget_is_the_setting_unless_the_context_window_is_smaller(monkeypatch):
+    user = User(username="student")
+    monkeypatch.setattr(settings, "context_token_budget", 1500)
+    monkeypatch.setattr(settings, "llm_context_window", 4096)
+    monkeypatch.setattr(settings, "llm_max_tokens", 500)
+    assert rag_service.context_token_budget(user, "What is mitosis?") == 1500
+
+    # The prompt, the question and the answer must all still fit in the window
+    monkeypatch.setattr(settings, "llm_context_window", 1200)
+    overhead = estimate_tokens(rag_service.create_system_prompt(user, [""])) + estimate_tokens("What is mitosis?") + 8
+    assert rag_service.context_token_budget(user, "What is mitosis?") == 1200 - 500 - overhead
+
+    monkeypatch.setattr(settings, "llm_max_tokens", 1200)
+    assert rag_service.context_token_budget(user, "What is mitosis?") == 0
+
+
+def test_passages_are_packed_best_first_within_the_budget():
+    passages = [passage(1, text(10), 0.2), passage(2, text(10, 3), 0.9), passage(3, text(10, 6), 0.5)]
+
+    packed = pack_context(passages, 1000)
+
+    assert packed['items'] == [("flashcard", 2, 1), ("flashcard", 3, 1), ("flashcard", 1, 1)]
+    assert packed['tokens'] == sum(estimate_tokens(item) + 1 for item in packed['texts'])
+    assert (packed['dropped'], packed['duplicates'], packed['trimmed']) == (0, 0, 0)
+
+
+def test_repeated_bodies_are_skipped():
+    body = text(12)
+    passages = [passage(1, body, 0.9), passage(2, "  " + body.upper().replace(" ", "\n"), 0.8), passage(3, text(5, 4), 0.1)]
+
+    packed = pack_context(passages, 1000)
+
+    assert [item_id for _, item_id, _ in packed['items']] == [1, 3]
+    assert packed['duplicates'] == 1
+
+
+def test_overlap_with_a_neighbouring_chunk_of_the_same_slide_is_trimmed():
+    shared = "the chromosomes separate into two identical nuclei"
+    first = "During mitosis a cell copies its DNA, then " + shared
+    second = shared + " before the cytoplasm divides in cytokinesis."
+    other_slide = shared + " in plant cells as well."
+    passages = [passage(1, first, 0.9, group=7), passage(2, second, 0.8, group=7), passage(3, other_slide, 0.7, group=8)]
+
+    packed = pack_context(passages, 1000)
+
+    # Chunks of other slides (group) are left alone
+    assert packed['texts'] == [first, "before the cytoplasm divides in cytokinesis.", other_slide]
+    assert packed['trimmed'] == 1
+
+    # Packed the other way round, the overlap is cut from the end of the earlier chunk instead
+    packed = pack_context([passage(2, second, 0.9, group=7), passage(1, first, 0.8, group=7)], 1000)
+    assert packed['texts'] == [second, "During mitosis a cell copies its DNA, then"]
+
+
+def test_a_chunk_entirely_inside_its_neighbour_counts_as_a_duplicate():
+    shared = text(8)
+    packed = pack_context([passage(1, text(4, 5) + " " + shared, 0.9, group=7), passage(2, shared, 0.8, group=7)], 1000)
+
+    assert len(packed['texts']) == 1
+    assert packed['duplicates'] == 1
+
+
+def test_the_last_passage_is_truncated_to_fit_or_dropped_if_too_little_room_is_left():
+    header = "[DOCUMENT_CHUNK] Document: Cells\nContent: "
+    first = passage(1, text(60), 0.9, group=1, header=header)
+    first_tokens = estimate_tokens(header + first['body']) + 1
+    second = passage(2, text(200, 5), 0.5, group=2, header=header)
+
+    room = MIN_PASSAGE_TOKENS + 30
+    packed = pack_context([first, second], first_tokens + estimate_tokens(header) + 1 + room)
+
+    assert len(packed['texts']) == 2
+    truncated = packed['texts'][1]
+    assert truncated.startswith(header) and truncated.endswith(TRUNCATION_MARK)
+    assert second['body'].startswith(truncated[len(header):-len(TRUNCATION_MARK)])
+    assert packed['tokens'] <= first_tokens + estimate_tokens(header) + 1 + room
+    assert packed['trimmed'] == 1
+
+    packed = pack_context([first, second], first_tokens + estimate_tokens(header) + 1 + MIN_PASSAGE_TOKENS - 1)
+    assert packed['items'] == [("chunk", 1, 1)]
+    assert packed['dropped'] == 1
+
+
+def test_truncation_cuts_at_a_word_boundary():
+    assert truncate_to_tokens("short enough", 10) == "short enough"
+    truncated = truncate_to_tokens(text(50), 10)
+    assert truncated.endswith(TRUNCATION_MARK)
+    assert text(50).startswith(truncated[:-len(TRUNCATION_MARK)] + " ")
+    assert estimate_tokens(truncated[:-len(TRUNCATION_MARK)]) <= 10
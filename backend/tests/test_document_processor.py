@@ -0,0 +1,92 @@
+import pytest
+
+from app.core.config import settings
+from app.models.models import Class, DocumentChunk, Slide
+from app.services.document_processor import document_processor
+from benchmarks.common import make_pdf
+
+PAGES = [[f"Page {page} describes how enzymes speed up reaction {line} in the cell." for line in range(10)]
+         for page in range(1, 5)]
+
+
+@pytest.fixture
+def pdf_slides(db, make_user, tmp_path, monkeypatch):
+    """Make slides of the same PDF; small chunks and batches so a run commits several of them"""
+    monkeypatch.setattr(settings, "ingestion_batch_size", 2)
+    monkeypatch.setattr(settings, "chunk_max_chars", 200)
+    monkeypatch.setattr(settings, "chunk_overlap_chars", 60)
+    admin, _ = make_user("admin", is_admin=True)
+    class_obj = Class(name="Biology", created_by=admin.id)
+    db.add(class_obj)
+    db.commit()
+    path = tmp_path / "enzymes.pdf"
+    path.write_bytes(make_pdf(PAGES))
+
+    def make() -> Slide:
+        slide = Slide(title="Enzymes", filename="enzymes.pdf", file_path=str(path), file_type="application/pdf",
+                      class_id=class_obj.id)
+        db.add(slide)
+        db.commit()
+        return slide
+
+    return make
+
+
+def stored(db, slide_id: int):
+    db.expire_all()
+    chunks = db.query(DocumentChunk).filter(DocumentChunk.slide_id == slide_id).order_by(DocumentChunk.chunk_index)
+    return [(chunk.chunk_index, chunk.chunk_text, chunk.page_start, chunk.page_end, chunk.content_hash,
+             chunk.embedding_blob) for chunk in chunks]
+
+
+def test_a_resumed_run_stores_the_same_chunks_as_an_uninterrupted_one(db, pdf_slides, monkeypatch):
+    slide = pdf_slides()
+    real_chunk_rows = document_processor.chunk_rows
+    batches = []
+    fail_on_batch = [3]
+
+    def failing_chunk_rows(slide_id, batch, session):
+        batches.append([index for index, _ in batch])
+        if len(batches) in fail_on_batch:
+            raise OSError("embedding service went away")
+        return real_chunk_rows(slide_id, batch, session)
+
+    monkeypatch.setattr(document_processor, "chunk_rows", failing_chunk_rows)
+    assert document_processor.process_document(slide, db) is False
+    # The two batches committed before the failure are kept
+    assert [chunk[0] for chunk in stored(db, slide.id)] == [0, 1, 2, 3]
+
+    # Only the chunks the interrupted run had not stored are processed again
+    batches.clear()
+    fail_on_batch.clear()
+    assert document_processor.process_document(slide, db, resume=True) is True
+    assert batches[0][0] == 4
+    monkeypatch.setattr(document_processor, "chunk_rows", real_chunk_rows)
+
+    uninterrupted = pdf_slides()
+    assert document_processor.process_document(uninterrupted, db) is True
+
+    resumed, expected = stored(db, slide.id), stored(db, uninterrupted.id)
+    assert len(expected) > 6
+    assert resumed == expected
+    assert [chunk[0] for chunk in resumed] == list(range(len(expected)))
+
+
+def test_a_known_page_count_is_not_counted_again(db, pdf_slides, monkeypatch):
+    from app.services import document_processor as document_processor_module
+    from app.services import pdf_extraction
+
+    counted = []
+    real_count_pdf_pages = pdf_extraction.count_pdf_pages
+
+    def counting(pdf_path):
+        counted.append(pdf_path)
+        return real_count_pdf_pages(pdf_path)
+
+    monkeypatch.setattr(document_processor_module, "count_pdf_pages", counting)
+    monkeypatch.setattr(pdf_extraction, "count_pdf_pages", counting)
+    slide = pdf_slides()
+
+    assert document_processor.process_document(slide, db, page_count=len(PAGES)) is True
+    assert counted == []
+    assert stored(db, slide.id)[-1][3] == len(PAGES)
@@ -0,0 +1,171 @@
+import threading
+import time
+
+import pytest
+
+from app.api import slides as slides_api
+from app.models.models import Class, DocumentChunk, IngestionJob, Slide
+from app.services import document_processor as document_processor_module
+from app.services.document_processor import document_processor
+from app.services.ingestion_queue import DONE, FAILED, QUEUED, RUNNING, ingestion_queue
+from benchmarks.common import make_pdf
+
+PAGES = [[f"Page {page} explains how cells divide and grow, step {line}." for line in range(12)] for page in range(1, 4)]
+
+
+@pytest.fixture
+def admin(db, make_user, monkeypatch):
+    """Admin auth headers and a class to upload to; retries run without delay"""
+    monkeypatch.setattr(ingestion_queue, "retry_delay_seconds", 0)
+    monkeypatch.setattr(ingestion_queue, "max_attempts", 2)
+    user, headers = make_user("admin", is_admin=True)
+    class_obj = Class(name="Biology", created_by=user.id)
+    db.add(class_obj)
+    db.commit()
+    yield headers, class_obj.id
+    wait_until(lambda: ingestion_queue.stats()['slides_in_progress'] == 0)
+
+
+def wait_until(condition, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def upload(client, headers, class_id: int) -> int:
+    response = client.post(f"/api/slides/upload/{class_id}", params={'title': "Cell division"},
+                           files={'file': ("cells.pdf", make_pdf(PAGES), "application/pdf")}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()['job']['status'] in (QUEUED, RUNNING, DONE)
+    return response.json()['id']
+
+
+def finished_job(client, headers, slide_id: int) -> dict:
+    """The slide's job once it is done or failed, read through the status endpoint"""
+    job = {}
+
+    def finished():
+        job.update(client.get(f"/api/slides/{slide_id}/status", headers=headers).json())
+        return job['status'] in (DONE, FAILED)
+
+    wait_until(finished)
+    return job
+
+
+def stored_chunks(db, slide_id: int):
+    db.expire_all()
+    return db.query(DocumentChunk).filter(DocumentChunk.slide_id == slide_id).order_by(DocumentChunk.chunk_index).all()
+
+
+def test_upload_is_processed_to_done(db, client, admin):
+    headers, class_id = admin
+    slide_id = upload(client, headers, class_id)
+
+    job = finished_job(client, headers, slide_id)
+
+    chunks = stored_chunks(db, slide_id)
+    assert (job['status'], job['attempts'], job['progress'], job['error']) == (DONE, 1, 1.0, None)
+    assert job['chunks_created'] == len(chunks) > 0
+    assert [chunk.chunk_index for chunk in chunks] == list(range(len(chunks)))
+    assert all(chunk.embedding_blob is not None for chunk in chunks)
+    assert (chunks[0].page_start, chunks[-1].page_end) == (1, len(PAGES))
+
+
+def test_failed_extraction_is_retried(db, client, admin, monkeypatch):
+    headers, class_id = admin
+    real_iter_pdf_pages = document_processor_module.iter_pdf_pages
+    calls = []
+
+    def flaky_iter_pdf_pages(pdf_path, page_count=None):
+        calls.append(pdf_path)
+        if len(calls) == 1:
+            raise OSError("disk hiccup")
+        return real_iter_pdf_pages(pdf_path, page_count)
+
+    monkeypatch.setattr(document_processor_module, "iter_pdf_pages", flaky_iter_pdf_pages)
+    slide_id = upload(client, headers, class_id)
+
+    job = finished_job(client, headers, slide_id)
+
+    chunks = stored_chunks(db, slide_id)
+    assert (job['status'], job['attempts'], job['error']) == (DONE, 2, None)
+    assert len(calls) == 2
+    assert job['chunks_created'] == len(chunks) > 0
+    assert [chunk.chunk_index for chunk in chunks] == list(range(len(chunks)))
+
+
+def test_extraction_failing_every_attempt_gives_up(db, client, admin, monkeypatch):
+    headers, class_id = admin
+
+    def broken_iter_pdf_pages(pdf_path, page_count=None):
+        raise OSError("unreadable")
+
+    monkeypatch.setattr(document_processor_module, "iter_pdf_pages", broken_iter_pdf_pages)
+    slide_id = upload(client, headers, class_id)
+
+    job = finished_job(client, headers, slide_id)
+
+    assert (job['status'], job['attempts']) == (FAILED, 2)
+    assert job['error'] == "Processing failed during extracting (attempt 2 of 2)"
+    assert job['finished_at'] is not None
+    assert stored_chunks(db, slide_id) == []
+
+
+def test_deleting_a_slide_cancels_its_running_job(db, client, admin, monkeypatch):
+    headers, class_id = admin
+    embedding = threading.Event()
+    deleted = threading.Event()
+    real_generate_embeddings = document_processor.generate_embeddings
+
+    def slow_generate_embeddings(chunks, progress=None):
+        embedding.set()
+        deleted.wait(10)
+        return real_generate_embeddings(chunks, progress)
+
+    monkeypatch.setattr(document_processor, "generate_embeddings", slow_generate_embeddings)
+    slide_id = upload(client, headers, class_id)
+    assert embedding.wait(10)
+    assert ingestion_queue.stats()['slides_in_progress'] == 1
+
+    assert client.delete(f"/api/slides/{slide_id}", headers=headers).status_code == 200
+    assert ingestion_queue.stats()['cancelling'] == 1
+    deleted.set()
+
+    wait_until(lambda: ingestion_queue.stats()['slides_in_progress'] == 0)
+    db.expire_all()
+    assert db.query(IngestionJob).filter(IngestionJob.slide_id == slide_id).count() == 0
+    assert db.query(Slide).filter(Slide.id == slide_id).count() == 0
+    assert stored_chunks(db, slide_id) == []
+    assert ingestion_queue.stats()['cancelling'] == 0
+
+
+def test_deleting_a_processed_slide_records_no_cancellation(db, client, admin):
+    headers, class_id = admin
+    slide_id = upload(client, headers, class_id)
+    finished_job(client, headers, slide_id)
+    wait_until(lambda: ingestion_queue.stats()['slides_in_progress'] == 0)
+
+    assert client.delete(f"/api/slides/{slide_id}", headers=headers).status_code == 200
+
+    assert ingestion_queue.stats()['cancelling'] == 0
+    assert slide_id not in slides_api.ingestion_queue._cancelled
+
+
+def test_jobs_left_unfinished_are_requeued_at_startup(db, client, admin, tmp_path):
+    headers, class_id = admin
+    path = tmp_path / "cells.pdf"
+    path.write_bytes(make_pdf(PAGES))
+    slide = Slide(title="Cell division", filename="cells.pdf", file_path=str(path), file_type="application/pdf",
+                  class_id=class_id)
+    db.add(slide)
+    db.commit()
+    # As a previous process left it: interrupted mid-run
+    db.add(IngestionJob(slide_id=slide.id, status=RUNNING, stage="embedding", progress=0.4, attempts=1, chunks_created=0))
+    db.commit()
+
+    ingestion_queue.requeue_pending()
+
+    job = finished_job(client, headers, slide.id)
+    assert (job['status'], job['attempts']) == (DONE, 2)
+    assert job['chunks_created'] == len(stored_chunks(db, slide.id)) > 0
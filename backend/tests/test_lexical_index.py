@@ -0,0 +1,43 @@
+from app.services.lexical_index import LexicalIndex
+
+
+def test_removed_chunks_leave_no_trace_of_their_slide():
+    index = LexicalIndex()
+    index.add(("chunk", 1), "mitosis splits the nucleus", [1], slide_id=10)
+    index.add(("chunk", 2), "meiosis halves the chromosomes", [1], slide_id=10)
+
+    index.remove(("chunk", 1))
+    assert index.slide_docs[10] == {("chunk", 2)}
+
+    index.remove(("chunk", 2))
+    assert 10 not in index.slide_docs
+    assert index.doc_slide == {}
+    assert index.remove_slide(10) == 0
+
+
+def test_reindexing_a_chunk_under_another_slide_moves_it():
+    index = LexicalIndex()
+    index.add(("chunk", 1), "mitosis splits the nucleus", [1], slide_id=10)
+    index.add(("chunk", 1), "mitosis splits the nucleus", [1], slide_id=11)
+
+    assert dict(index.slide_docs) == {11: {("chunk", 1)}}
+    assert index.remove_slide(11) == 1
+    assert index.search("mitosis", None, 5) == []
+
+
+def test_ensure_built_builds_once_from_the_given_documents():
+    index = LexicalIndex()
+    calls = []
+
+    def documents():
+        calls.append(1)
+        return [(("chunk", 1), "mitosis splits the nucleus", [1], 10), (("flashcard", 2), "Osmosis: water", [1, 2], None)]
+
+    assert index.ensure_built(documents) is True
+    assert index.ensure_built(documents) is False
+    assert calls == [1]
+    assert [hit[:3] for hit in index.search("osmosis", [2], 5)] == [("flashcard", 2, 2)]
+
+    index.replace([(("chunk", 3), "cytokinesis", [1], 12)])
+    assert index.stats() == {'documents': 1, 'terms': 1}
+    assert dict(index.slide_docs) == {12: {("chunk", 3)}}
@@ -0,0 +1,87 @@
+import contextlib
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app.core.database import engine
+from app.models.models import Class, DocumentChunk, Flashcard, Slide, User
+from app.services.rag_service import rag_service
+
+
+@contextlib.contextmanager
+def count_queries():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def seed(db, classes: int, slides_per_class: int, chunks_per_slide: int, flashcards_per_class: int):
+    """An admin, a student enrolled in every class, and the given amount of material per class"""
+    admin = User(username="admin", email="admin@example.com", hashed_password="-", is_admin=True)
+    student = User(username="student", email="student@example.com", hashed_password="-")
+    db.add_all([admin, student])
+    db.commit()
+
+    for class_number in range(classes):
+        class_obj = Class(name=f"Class {class_number}", created_by=admin.id)
+        class_obj.students.append(student)
+        db.add(class_obj)
+        db.commit()
+        for slide_number in range(slides_per_class):
+            slide = Slide(title=f"Deck {slide_number}", filename="deck.pdf", file_path="deck.pdf",
+                          file_type="application/pdf", class_id=class_obj.id)
+            db.add(slide)
+            db.commit()
+            db.add_all([DocumentChunk(slide_id=slide.id, chunk_text=f"chunk {index}", chunk_index=index)
+                        for index in range(chunks_per_slide)])
+        for flashcard_number in range(flashcards_per_class):
+            flashcard = Flashcard(term=f"term {flashcard_number}", definition="definition", created_by=admin.id)
+            flashcard.assigned_classes.append(class_obj)
+            db.add(flashcard)
+        db.commit()
+
+    db.refresh(admin)
+    db.refresh(student)
+    return admin, student
+
+
+@pytest.mark.parametrize("classes, slides_per_class", [(1, 1), (3, 2), (25, 8)])
+def test_resolve_user_context_uses_three_queries(db, classes, slides_per_class):
+    admin, student = seed(db, classes, slides_per_class, chunks_per_slide=4, flashcards_per_class=3)
+
+    for user in (student, admin):
+        with count_queries() as statements:
+            context = rag_service.resolve_user_context(user, db)
+
+        assert len(statements) == 3
+        assert len(context['classes']) == classes
+        assert len(context['flashcards']) == classes * 3
+        assert len(context['chunks']) == classes * slides_per_class * 4
+
+
+def test_resolve_user_context_without_classes_uses_one_query(db):
+    admin, student = seed(db, classes=0, slides_per_class=0, chunks_per_slide=0, flashcards_per_class=0)
+
+    with count_queries() as statements:
+        context = rag_service.resolve_user_context(student, db)
+
+    assert len(statements) == 1
+    assert context == {'class_ids': [], 'classes': [], 'flashcards': [], 'chunks': []}
+
+
+def test_health_reports_when_the_indexes_were_built(db, client):
+    assert client.get("/health").json()['indexes_built_at'] == {'vector_index': None, 'lexical_index': None}
+
+    rag_service.ensure_indexes(db)
+
+    built_at = client.get("/health").json()['indexes_built_at']
+    assert built_at['vector_index'] is not None and built_at['lexical_index'] is not None
+    assert datetime.fromisoformat(built_at['vector_index']) == rag_service.index.built_at
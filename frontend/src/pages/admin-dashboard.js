@@ -755,18 +755,28 @@ async function sendChatMessage() {
     addChatMessage(message, 'user');
     chatInput.value = '';
 
+    // Stream the assistant response into its bubble as tokens arrive
+    const assistantDiv = addChatMessage('', 'assistant');
+
     try {
-        const response = await authService.makeAuthenticatedRequest('/chat/', {
+        await authService.streamAuthenticatedRequest('/chat/stream', {
             method: 'POST',
             body: JSON.stringify({ message: message })
+        }, (event, data) => {
+            if (event === 'error') {
+                throw new Error(data.detail);
+            }
+            if (event === 'done') {
+                assistantDiv.textContent = data.response;
+            } else if (data.token) {
+                assistantDiv.textContent += data.token;
+            }
+            chatMessages.scrollTop = chatMessages.scrollHeight;
         });
 
-        // Add assistant response
-        addChatMessage(response.response, 'assistant');
-
     } catch (error) {
         console.error('Error sending chat message:', error);
-        addChatMessage('Sorry, I encountered an error. Please try again.', 'assistant');
+        assistantDiv.textContent = 'Sorry, I encountered an error. Please try again.';
     }
 }
 
@@ -778,6 +788,7 @@ function addChatMessage(message, sender) {
 
     chatMessages.appendChild(messageDiv);
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    return messageDiv;
 }
 
 function showSuccess(message) {
@@ -1024,8 +1035,16 @@ async function uploadSelectedFiles() {
             const result = await response.json();
             console.log('Upload successful:', result);
 
+            // Processing continues in the background; follow the ingestion job until it finishes
+            const job = await waitForSlideProcessing(result.id, (progress) => {
+                uploadBtn.innerHTML = `⚡ Vectorizing ${file.name}... ${Math.round(progress * 100)}%`;
+            });
+            if (job.status === 'failed') {
+                throw new Error(`Processing ${file.name} failed: ${job.error || 'unknown error'}`);
+            }
+
             processedFiles++;
-            totalChunks += result.chunks_created || 0;
+            totalChunks += job.chunks_created || 0;
         }
 
         // Success with detailed information
@@ -1052,6 +1071,18 @@ async function uploadSelectedFiles() {
     }
 }
 
+async function waitForSlideProcessing(slideId, onProgress) {
+    // Poll the slide's ingestion job until it is done or has failed
+    while (true) {
+        const job = await authService.makeAuthenticatedRequest(`/slides/${slideId}/status`);
+        onProgress(job.progress || 0);
+        if (job.status === 'done' || job.status === 'failed') {
+            return job;
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 async function loadClassSlides(classId) {
     try {
         console.log('Loading slides for class:', classId);
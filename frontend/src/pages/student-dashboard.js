@@ -195,18 +195,28 @@ async function sendChatMessage() {
     addChatMessage(message, 'user');
     chatInput.value = '';
 
+    // Stream the assistant response into its bubble as tokens arrive
+    const assistantDiv = addChatMessage('', 'assistant');
+
     try {
-        const response = await authService.makeAuthenticatedRequest('/chat/', {
+        await authService.streamAuthenticatedRequest('/chat/stream', {
             method: 'POST',
             body: JSON.stringify({ message: message })
+        }, (event, data) => {
+            if (event === 'error') {
+                throw new Error(data.detail);
+            }
+            if (event === 'done') {
+                assistantDiv.textContent = data.response;
+            } else if (data.token) {
+                assistantDiv.textContent += data.token;
+            }
+            chatMessages.scrollTop = chatMessages.scrollHeight;
         });
 
-        // Add assistant response
-        addChatMessage(response.response, 'assistant');
-
     } catch (error) {
         console.error('Error sending chat message:', error);
-        addChatMessage('Sorry, I encountered an error. Please try again.', 'assistant');
+        assistantDiv.textContent = 'Sorry, I encountered an error. Please try again.';
     }
 }
 
@@ -218,6 +228,7 @@ function addChatMessage(message, sender) {
 
     chatMessages.appendChild(messageDiv);
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    return messageDiv;
 }
 
 function showError(message) {
@@ -104,6 +104,55 @@ class AuthService {
             throw error;
         }
     }
+
+    async streamAuthenticatedRequest(url, options = {}, onEvent) {
+        if (!this.token) {
+            throw new Error('Not authenticated');
+        }
+
+        const response = await fetch(`${this.baseURL}${url}`, {
+            ...options,
+            headers: {
+                ...this.getAuthHeaders(),
+                'Accept': 'text/event-stream',
+                ...options.headers
+            }
+        });
+
+        if (response.status === 401) {
+            this.logout();
+            throw new Error('Session expired');
+        }
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.detail || 'Request failed');
+        }
+
+        // Parse Server-Sent Events ("event: name" / "data: json" blocks separated by blank lines)
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+
+            for (const rawEvent of events) {
+                let eventName = 'message';
+                let data = '';
+                for (const line of rawEvent.split('\n')) {
+                    if (line.startsWith('event: ')) eventName = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                }
+                if (data) onEvent(eventName, JSON.parse(data));
+            }
+        }
+    }
 }
 
 const authService = new AuthService();
\ No newline at end of file